@@ -0,0 +1,185 @@
+import configparser
+import glob
+import json
+import os
+import numpy as np
+import cache
+import profiler
+import results
+import sim
+from itertools import product
+
+
+# the options scenarios of one group may differ in, everything else is shared data
+SCENARIO_OPTION_LIST = [('topology', 'type'), ('topology', 'issquare'), ('tsv', 'tsvpatterntype')]
+
+# (section, option, off value) of run()'s other models; the batch only writes avg hop counts, so they are
+# switched off instead of building weighted distances, routing tables or stacks nobody reads
+UNREPORTED_MODE_LIST = [('latency', 'linkweight', 'none'), ('routing', 'algorithm', 'none'), ('stack', 'enabled', '0')]
+
+
+def getConfigPathList(argPathList: list) -> list:
+    # every *.ini of a directory, or the matches of a glob pattern, in sorted order without duplicates
+    configPathList = []
+
+    for path in argPathList:
+        if(os.path.isdir(path)):
+            matchList = sorted(glob.glob(os.path.join(path, '*.ini')))
+        else:
+            matchList = sorted(glob.glob(path))
+
+        if(not matchList):
+            raise FileNotFoundError(f"no config matches {path}")
+
+        configPathList.extend(matchPath for matchPath in matchList if matchPath not in configPathList)
+
+    return configPathList
+
+
+def readConfig(argPath: str) -> configparser.ConfigParser:
+    config = configparser.ConfigParser()
+
+    if(not config.read(argPath, encoding='utf-8')):
+        raise FileNotFoundError(f"cannot read config {argPath}")
+
+    return config
+
+
+def getUnreportedModeList(argConfig: configparser.ConfigParser) -> list:
+    # [(section, option, off value)] of the models argConfig enables that the batch does not report
+    modeList = []
+
+    for (section, option, offValue) in UNREPORTED_MODE_LIST:
+        value = argConfig.get(section, option, fallback=offValue)
+
+        if(value != offValue and configparser.ConfigParser.BOOLEAN_STATES.get(value.lower(), True)):
+            modeList.append((section, option, offValue))
+
+    return modeList
+
+
+def getGroupKey(argConfig: configparser.ConfigParser) -> str:
+    # configurations with equal keys share the grid, the chiplets and every model parameter
+    sharedDict = {section: {option: value for (option, value) in argConfig.items(section)
+                            if (section, option) not in SCENARIO_OPTION_LIST}
+                  for section in argConfig.sections()}
+
+    return json.dumps(sharedDict, sort_keys=True)
+
+
+def getUnionList(argListList: list) -> list:
+    # first appearance order
+    return list(dict.fromkeys(item for itemList in argListList for item in itemList))
+
+
+def getUnionConfig(argConfigList: list) -> configparser.ConfigParser:
+    # one configuration covering the topologies, chiplet shapes and TSV patterns of every scenario
+    unionConfig = configparser.ConfigParser()
+    unionConfig.read_dict(argConfigList[0])
+
+    unionConfig['topology']['type'] = ' '.join(getUnionList(
+        [config['topology']['type'].split(' ') for config in argConfigList]))
+    unionConfig['topology']['isSquare'] = ' '.join(getUnionList(
+        [config['topology']['isSquare'].split(' ') for config in argConfigList]))
+    unionConfig['tsv']['tsvPatternType'] = ' '.join(getUnionList(
+        [config['tsv']['tsvpatterntype'].split(' ') for config in argConfigList]))
+
+    return unionConfig
+
+
+def getScenarioLayoutList(argConfig: configparser.ConfigParser, argNumChiplet: int) -> list:
+    return list(product(argConfig['tsv']['tsvpatterntype'].split(' '), repeat=argNumChiplet))
+
+
+def runBatch(argPathList: list, argOutputPath: str = None, argNumWorkers: int = 1, argCacheDir: str = None,
+             argCacheMaxBytes: int = 4 << 30, argProfiler: profiler.NullProfiler = None) -> dict:
+    # runs every scenario of argPathList; scenarios that only differ in topologies, chiplet shapes and
+    # TSV patterns are one sweep over the union of their layouts, and the distance matrices are shared
+    # by all of them. Returns {config path: [(topology, isSquare, tsvLayoutList, avgHopCountArray)]}
+    phaseProfiler = argProfiler or profiler.NullProfiler()
+    configPathList = getConfigPathList(argPathList)
+    configDict = {configPath: readConfig(configPath) for configPath in configPathList}
+
+    for (configPath, config) in configDict.items():
+        for (section, option, offValue) in getUnreportedModeList(config):
+            print(f"{configPath}: [{section}] {option} = {config[section][option]} is ignored, "
+                  f"the batch only reports avg hop counts")
+
+            config[section][option] = offValue
+
+    groupDict = {}
+
+    for configPath in configPathList:
+        groupDict.setdefault(getGroupKey(configDict[configPath]), []).append(configPath)
+
+    print(f"Batch: {len(configPathList)} scenarios in {len(groupDict)} groups")
+    print()
+
+    distanceCache = cache.MemoryDistanceCache(
+        None if None == argCacheDir else cache.DistanceCache(argCacheDir, argCacheMaxBytes))
+
+    resultSink = None
+
+    if(None != argOutputPath):
+        resultSink = results.ResultSink(argOutputPath, argScenarioColumn='config')
+
+    resultDict = {}
+
+    for (groupNo, groupPathList) in enumerate(groupDict.values()):
+        groupConfigList = [configDict[configPath] for configPath in groupPathList]
+        numChiplet = int(groupConfigList[0]['chiplet']['numChiplet'])
+
+        # every distinct layout of the group once, in the order of the first scenario wanting it
+        tsvLayoutList = getUnionList([getScenarioLayoutList(config, numChiplet) for config in groupConfigList])
+        layoutNoDict = {tsvLayout: layoutNo for (layoutNo, tsvLayout) in enumerate(tsvLayoutList)}
+
+        hopSim = sim.HopSim(getUnionConfig(groupConfigList), argNumWorkers=argNumWorkers,
+                            argProfiler=phaseProfiler, argDistanceCache=distanceCache)
+
+        with phaseProfiler.phase('runGroup', groupNo=groupNo, numScenarios=len(groupPathList),
+                                 numLayouts=len(tsvLayoutList)):
+            groupResultList = hopSim.getAvgHopCount(tsvLayoutList)
+
+        for (configPath, config) in zip(groupPathList, groupConfigList):
+            topologyList = config['topology']['type'].split(' ')
+            isSquareList = list(map(int, config['topology']['isSquare'].split(' ')))
+
+            scenarioLayoutList = getScenarioLayoutList(config, numChiplet)
+            layoutNoArray = np.array([layoutNoDict[tsvLayout] for tsvLayout in scenarioLayoutList], dtype=np.intp)
+            tsvLayoutStrList = [' '.join(tsvLayout) for tsvLayout in scenarioLayoutList]
+
+            scenarioResultList = []
+
+            for (topology, isSquare, avgHopCountArray) in groupResultList:
+                if(topology not in topologyList or isSquare not in isSquareList):
+                    continue
+
+                scenarioResultList.append((topology, isSquare, tsvLayoutStrList, avgHopCountArray[layoutNoArray]))
+
+                if(resultSink):
+                    resultSink.write(topology, isSquare, tsvLayoutStrList, avgHopCountArray[layoutNoArray],
+                                     configPath)
+
+            resultDict[configPath] = scenarioResultList
+
+    if(resultSink):
+        resultSink.close()
+
+    return resultDict
+
+
+def printBatchResult(argResultDict: dict):
+    # run()'s per topology report for every scenario
+    for (configPath, scenarioResultList) in argResultDict.items():
+        print(f"===== Config: {configPath}")
+
+        topologyList = getUnionList([[topology for (topology, _, _, _) in scenarioResultList]])
+
+        for topology in topologyList:
+            hopCountArray = np.concatenate([avgHopCountArray for (resultTopology, _, _, avgHopCountArray)
+                                            in scenarioResultList if resultTopology == topology])
+
+            print(f"======= Topology: {topology}")
+            print(f"StdDev: {np.std(hopCountArray)}")
+            print(f"Mean: {np.mean(hopCountArray)}")
+            print()
@@ -0,0 +1,270 @@
+import argparse
+import configparser
+import contextlib
+import io
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import sim
+
+
+# bump whenever a stage changes meaning, reports of different versions are not compared
+BENCH_SCHEMA_VERSION = 1
+
+# fields that identify one measurement across reports
+KEY_FIELD_LIST = ['numXDimNodes', 'numYDimNodes', 'numChiplet', 'numPattern', 'stage', 'topology', 'isSquare']
+
+
+def getTimingStats(argTimeList: list) -> dict:
+    timeArray = np.asarray(argTimeList, dtype=np.float64)
+    (p10, median, p90) = np.percentile(timeArray, [10, 50, 90])
+
+    return {'median': float(median), 'p10': float(p10), 'p90': float(p90),
+            'min': float(timeArray.min()), 'max': float(timeArray.max()), 'mean': float(timeArray.mean())}
+
+
+def getPeakBytes(argFunc) -> int:
+    # separate run, tracemalloc slows Python heavy stages down too much to time them with it on
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    try:
+        argFunc()
+        (_, peakBytes) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peakBytes
+
+
+def timeStage(argFunc, argRepeat: int, argWarmup: int = 1) -> dict:
+    # wall time of argRepeat calls after argWarmup untimed ones, plus the peak of the traced allocations
+    for _ in range(argWarmup):
+        argFunc()
+
+    timeList = []
+
+    for _ in range(argRepeat):
+        startTime = time.perf_counter()
+        argFunc()
+        timeList.append(time.perf_counter() - startTime)
+
+    return {**getTimingStats(timeList), 'peakBytes': getPeakBytes(argFunc)}
+
+
+def getConfig(argBaseConfig, argNumXDimNodes: int, argNumYDimNodes: int, argNumChiplet: int,
+              argNumPattern: int) -> configparser.ConfigParser:
+    # copy of argBaseConfig with the grid, chiplet count and the first argNumPattern patterns replaced
+    config = configparser.ConfigParser()
+    config.read_dict(argBaseConfig)
+
+    tsvPatternTypeList = argBaseConfig['tsv']['tsvpatterntype'].split(' ')
+
+    if(argNumPattern > len(tsvPatternTypeList)):
+        raise sim.ConfigError(f"only {len(tsvPatternTypeList)} TSV patterns are configured, "
+                              f"cannot bench {argNumPattern}")
+
+    config['topology']['numxdimnodes'] = str(argNumXDimNodes)
+    config['topology']['numydimnodes'] = str(argNumYDimNodes)
+    config['chiplet']['numChiplet'] = str(argNumChiplet)
+    config['tsv']['tsvpatterntype'] = ' '.join(tsvPatternTypeList[:argNumPattern])
+
+    return config
+
+
+def runBench(argBaseConfig, argGridList: list, argNumPatternList: list, argNumChipletList: list,
+             argRepeat: int = 5, argMaxLayouts: int = 1 << 12, argSeed: int = 0) -> list:
+    # one record per (grid, chiplets, patterns, stage), stages come from HopSim.iterBenchStage
+    recordList = []
+
+    for (numXDimNodes, numYDimNodes) in argGridList:
+        for numChiplet in argNumChipletList:
+            for numPattern in argNumPatternList:
+                config = getConfig(argBaseConfig, numXDimNodes, numYDimNodes, numChiplet, numPattern)
+                matrixDict = {'numXDimNodes': numXDimNodes, 'numYDimNodes': numYDimNodes,
+                              'numChiplet': numChiplet, 'numPattern': numPattern}
+
+                # the isolated placements are drawn from the random module
+                random.seed(argSeed)
+
+                # no distance cache, its hits would hide the BFS
+                hopSim = sim.HopSim(config)
+
+                for (stageDict, stageFunc) in hopSim.iterBenchStage(argMaxLayouts, argSeed):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        timingDict = timeStage(stageFunc, argRepeat)
+
+                    record = {**matrixDict, 'topology': None, 'isSquare': None, 'numItems': 1,
+                              **stageDict, **timingDict}
+                    record['medianPerItem'] = record['median'] / max(1, record['numItems'])
+
+                    print(f"{numXDimNodes}x{numYDimNodes} chiplets {numChiplet} patterns {numPattern} "
+                          f"{record['stage']:<12} {record['topology'] or '':<11} "
+                          f"{'' if None == record['isSquare'] else record['isSquare']:<2} "
+                          f"median {record['median'] * 1e3:10.3f} ms  p90 {record['p90'] * 1e3:10.3f} ms  "
+                          f"peak {record['peakBytes'] / (1 << 20):8.2f} MB")
+
+                    recordList.append(record)
+
+    return recordList
+
+
+def getCommit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def getReport(argRecordList: list, argRepeat: int, argMaxLayouts: int, argSeed: int) -> dict:
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {'schemaVersion': BENCH_SCHEMA_VERSION, 'commit': getCommit(),
+            'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'repeat': argRepeat, 'maxLayouts': argMaxLayouts, 'seed': argSeed,
+            'maxRSSBytes': maxRSS if sys.platform == 'darwin' else maxRSS * 1024,
+            'recordList': argRecordList}
+
+
+def getRegressionList(argReport: dict, argBaseReport: dict, argThreshold: float) -> list:
+    # (record, base record, ratio) of the stages whose median grew by more than argThreshold
+    if(argBaseReport.get('schemaVersion') != argReport['schemaVersion']):
+        raise ValueError(f"cannot compare bench schema {argReport['schemaVersion']} "
+                         f"with {argBaseReport.get('schemaVersion')}")
+
+    baseRecordDict = {tuple(record.get(field) for field in KEY_FIELD_LIST): record
+                      for record in argBaseReport['recordList']}
+
+    regressionList = []
+
+    for record in argReport['recordList']:
+        baseRecord = baseRecordDict.get(tuple(record.get(field) for field in KEY_FIELD_LIST))
+
+        if(None == baseRecord or baseRecord['median'] <= 0):
+            continue
+
+        ratio = record['median'] / baseRecord['median']
+
+        if(ratio > argThreshold):
+            regressionList.append((record, baseRecord, ratio))
+
+    return regressionList
+
+
+def getNumPatternList(argBaseConfig, argNumPatternList: list = None) -> list:
+    # pattern counts to bench, checked against the configuration before any stage runs
+    numConfiguredPattern = len(argBaseConfig['tsv']['tsvpatterntype'].split(' '))
+
+    if(None == argNumPatternList):
+        return sorted({min(2, numConfiguredPattern), numConfiguredPattern})
+
+    for numPattern in argNumPatternList:
+        if(numPattern < 1 or numPattern > numConfiguredPattern):
+            raise sim.ConfigError(f"--patterns must be between 1 and the {numConfiguredPattern} configured TSV "
+                                  f"patterns, not {numPattern}")
+
+    return argNumPatternList
+
+
+def getBaseConfig(argArgs: argparse.Namespace, argParser: argparse.ArgumentParser) -> configparser.ConfigParser:
+    # the --config of main.py bench and of this script, its errors and the option checks end in argParser.error
+    if(argArgs.repeat < 1):
+        argParser.error('--repeat must be at least 1')
+
+    baseConfig = configparser.ConfigParser()
+
+    if(not baseConfig.read(argArgs.config, encoding='utf-8')):
+        argParser.error(f"config {argArgs.config} does not exist")
+
+    try:
+        getNumPatternList(baseConfig, argArgs.patterns)
+    except sim.ConfigError as error:
+        argParser.error(str(error))
+
+    return baseConfig
+
+
+def parseGrid(argGrid: str) -> tuple:
+    (numXDimNodes, numYDimNodes) = argGrid.lower().split('x')
+
+    return (int(numXDimNodes), int(numYDimNodes))
+
+
+def addArguments(argParser: argparse.ArgumentParser):
+    argParser.add_argument('--grid', type=parseGrid, nargs='+', default=[(8, 16), (16, 32)], metavar='XxY',
+                           help='grid sizes to bench')
+    argParser.add_argument('--patterns', type=int, nargs='+', default=None, metavar='N',
+                           help='numbers of TSV patterns to bench, the first N of the configuration; '
+                                '2 and all of them by default')
+    argParser.add_argument('--chiplets', type=int, nargs='+', default=None, metavar='N',
+                           help='numbers of chiplets to bench, the configured one by default')
+    argParser.add_argument('--repeat', type=int, default=5,
+                           help='timed runs per stage, after one warm-up run')
+    argParser.add_argument('--max-layouts', type=int, default=1 << 12,
+                           help='layouts scored and swept per configuration, sampled when there are more')
+    argParser.add_argument('--seed', type=int, default=0,
+                           help='seed of the isolated placements and of the sampled layouts')
+    argParser.add_argument('--output', default='bench.json',
+                           help='write the report to this JSON file')
+    argParser.add_argument('--compare', default=None,
+                           help='report of an earlier run, stages slower than --threshold times it fail the run')
+    argParser.add_argument('--threshold', type=float, default=1.2,
+                           help='median ratio above which a stage counts as a regression')
+
+
+def runCommand(argArgs: argparse.Namespace, argBaseConfig: configparser.ConfigParser) -> int:
+    # exit status, 1 when --compare found a regression
+    if(argArgs.repeat < 1):
+        raise sim.ConfigError('--repeat must be at least 1')
+
+    numPatternList = getNumPatternList(argBaseConfig, argArgs.patterns)
+    numChipletList = argArgs.chiplets or [int(argBaseConfig['chiplet']['numChiplet'])]
+
+    recordList = runBench(argBaseConfig, argArgs.grid, numPatternList, numChipletList,
+                          argArgs.repeat, argArgs.max_layouts, argArgs.seed)
+    report = getReport(recordList, argArgs.repeat, argArgs.max_layouts, argArgs.seed)
+
+    with open(argArgs.output, 'w') as outputFile:
+        json.dump(report, outputFile, indent=1)
+
+    print(f"Wrote {len(recordList)} measurements to {argArgs.output}")
+
+    if(None == argArgs.compare):
+        return 0
+
+    with open(argArgs.compare) as baseFile:
+        baseReport = json.load(baseFile)
+
+    regressionList = getRegressionList(report, baseReport, argArgs.threshold)
+
+    for (record, baseRecord, ratio) in regressionList:
+        print(f"Regression: {record['numXDimNodes']}x{record['numYDimNodes']} chiplets {record['numChiplet']} "
+              f"patterns {record['numPattern']} {record['stage']} {record['topology'] or ''} "
+              f"{'' if None == record['isSquare'] else record['isSquare']}: "
+              f"{baseRecord['median'] * 1e3:.3f} ms -> {record['median'] * 1e3:.3f} ms ({ratio:.2f}x)")
+
+    if(regressionList):
+        return 1
+
+    print(f"No stage slower than {argArgs.threshold}x {argArgs.compare}")
+
+    return 0
+
+
+if (__name__ == '__main__'):
+
+    parser = argparse.ArgumentParser(description='time the topology builders, node typing, scoring and sweeps')
+    parser.add_argument('--config', default='config.ini',
+                        help='base configuration, its topologies, chiplet shapes and pattern names are benched')
+    addArguments(parser)
+    args = parser.parse_args()
+
+    sys.exit(runCommand(args, getBaseConfig(args, parser)))
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+
+class DistanceCache:
+    # directory of per-topology .npy arrays, one sub-directory per configuration key,
+    # least recently used entries are evicted once the directory exceeds maxBytes
+
+    def __init__(self, argCacheDir: str, argMaxBytes: int):
+
+        self.cacheDir = argCacheDir
+        self.maxBytes = argMaxBytes
+
+        os.makedirs(self.cacheDir, exist_ok=True)
+
+    def getKey(self, **argKeyFields) -> str:
+        keyJson = json.dumps(argKeyFields, sort_keys=True)
+
+        return hashlib.sha256(keyJson.encode('utf-8')).hexdigest()[:32]
+
+    def load(self, argKey: str) -> dict:
+        # {name: read-only memory-mapped array}, None on a miss
+        entryDir = os.path.join(self.cacheDir, argKey)
+
+        if(not os.path.isdir(entryDir)):
+            return None
+
+        arrayDict = {}
+
+        try:
+            for fileName in os.listdir(entryDir):
+                if(fileName.endswith('.npy')):
+                    arrayDict[fileName[:-4]] = np.load(os.path.join(entryDir, fileName), mmap_mode='r')
+
+        except (OSError, ValueError):
+            # torn or foreign entry, rebuild it
+            shutil.rmtree(entryDir, ignore_errors=True)
+            return None
+
+        # the entry's mtime is its LRU timestamp
+        os.utime(entryDir)
+
+        return arrayDict
+
+    def store(self, argKey: str, argArrayDict: dict, argKeyFields: dict = None):
+        entryDir = os.path.join(self.cacheDir, argKey)
+        tmpDir = entryDir + f".tmp{os.getpid()}"
+
+        os.makedirs(tmpDir, exist_ok=True)
+
+        for (name, array) in argArrayDict.items():
+            np.save(os.path.join(tmpDir, name + '.npy'), np.asarray(array))
+
+        with open(os.path.join(tmpDir, 'key.json'), 'w') as file:
+            json.dump(argKeyFields or {}, file, sort_keys=True)
+
+        # another process may have stored the same entry meanwhile, either copy is fine
+        try:
+            os.rename(tmpDir, entryDir)
+        except OSError:
+            shutil.rmtree(tmpDir, ignore_errors=True)
+
+        self.__evict(argKeep=argKey)
+
+    def __getEntrySize(self, argEntryDir: str) -> int:
+        return sum(os.path.getsize(os.path.join(argEntryDir, fileName)) for fileName in os.listdir(argEntryDir))
+
+    def __evict(self, argKeep: str):
+        entryList = []
+
+        for entryName in os.listdir(self.cacheDir):
+            entryDir = os.path.join(self.cacheDir, entryName)
+
+            if(os.path.isdir(entryDir) and '.tmp' not in entryName):
+                entryList.append((os.path.getmtime(entryDir), entryName, self.__getEntrySize(entryDir)))
+
+        totalBytes = sum(entrySize for (_, _, entrySize) in entryList)
+
+        for (_, entryName, entrySize) in sorted(entryList):
+            if(totalBytes <= self.maxBytes):
+                break
+
+            if(entryName == argKeep):
+                continue
+
+            shutil.rmtree(os.path.join(self.cacheDir, entryName), ignore_errors=True)
+            totalBytes -= entrySize
+
+
+class MemoryDistanceCache:
+    # DistanceCache interface kept in memory, so HopSim instances of one process share their
+    # matrices; misses fall through to an optional on-disk DistanceCache
+
+    def __init__(self, argBackingCache: DistanceCache = None):
+
+        self.backingCache = argBackingCache
+        self.entryDict = {}
+
+    def getKey(self, **argKeyFields) -> str:
+        keyJson = json.dumps(argKeyFields, sort_keys=True)
+
+        return hashlib.sha256(keyJson.encode('utf-8')).hexdigest()[:32]
+
+    def load(self, argKey: str) -> dict:
+        if(argKey not in self.entryDict and None != self.backingCache):
+            arrayDict = self.backingCache.load(argKey)
+
+            if(arrayDict):
+                self.entryDict[argKey] = arrayDict
+
+        return self.entryDict.get(argKey)
+
+    def store(self, argKey: str, argArrayDict: dict, argKeyFields: dict = None):
+        self.entryDict.setdefault(argKey, {}).update(argArrayDict)
+
+        if(None != self.backingCache):
+            self.backingCache.store(argKey, argArrayDict, argKeyFields)
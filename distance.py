@@ -0,0 +1,292 @@
+import numpy as np
+
+
+# memory budget of one BFS batch, sources are processed 64 per uint64 word
+BFS_BATCH_BYTES = 1 << 28
+
+
+def getHopDistanceMatrix(argTopology, argSrcNodeIdArray=None, argDstNodeIdArray=None) -> np.ndarray:
+    # BFS from every source (all nodes by default), returns (numSources x numDestinations) hop counts
+    # to argDstNodeIdArray (all nodes by default), unreachable pairs are marked with the max value of
+    # the returned dtype
+    numNodes = argTopology.numNodes
+
+    if(argSrcNodeIdArray is None):
+        srcNodeIdArray = np.arange(numNodes)
+    else:
+        srcNodeIdArray = np.asarray(argSrcNodeIdArray, dtype=np.int64).ravel()
+
+    if(argDstNodeIdArray is None):
+        dstNodeIdArray = None
+        numDestinations = numNodes
+    else:
+        dstNodeIdArray = np.asarray(argDstNodeIdArray, dtype=np.int64).ravel()
+        numDestinations = len(dstNodeIdArray)
+
+    numSources = len(srcNodeIdArray)
+    neighborTable = getNeighborTable(argTopology)
+
+    # the unpacked (batch x numDestinations) int32 result dominates the batch memory
+    batchSize = max(64, (BFS_BATCH_BYTES // (4 * max(1, numDestinations))) // 64 * 64)
+
+    hopMatrix = None
+
+    for start in range(0, numSources, batchSize):
+        hopBatch = _getHopDistanceBatch(neighborTable, srcNodeIdArray[start:start + batchSize], dstNodeIdArray)
+
+        if(hopMatrix is None):
+            # diameter <= 2 * eccentricity of any source in a connected graph, which fixes the dtype up front;
+            # only a full row is an eccentricity
+            if((hopBatch < 0).any() or dstNodeIdArray is not None):
+                maxHop = numNodes
+            else:
+                maxHop = min(numNodes, 2 * int(hopBatch.max(axis=1).min()))
+
+            hopMatrix = np.empty((numSources, numDestinations), dtype=getHopDtype(maxHop))
+
+        hopBatch[hopBatch < 0] = np.iinfo(hopMatrix.dtype).max
+        hopMatrix[start:start + batchSize] = hopBatch
+
+    if(hopMatrix is None):
+        hopMatrix = np.empty((0, numDestinations), dtype=np.uint8)
+
+    return hopMatrix
+
+
+def getHopDtype(argMaxHop: int):
+    # smallest unsigned dtype that fits the hop count plus the unreachable marker
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if(argMaxHop < np.iinfo(dtype).max):
+            return dtype
+
+    return np.uint64
+
+
+def getNeighborTable(argTopology) -> np.ndarray:
+    # (numNodes x maxDegree) neighbor ids, padded with numNodes which points at an always-empty row
+    numNodes = argTopology.numNodes
+    degreeArray = np.diff(argTopology.indptr)
+    maxDegree = int(degreeArray.max(initial=0))
+
+    neighborTable = np.full((numNodes, max(1, maxDegree)), numNodes, dtype=np.int64)
+
+    rowArray = np.repeat(np.arange(numNodes), degreeArray)
+    slotArray = np.arange(len(argTopology.indices)) - np.repeat(argTopology.indptr[:-1], degreeArray)
+    neighborTable[rowArray, slotArray] = argTopology.indices
+
+    return neighborTable
+
+
+def _getHopDistanceBatch(argNeighborTable: np.ndarray, argSrcNodeIdArray: np.ndarray,
+                         argDstNodeIdArray: np.ndarray = None) -> np.ndarray:
+    # level-synchronous BFS for 64 sources per uint64 word, hop counts are
+    # accumulated as bit planes so nothing is unpacked until the end, and then only
+    # the rows of argDstNodeIdArray
+    numNodes = argNeighborTable.shape[0]
+    numSources = len(argSrcNodeIdArray)
+    numWords = -(-numSources // 64)
+
+    sourceNo = np.arange(numSources)
+    sourceBit = np.left_shift(np.uint64(1), (sourceNo % 64).astype(np.uint64))
+
+    # the extra last row stays zero for the padding neighbor
+    frontier = np.zeros((numNodes + 1, numWords), dtype=np.uint64)
+    np.bitwise_or.at(frontier, (argSrcNodeIdArray, sourceNo // 64), sourceBit)
+
+    visited = frontier[:numNodes].copy()
+    hopPlaneList = []
+    hop = 0
+
+    while(frontier.any()):
+        hop += 1
+
+        nextFrontier = np.bitwise_or.reduce(frontier[argNeighborTable], axis=1)
+        nextFrontier &= ~visited
+        visited |= nextFrontier
+
+        frontier[:numNodes] = nextFrontier
+
+        while(len(hopPlaneList) < hop.bit_length()):
+            hopPlaneList.append(np.zeros((numNodes, numWords), dtype=np.uint64))
+
+        for planeNo in range(hop.bit_length()):
+            if((hop >> planeNo) & 1):
+                hopPlaneList[planeNo] |= nextFrontier
+
+    if(argDstNodeIdArray is not None):
+        hopPlaneList = [hopPlane[argDstNodeIdArray] for hopPlane in hopPlaneList]
+        visited = visited[argDstNodeIdArray]
+
+    # assembled node-major, transposed once at the end
+    hopBatch = np.zeros((len(visited), numSources), dtype=np.int32)
+
+    for (planeNo, hopPlane) in enumerate(hopPlaneList):
+        hopBatch |= _unpackSourceBits(hopPlane, numSources) << np.int32(planeNo)
+
+    hopBatch[_unpackSourceBits(visited, numSources) == 0] = -1
+
+    return np.ascontiguousarray(hopBatch.T)
+
+
+def _unpackSourceBits(argPacked: np.ndarray, argNumSources: int) -> np.ndarray:
+    # (numNodes x words) uint64 -> (numNodes x numSources) 0/1 uint8
+    bitArray = np.unpackbits(argPacked.astype('<u8', copy=False).view(np.uint8), axis=1, bitorder='little')
+
+    return bitArray[:, :argNumSources]
+
+
+def getLinkWeightTable(argTopology, argWeightArray: np.ndarray, argNeighborTable: np.ndarray) -> np.ndarray:
+    # weights of getNeighborTable's slots, argWeightArray follows the topology's (srcArray, dstArray) links;
+    # padding slots weigh inf so they never relax anything
+    numNodes = argTopology.numNodes
+    weightArray = np.asarray(argWeightArray, dtype=np.float64)
+
+    # links are unique and sorted by (src, dst), so both directions of a slot find their link by key
+    linkKeyArray = argTopology.srcArray.astype(np.int64) * numNodes + argTopology.dstArray
+
+    rowArray = np.broadcast_to(np.arange(numNodes)[:, None], argNeighborTable.shape)
+    isLink = argNeighborTable < numNodes
+
+    slotKeyArray = np.minimum(rowArray[isLink], argNeighborTable[isLink]) * numNodes + \
+        np.maximum(rowArray[isLink], argNeighborTable[isLink])
+
+    weightTable = np.full(argNeighborTable.shape, np.inf)
+    weightTable[isLink] = weightArray[np.searchsorted(linkKeyArray, slotKeyArray)]
+
+    return weightTable
+
+
+def getWeightedDistanceMatrix(argTopology, argWeightArray: np.ndarray, argSrcNodeIdArray=None) -> np.ndarray:
+    # shortest path lengths under positive per-link weights, (numSources x numNodes) float64, inf when unreachable
+    numNodes = argTopology.numNodes
+
+    if(argSrcNodeIdArray is None):
+        srcNodeIdArray = np.arange(numNodes)
+    else:
+        srcNodeIdArray = np.asarray(argSrcNodeIdArray, dtype=np.int64).ravel()
+
+    numSources = len(srcNodeIdArray)
+    neighborTable = getNeighborTable(argTopology)
+    weightTable = getLinkWeightTable(argTopology, argWeightArray, neighborTable)
+
+    isLink = neighborTable < numNodes
+
+    if((weightTable[isLink] <= 0).any()):
+        raise ValueError("link weights must be positive")
+
+    distanceMatrix = np.empty((numSources, numNodes), dtype=np.float64)
+
+    # integer weights (wire lengths, delays in cycles) expand level by level like the BFS,
+    # 64 sources per uint64 word; anything else is relaxed as float64
+    if(np.array_equal(weightTable[isLink], np.rint(weightTable[isLink]))):
+        batchSize = max(64, (BFS_BATCH_BYTES // (4 * max(1, numNodes))) // 64 * 64)
+        getDistanceBatch = _getIntegerDistanceBatch
+    else:
+        # the (batch x numNodes x maxDegree) float64 candidates dominate the batch memory
+        batchSize = max(1, BFS_BATCH_BYTES // (8 * max(1, numNodes) * neighborTable.shape[1]))
+        getDistanceBatch = _getRelaxedDistanceBatch
+
+    for start in range(0, numSources, batchSize):
+        distanceMatrix[start:start + batchSize] = \
+            getDistanceBatch(neighborTable, weightTable, srcNodeIdArray[start:start + batchSize])
+
+    return distanceMatrix
+
+
+def _getIntegerDistanceBatch(argNeighborTable: np.ndarray, argWeightTable: np.ndarray,
+                             argSrcNodeIdArray: np.ndarray) -> np.ndarray:
+    # Dial's buckets as bitsets: a node is reached at level t when a neighbor was reached at level
+    # t - (weight of their link), so only the last maxWeight frontiers are kept
+    numNodes = argNeighborTable.shape[0]
+    numSources = len(argSrcNodeIdArray)
+    numWords = -(-numSources // 64)
+
+    isLink = argNeighborTable < numNodes
+    weightTable = np.where(isLink, np.rint(np.where(isLink, argWeightTable, 0)), 0).astype(np.int64)
+    maxWeight = int(weightTable.max(initial=1))
+
+    # per distinct weight, the neighbor table with the other slots pointing at the padding row
+    weightNeighborList = []
+
+    for weight in np.unique(weightTable[isLink]):
+        neighborTable = np.where(weightTable == weight, argNeighborTable, numNodes)
+        neighborTable = neighborTable[:, (neighborTable < numNodes).any(axis=0)]
+        weightNeighborList.append((int(weight), neighborTable))
+
+    sourceNo = np.arange(numSources)
+    sourceBit = np.left_shift(np.uint64(1), (sourceNo % 64).astype(np.uint64))
+
+    # frontierRing[t % (maxWeight + 1)] holds the nodes first reached at level t,
+    # the extra last row stays zero for the padding neighbor
+    frontierRing = np.zeros((maxWeight + 1, numNodes + 1, numWords), dtype=np.uint64)
+    np.bitwise_or.at(frontierRing[0], (argSrcNodeIdArray, sourceNo // 64), sourceBit)
+
+    # which ring slots hold a non-empty frontier, so empty ones are neither scanned nor expanded
+    isRingUsed = np.zeros(maxWeight + 1, dtype=bool)
+    isRingUsed[0] = True
+
+    visited = frontierRing[0, :numNodes].copy()
+    levelPlaneList = []
+    level = 0
+
+    while(isRingUsed.any()):
+        level += 1
+
+        nextFrontier = np.zeros((numNodes, numWords), dtype=np.uint64)
+
+        for (weight, neighborTable) in weightNeighborList:
+            ringNo = (level - weight) % (maxWeight + 1)
+
+            if(weight <= level and isRingUsed[ringNo]):
+                nextFrontier |= np.bitwise_or.reduce(frontierRing[ringNo][neighborTable], axis=1)
+
+        nextFrontier &= ~visited
+        visited |= nextFrontier
+
+        frontierRing[level % (maxWeight + 1), :numNodes] = nextFrontier
+        isRingUsed[level % (maxWeight + 1)] = bool(nextFrontier.any())
+
+        while(len(levelPlaneList) < level.bit_length()):
+            levelPlaneList.append(np.zeros((numNodes, numWords), dtype=np.uint64))
+
+        for planeNo in range(level.bit_length()):
+            if((level >> planeNo) & 1):
+                levelPlaneList[planeNo] |= nextFrontier
+
+    distanceBatch = np.zeros((numNodes, numSources), dtype=np.int64)
+
+    for (planeNo, levelPlane) in enumerate(levelPlaneList):
+        distanceBatch |= _unpackSourceBits(levelPlane, numSources).astype(np.int64) << planeNo
+
+    distanceBatch = distanceBatch.T.astype(np.float64)
+    distanceBatch[_unpackSourceBits(visited, numSources).T == 0] = np.inf
+
+    return distanceBatch
+
+
+def _getRelaxedDistanceBatch(argNeighborTable: np.ndarray, argWeightTable: np.ndarray,
+                             argSrcNodeIdArray: np.ndarray) -> np.ndarray:
+    # sources of the batch are relaxed together over the neighbor table until nothing improves,
+    # which takes as many rounds as the longest shortest path has links
+    numNodes = argNeighborTable.shape[0]
+    numSources = len(argSrcNodeIdArray)
+
+    # the extra last column stays inf for the padding neighbor
+    distanceBatch = np.full((numSources, numNodes + 1), np.inf)
+    distanceBatch[np.arange(numSources), argSrcNodeIdArray] = 0
+
+    # only neighbors of nodes that improved in the last round can improve in the next
+    nodeIdArray = np.unique(argNeighborTable[argSrcNodeIdArray])
+    nodeIdArray = nodeIdArray[nodeIdArray < numNodes]
+
+    while(len(nodeIdArray)):
+        # pull: every node takes its best neighbor plus the link between them
+        candidate = (distanceBatch[:, argNeighborTable[nodeIdArray]] + argWeightTable[nodeIdArray]).min(axis=2)
+        isImproved = (candidate < distanceBatch[:, nodeIdArray]).any(axis=0)
+
+        distanceBatch[:, nodeIdArray] = np.minimum(distanceBatch[:, nodeIdArray], candidate)
+
+        nodeIdArray = np.unique(argNeighborTable[nodeIdArray[isImproved]])
+        nodeIdArray = nodeIdArray[nodeIdArray < numNodes]
+
+    return distanceBatch[:, :numNodes]
@@ -0,0 +1,147 @@
+import numpy as np
+
+
+def getTrafficProb(argNumTotalTSV, argNumTotalMemCtrl) -> tuple:
+    # (probCoreToCore, probCoreToMemCtrl, probMemCtrlToCore), works on scalars and arrays
+    numTotalTSV = np.asarray(argNumTotalTSV, dtype=np.float64)
+
+    probCoreToCore = 0.3 / numTotalTSV
+    probCoreToMemCtrl = 0.7 / argNumTotalMemCtrl
+    probMemCtrlToCore = 1 / numTotalTSV
+
+    return (probCoreToCore, probCoreToMemCtrl, probMemCtrlToCore)
+
+
+def getAvgHopCount(argTSVToTSV, argTSVToMemCtrl, argMemCtrlToTSV, argNumTotalTSV, argNumTotalMemCtrl):
+    # unweighted hop sums -> avg hop count under the traffic mix, works on scalars and arrays
+    numTotalTSV = np.asarray(argNumTotalTSV, dtype=np.float64)
+
+    (probCoreToCore, probCoreToMemCtrl, probMemCtrlToCore) = getTrafficProb(numTotalTSV, argNumTotalMemCtrl)
+
+    hopCountSum = probCoreToCore * argTSVToTSV + probCoreToMemCtrl * argTSVToMemCtrl + \
+        probMemCtrlToCore * argMemCtrlToTSV
+
+    return hopCountSum / (numTotalTSV + argNumTotalMemCtrl)
+
+
+def getLayoutMask(argTSVMaskTable: np.ndarray, argNumTSVTable: np.ndarray, argPatternIndexArray) -> tuple:
+    # (numLayout x numChiplet) pattern numbers -> (TSV membership mask, numTotalTSV) per layout
+    numChiplet = argTSVMaskTable.shape[0]
+
+    patternIndexArray = np.asarray(argPatternIndexArray, dtype=np.intp).reshape(-1, numChiplet)
+    chipletIndex = np.arange(numChiplet)
+
+    tsvMask = argTSVMaskTable[chipletIndex, patternIndexArray].any(axis=1)
+    numTotalTSV = argNumTSVTable[chipletIndex, patternIndexArray].sum(axis=1)
+
+    return (tsvMask, numTotalTSV)
+
+
+class LayoutEvaluator:
+    # scores a batch of TSV layouts on one topology and chiplet arrangement at once
+
+    def __init__(self, argHopDistance: np.ndarray, argChipletNoArray: np.ndarray,
+                 argMemCtrlMask: np.ndarray, argNumTotalMemCtrl: int):
+
+        hopDistance = argHopDistance.astype(np.float64)
+        chipletNoArray = np.asarray(argChipletNoArray)
+
+        self.memCtrlMask = np.asarray(argMemCtrlMask, dtype=bool)
+        self.numTotalMemCtrl = argNumTotalMemCtrl
+
+        # TSV -> TSV traffic only flows between different chiplets
+        isOtherChiplet = chipletNoArray[:, None] != chipletNoArray[None, :]
+        self.tsvToTSVHop = np.where(isOtherChiplet, hopDistance, 0)
+
+        self.tsvToMemCtrlHop = hopDistance[:, self.memCtrlMask].sum(axis=1)
+        self.memCtrlToTSVHop = hopDistance[self.memCtrlMask, :].sum(axis=0)
+
+    def getHopSum(self, argTSVMask: np.ndarray) -> tuple:
+        # unweighted (tsvToTSV, tsvToMemCtrl, memCtrlToTSV) hop sums for each layout
+        tsvMask = np.atleast_2d(argTSVMask) & ~self.memCtrlMask
+        tsvWeight = tsvMask.astype(np.float64)
+
+        tsvToTSV = np.einsum('bn,bn->b', tsvWeight @ self.tsvToTSVHop, tsvWeight)
+        tsvToMemCtrl = tsvWeight @ self.tsvToMemCtrlHop
+        memCtrlToTSV = tsvWeight @ self.memCtrlToTSVHop
+
+        return (tsvToTSV, tsvToMemCtrl, memCtrlToTSV)
+
+    def evaluate(self, argTSVMask: np.ndarray, argNumTotalTSV) -> np.ndarray:
+        # returns avg hop count of every layout (rows of argTSVMask)
+        numTotalTSV = np.asarray(argNumTotalTSV, dtype=np.float64)
+
+        (tsvToTSV, tsvToMemCtrl, memCtrlToTSV) = self.getHopSum(argTSVMask)
+
+        return getAvgHopCount(tsvToTSV, tsvToMemCtrl, memCtrlToTSV, numTotalTSV,
+                              self.numTotalMemCtrl).astype(np.float32)
+
+
+class ScoreTable:
+    # per (chiplet, pattern) and per (chiplet pair, pattern pair) hop sums, so a layout
+    # is scored from O(numChiplet^2) table entries instead of its TSV mask
+
+    def __init__(self, argLayoutEvaluator: LayoutEvaluator, argTSVMaskTable: np.ndarray, argNumTSVTable: np.ndarray):
+
+        (numChiplet, numPattern, numNodes) = argTSVMaskTable.shape
+
+        self.numChiplet = numChiplet
+        self.numPattern = numPattern
+        self.numTSVTable = argNumTSVTable
+        self.numTotalMemCtrl = argLayoutEvaluator.numTotalMemCtrl
+
+        tsvMaskTable = argTSVMaskTable & ~argLayoutEvaluator.memCtrlMask
+
+        # the sums only add up when no node can be a TSV of two chiplets at once,
+        # otherwise the union mask of a layout is not the sum of its chiplets
+        self.isExact = bool((tsvMaskTable.any(axis=1).sum(axis=0) <= 1).all())
+
+        tsvWeight = tsvMaskTable.reshape(numChiplet * numPattern, numNodes).astype(np.float64)
+
+        # hop sums are integers, held exactly in float64 and stored as int64;
+        # weighted distances may not be and stay float64
+        self.isInteger = all(np.array_equal(hop, np.rint(hop)) for hop in
+                             [argLayoutEvaluator.tsvToTSVHop, argLayoutEvaluator.tsvToMemCtrlHop,
+                              argLayoutEvaluator.memCtrlToTSVHop])
+
+        self.tsvToMemCtrlTable = self.__toTable(tsvWeight @ argLayoutEvaluator.tsvToMemCtrlHop) \
+            .reshape(numChiplet, numPattern)
+        self.memCtrlToTSVTable = self.__toTable(tsvWeight @ argLayoutEvaluator.memCtrlToTSVHop) \
+            .reshape(numChiplet, numPattern)
+
+        # [c1, c2, p1, p2]: TSV -> TSV hops from pattern p1 on chiplet c1 to pattern p2 on chiplet c2
+        self.tsvToTSVTable = self.__toTable((tsvWeight @ argLayoutEvaluator.tsvToTSVHop) @ tsvWeight.T) \
+            .reshape(numChiplet, numPattern, numChiplet, numPattern).transpose(0, 2, 1, 3).copy()
+
+    def __toTable(self, argHopSum: np.ndarray) -> np.ndarray:
+        if(self.isInteger):
+            return np.rint(argHopSum).astype(np.int64)
+
+        return argHopSum
+
+    def getHopSum(self, argPatternIndexArray) -> tuple:
+        # same (tsvToTSV, tsvToMemCtrl, memCtrlToTSV) as LayoutEvaluator.getHopSum, from the tables
+        patternIndexArray = np.asarray(argPatternIndexArray, dtype=np.intp).reshape(-1, self.numChiplet)
+        chipletIndex = np.arange(self.numChiplet)
+
+        tsvToMemCtrl = self.tsvToMemCtrlTable[chipletIndex, patternIndexArray].sum(axis=1)
+        memCtrlToTSV = self.memCtrlToTSVTable[chipletIndex, patternIndexArray].sum(axis=1)
+
+        tsvToTSV = np.zeros(len(patternIndexArray), dtype=self.tsvToTSVTable.dtype)
+
+        for srcChipletNo in range(self.numChiplet):
+            for dstChipletNo in range(self.numChiplet):
+                tsvToTSV += self.tsvToTSVTable[srcChipletNo, dstChipletNo,
+                                               patternIndexArray[:, srcChipletNo], patternIndexArray[:, dstChipletNo]]
+
+        return (tsvToTSV.astype(np.float64), tsvToMemCtrl.astype(np.float64), memCtrlToTSV.astype(np.float64))
+
+    def evaluate(self, argPatternIndexArray) -> np.ndarray:
+        # returns avg hop count of every layout (rows of pattern numbers per chiplet)
+        patternIndexArray = np.asarray(argPatternIndexArray, dtype=np.intp).reshape(-1, self.numChiplet)
+        numTotalTSV = self.numTSVTable[np.arange(self.numChiplet), patternIndexArray].sum(axis=1).astype(np.float64)
+
+        (tsvToTSV, tsvToMemCtrl, memCtrlToTSV) = self.getHopSum(patternIndexArray)
+
+        return getAvgHopCount(tsvToTSV, tsvToMemCtrl, memCtrlToTSV, numTotalTSV,
+                              self.numTotalMemCtrl).astype(np.float32)
@@ -0,0 +1,200 @@
+import numpy as np
+import evaluator
+import routing
+
+
+# memory budget of the per source channel flows of one batch
+LINK_LOAD_BATCH_BYTES = 1 << 27
+
+
+def getChannelArray(argTopology) -> tuple:
+    # (srcArray, dstArray) of the directed channels, channel e < numEdges runs srcArray[e] -> dstArray[e]
+    # of the topology's link e, channel e + numEdges the other way
+    return (np.concatenate([argTopology.srcArray, argTopology.dstArray]).astype(np.int64),
+            np.concatenate([argTopology.dstArray, argTopology.srcArray]).astype(np.int64))
+
+
+def getChannelFlow(argChannelArray: tuple, argHopDistance: np.ndarray, argSrcNodeIdArray: np.ndarray,
+                   argDemand: np.ndarray) -> np.ndarray:
+    # (numSources x numChannels x K) flow of argDemand (numSources x numNodes x K, per destination),
+    # split evenly over all shortest paths: one BFS DAG per source, sigma counted forward and the
+    # demand pushed back level by level as in Brandes' betweenness, never enumerating paths
+    (chanSrcArray, chanDstArray) = argChannelArray
+    srcNodeIdArray = np.asarray(argSrcNodeIdArray, dtype=np.int64)
+
+    (numSources, numNodes, numCommodity) = argDemand.shape
+    numChannels = len(chanSrcArray)
+
+    distance = argHopDistance[srcNodeIdArray].astype(np.int64)
+
+    # DAG channels of every source, grouped by the level of their head
+    (dagSourceNo, dagChannelNo) = np.nonzero(distance[:, chanDstArray] == distance[:, chanSrcArray] + 1)
+    dagLevel = distance[dagSourceNo, chanDstArray[dagChannelNo]]
+
+    order = np.argsort(dagLevel, kind='stable')
+    (dagSourceNo, dagChannelNo, dagLevel) = (dagSourceNo[order], dagChannelNo[order], dagLevel[order])
+
+    maxLevel = int(dagLevel.max(initial=0))
+    levelStartArray = np.searchsorted(dagLevel, np.arange(maxLevel + 2))
+
+    tailIndex = dagSourceNo * numNodes + chanSrcArray[dagChannelNo]
+    headIndex = dagSourceNo * numNodes + chanDstArray[dagChannelNo]
+
+    # number of shortest paths from the source, level by level
+    sigma = np.zeros(numSources * numNodes, dtype=np.float64)
+    sigma[np.arange(numSources) * numNodes + srcNodeIdArray] = 1
+
+    for level in range(1, maxLevel + 1):
+        levelSlice = slice(levelStartArray[level], levelStartArray[level + 1])
+        sigma += np.bincount(headIndex[levelSlice], weights=sigma[tailIndex[levelSlice]],
+                             minlength=numSources * numNodes)
+
+    # delta[v]: what reaches v and what still has to pass through it, deepest level first
+    delta = argDemand.reshape(numSources * numNodes, numCommodity).astype(np.float64, copy=True)
+    flow = np.zeros((numSources * numChannels, numCommodity), dtype=np.float64)
+
+    for level in range(maxLevel, 0, -1):
+        levelSlice = slice(levelStartArray[level], levelStartArray[level + 1])
+
+        channelFlow = (sigma[tailIndex[levelSlice]] / sigma[headIndex[levelSlice]])[:, None] * \
+            delta[headIndex[levelSlice]]
+
+        flow[dagSourceNo[levelSlice] * numChannels + dagChannelNo[levelSlice]] = channelFlow
+        np.add.at(delta, tailIndex[levelSlice], channelFlow)
+
+    return flow.reshape(numSources, numChannels, numCommodity)
+
+
+def getSourceBatchSize(argNumChannels: int, argNumCommodity: int) -> int:
+    return max(1, LINK_LOAD_BATCH_BYTES // (8 * max(1, argNumChannels) * max(1, argNumCommodity)))
+
+
+class LinkLoadTable:
+    # per (chiplet, pattern) and per (chiplet pair, pattern pair) channel loads, so the load of
+    # every channel under a layout's traffic is O(numChiplet^2) table rows, like evaluator.ScoreTable;
+    # traffic splits over all shortest paths, or follows argNextHopTable's routes when one is given
+
+    def __init__(self, argChannelArray: tuple, argHopDistance: np.ndarray, argChipletNoArray: np.ndarray,
+                 argMemCtrlMask: np.ndarray, argNumTotalMemCtrl: int,
+                 argTSVMaskTable: np.ndarray, argNumTSVTable: np.ndarray, argNextHopTable: np.ndarray = None):
+
+        (numChiplet, numPattern, numNodes) = argTSVMaskTable.shape
+
+        self.channelArray = argChannelArray
+        self.hopDistance = argHopDistance
+        self.nextHopTable = argNextHopTable
+        self.chipletNoArray = np.asarray(argChipletNoArray)
+        self.memCtrlMask = np.asarray(argMemCtrlMask, dtype=bool)
+        self.numTotalMemCtrl = argNumTotalMemCtrl
+
+        self.numChiplet = numChiplet
+        self.numPattern = numPattern
+        self.tsvMaskTable = argTSVMaskTable
+        self.numTSVTable = argNumTSVTable
+        self.numChannels = len(argChannelArray[0])
+
+        tsvMaskTable = argTSVMaskTable & ~self.memCtrlMask
+
+        # as in ScoreTable, chiplet tables only add up when no node is a TSV of two chiplets,
+        # otherwise every layout goes through getLayoutLoad
+        self.isExact = bool((tsvMaskTable.any(axis=1).sum(axis=0) <= 1).all())
+
+        if(not self.isExact):
+            return
+
+        # every (chiplet, pattern) TSV set and the memory controllers, both as sources and as destinations
+        roleMask = np.concatenate([tsvMaskTable.reshape(numChiplet * numPattern, numNodes),
+                                   self.memCtrlMask[None, :]]).astype(np.float64)
+        numRole = len(roleMask)
+
+        # [role, channel, destination role]
+        roleLoad = np.zeros((numRole, self.numChannels, numRole), dtype=np.float64)
+        srcNodeIdArray = np.flatnonzero(roleMask.any(axis=0))
+        batchSize = getSourceBatchSize(self.numChannels, numRole)
+
+        for start in range(0, len(srcNodeIdArray), batchSize):
+            batchSrcArray = srcNodeIdArray[start:start + batchSize]
+            demand = np.broadcast_to(roleMask.T[None, :, :], (len(batchSrcArray), numNodes, numRole))
+
+            flow = self.__getChannelFlow(batchSrcArray, demand)
+            roleLoad += np.tensordot(roleMask[:, batchSrcArray], flow, axes=(1, 0))
+
+        numTSVRole = numChiplet * numPattern
+
+        # [c1, c2, p1, p2, channel]: TSV -> TSV load from pattern p1 on chiplet c1 to pattern p2 on chiplet c2
+        self.tsvToTSVTable = roleLoad[:numTSVRole, :, :numTSVRole] \
+            .reshape(numChiplet, numPattern, self.numChannels, numChiplet, numPattern) \
+            .transpose(0, 3, 1, 4, 2).copy()
+
+        self.tsvToMemCtrlTable = roleLoad[:numTSVRole, :, numTSVRole].reshape(numChiplet, numPattern, -1)
+        self.memCtrlToTSVTable = roleLoad[numTSVRole, :, :numTSVRole].T.reshape(numChiplet, numPattern, -1)
+
+    def __getChannelFlow(self, argSrcNodeIdArray: np.ndarray, argDemand: np.ndarray) -> np.ndarray:
+        if(self.nextHopTable is None):
+            return getChannelFlow(self.channelArray, self.hopDistance, argSrcNodeIdArray, argDemand)
+
+        return routing.getRoutedChannelFlow(self.channelArray, self.nextHopTable, argSrcNodeIdArray, argDemand)
+
+    def getLoad(self, argPatternIndexArray) -> np.ndarray:
+        # (numLayout x numChannels) expected load of every channel; per injected flit like the
+        # avg hop count, so a layout's channel loads sum up to its score
+        patternIndexArray = np.asarray(argPatternIndexArray, dtype=np.intp).reshape(-1, self.numChiplet)
+        chipletIndex = np.arange(self.numChiplet)
+
+        if(not self.isExact):
+            (tsvMask, numTotalTSV) = evaluator.getLayoutMask(self.tsvMaskTable, self.numTSVTable, patternIndexArray)
+            return self.getLayoutLoad(tsvMask, numTotalTSV)
+
+        numTotalTSV = self.numTSVTable[chipletIndex, patternIndexArray].sum(axis=1).astype(np.float64)
+        (probCoreToCore, probCoreToMemCtrl, probMemCtrlToCore) = \
+            evaluator.getTrafficProb(numTotalTSV, self.numTotalMemCtrl)
+
+        tsvToTSV = np.zeros((len(patternIndexArray), self.numChannels), dtype=np.float64)
+
+        # TSV -> TSV traffic only flows between different chiplets
+        for srcChipletNo in range(self.numChiplet):
+            for dstChipletNo in range(self.numChiplet):
+                if(srcChipletNo != dstChipletNo):
+                    tsvToTSV += self.tsvToTSVTable[srcChipletNo, dstChipletNo, patternIndexArray[:, srcChipletNo],
+                                                   patternIndexArray[:, dstChipletNo]]
+
+        tsvToMemCtrl = self.tsvToMemCtrlTable[chipletIndex, patternIndexArray].sum(axis=1)
+        memCtrlToTSV = self.memCtrlToTSVTable[chipletIndex, patternIndexArray].sum(axis=1)
+
+        load = probCoreToCore[:, None] * tsvToTSV + probCoreToMemCtrl * tsvToMemCtrl + \
+            probMemCtrlToCore[:, None] * memCtrlToTSV
+
+        return load / (numTotalTSV + self.numTotalMemCtrl)[:, None]
+
+    def getLayoutLoad(self, argTSVMask: np.ndarray, argNumTotalTSV) -> np.ndarray:
+        # same loads straight from the TSV masks, one commodity per layout; O(V E) per layout
+        tsvMask = np.atleast_2d(argTSVMask) & ~self.memCtrlMask
+        numTotalTSV = np.asarray(argNumTotalTSV, dtype=np.float64).reshape(-1)
+        numLayout = len(tsvMask)
+        numNodes = tsvMask.shape[1]
+
+        (probCoreToCore, probCoreToMemCtrl, probMemCtrlToCore) = \
+            evaluator.getTrafficProb(numTotalTSV, self.numTotalMemCtrl)
+
+        tsvWeight = tsvMask.T.astype(np.float64)
+        memCtrlWeight = self.memCtrlMask.astype(np.float64)
+
+        load = np.zeros((self.numChannels, numLayout), dtype=np.float64)
+        srcNodeIdArray = np.flatnonzero(tsvMask.any(axis=0) | self.memCtrlMask)
+        batchSize = getSourceBatchSize(self.numChannels, numLayout)
+
+        for start in range(0, len(srcNodeIdArray), batchSize):
+            batchSrcArray = srcNodeIdArray[start:start + batchSize]
+
+            # (source, destination, layout) demand of every source's role in every layout
+            isOtherChiplet = self.chipletNoArray[batchSrcArray, None] != self.chipletNoArray[None, :]
+            isSrcTSV = tsvWeight[batchSrcArray][:, None, :]
+
+            demand = isSrcTSV * (probCoreToCore * tsvWeight[None, :, :] * isOtherChiplet[:, :, None] +
+                                 probCoreToMemCtrl * memCtrlWeight[None, :, None]) + \
+                memCtrlWeight[batchSrcArray][:, None, None] * probMemCtrlToCore * tsvWeight[None, :, :]
+
+            load += self.__getChannelFlow(batchSrcArray,
+                                          demand.reshape(len(batchSrcArray), numNodes, numLayout)).sum(axis=0)
+
+        return (load / (numTotalTSV + self.numTotalMemCtrl)).T
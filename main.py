@@ -1,11 +1,26 @@
+import argparse
 import configparser
+import os
+import random
+import sys
+import batch
+import bench
 import sim
+import profiler
 
 
-def parseConfig(argPath):
+COMMAND_LIST = ['sweep', 'render', 'optimize', 'search', 'monte-carlo', 'resilience', 'merge', 'batch', 'bench']
+
+
+def parseConfig(argPath, argIsPrint: bool = True):
 
     config = configparser.ConfigParser()
-    config.read(argPath, encoding='utf-8')
+
+    if(not config.read(argPath, encoding='utf-8')):
+        raise FileNotFoundError(f"cannot read config {argPath}")
+
+    if(not argIsPrint):
+        return config
 
     print("===== Configurations =====")
 
@@ -24,13 +39,263 @@ def parseConfig(argPath):
     return config
 
 
+def parseShard(argValue: str) -> tuple:
+    # 'i/N' -> (i, N)
+    try:
+        (shardNo, numShards) = map(int, argValue.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected SHARD/NUM_SHARDS, got {argValue}")
+
+    if(not 0 <= shardNo < numShards):
+        raise argparse.ArgumentTypeError(f"shard {shardNo} does not exist among {numShards} shards")
+
+    return (shardNo, numShards)
+
+
+def getParser() -> argparse.ArgumentParser:
+    # options every HopSim command shares
+    runParser = argparse.ArgumentParser(add_help=False)
+    runParser.add_argument('--quiet', action='store_true',
+                           help='do not print the configuration, or the per scenario report of batch')
+    runParser.add_argument('--workers', type=int, default=1,
+                           help='number of worker processes for the layout sweep and the rendering')
+    runParser.add_argument('--cache-dir', default=None,
+                           help='keep hop distance matrices in this directory across runs')
+    runParser.add_argument('--cache-size', type=int, default=4096,
+                           help='size cap of --cache-dir in MB, least recently used entries are evicted')
+    runParser.add_argument('--profile', default=None, metavar='PATH',
+                           help='record phase timings, hot path counters and peak RSS to this file')
+    runParser.add_argument('--profile-format', choices=['json', 'chrome'], default='json',
+                           help='plain JSON report or Chrome trace events (chrome://tracing, Perfetto)')
+
+    # and those of a single configuration
+    commonParser = argparse.ArgumentParser(add_help=False, parents=[runParser])
+    commonParser.add_argument('--config', default='config.ini',
+                              help='configuration file of the topologies, chiplets and TSV patterns')
+
+    # topology images, drawn by render and optionally after sweep
+    renderParser = argparse.ArgumentParser(add_help=False)
+    renderParser.add_argument('--render-color', choices=['none', 'kind', 'load'], default='none',
+                              help='color the topology images by node kind, or also the links by their channel '
+                                   'load of the bottleneck layout (computes the link loads)')
+    renderParser.add_argument('--render-dir', default='.',
+                              help='write the topology images to this directory')
+
+    parser = argparse.ArgumentParser(description='average hop counts of TSV layouts on chiplet interposer networks; '
+                                                 'without a command, sweeps and renders like "sweep --render"')
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+
+    sweepParser = subparsers.add_parser('sweep', parents=[commonParser, renderParser],
+                                        help='score every TSV layout on every topology')
+    sweepParser.add_argument('--output', default=None,
+                             help='stream per-layout results to this .csv file or .parquet directory')
+    sweepParser.add_argument('--resume', action='store_true',
+                             help='keep the rows already in --output and only compute the missing ones')
+    sweepParser.add_argument('--plot', default='result.png', metavar='PATH',
+                             help='scatter plot of the avg hop counts per topology')
+    sweepParser.add_argument('--no-plot', action='store_true',
+                             help='skip the plot, matplotlib is then never loaded')
+    sweepParser.add_argument('--render', action='store_true',
+                             help='also draw every topology, as the render command does')
+    sweepParser.add_argument('--link-load', action='store_true',
+                             help='also report the ECMP channel loads of every layout under the same traffic mix')
+    sweepParser.add_argument('--link-load-output', default=None, metavar='PATH',
+                             help='write the per channel loads of --link-load to this .npz file')
+    sweepParser.add_argument('--queueing', action='store_true',
+                             help='also report M/D/1 latency vs injection rate curves and saturation rates from the '
+                                  'channel loads, the rates are set in the [queueing] section')
+    sweepParser.add_argument('--shard', type=parseShard, default=None, metavar='I/N',
+                             help='only sweep the I-th of N equal parts of the (topology, isSquare, layout) items into '
+                                  '--output, the merge command reports and plots the parts together')
+    sweepParser.add_argument('--seed', type=int, default=None,
+                             help='random seed of the isolated TSV placements, the shards of a sweep must share it '
+                                  '(0 with --shard)')
+
+    subparsers.add_parser('render', parents=[commonParser, renderParser],
+                          help='draw every topology of the configuration')
+
+    optimizeParser = subparsers.add_parser('optimize', parents=[commonParser],
+                                           help='search TSV positions instead of sweeping the fixed patterns')
+    optimizeParser.add_argument('method', nargs='?', choices=['anneal', 'greedy'], default='anneal',
+                                help='local search method')
+    optimizeParser.add_argument('--initial-layout', nargs='+', default=None, metavar='PATTERN',
+                                help='TSV pattern per chiplet the optimizer starts from')
+    optimizeParser.add_argument('--max-moves', type=int, default=None,
+                                help='move budget, 100000 when no budget is given')
+    optimizeParser.add_argument('--time-budget', type=float, default=None,
+                                help='time budget in seconds, per topology and chiplet shape')
+    optimizeParser.add_argument('--placement-output', default=None,
+                                help='write the best placements and their best-so-far traces to this JSON file')
+    optimizeParser.add_argument('--seed', type=int, default=0,
+                                help='random seed of the moves')
+
+    searchParser = subparsers.add_parser('search', parents=[commonParser],
+                                         help='exact best and worst layouts and the score distribution')
+    searchParser.add_argument('-k', type=int, default=10,
+                              help='number of best and worst layouts to report')
+    searchParser.add_argument('--bins', type=int, default=20,
+                              help='histogram bins')
+    searchParser.add_argument('--samples', type=int, default=1 << 20,
+                              help='layouts drawn for the stddev and histogram when they cannot be enumerated')
+    searchParser.add_argument('--seed', type=int, default=0,
+                              help='random seed of the drawn layouts')
+
+    monteCarloParser = subparsers.add_parser('monte-carlo', parents=[commonParser],
+                                             help='estimate the topology means from random layouts')
+    monteCarloParser.add_argument('samples', type=int,
+                                  help='random layouts and isolated placements per topology and chiplet shape')
+    monteCarloParser.add_argument('--seed', type=int, default=0,
+                                  help='random seed of the samples')
+
+    resilienceParser = subparsers.add_parser('resilience', parents=[commonParser],
+                                             help='avg hop count loss and disconnected endpoints under link failures')
+    resilienceParser.add_argument('--failures', type=int, default=1,
+                                  help='links failed together in every sampled set')
+    resilienceParser.add_argument('--samples', type=int, default=1000,
+                                  help='failure sets drawn per topology')
+    resilienceParser.add_argument('--target', choices=['random', 'long'], default='random',
+                                  help='fail any link, or only links spanning more than one node pitch '
+                                       '(folded torus and butterfly links)')
+    resilienceParser.add_argument('--seed', type=int, default=0,
+                                  help='random seed of the failure sets')
+
+    mergeParser = subparsers.add_parser('merge', parents=[commonParser],
+                                        help='report and plot the outputs of sharded sweeps like one sweep')
+    mergeParser.add_argument('shards', nargs='+', metavar='SHARD',
+                             help='--output of every shard, the configuration must be the one they ran')
+    mergeParser.add_argument('--plot', default='result.png', metavar='PATH',
+                             help='scatter plot of the avg hop counts per topology')
+    mergeParser.add_argument('--no-plot', action='store_true',
+                             help='skip the plot, matplotlib is then never loaded')
+
+    batchParser = subparsers.add_parser('batch', parents=[runParser],
+                                        help='sweep many configurations, sharing their distances and tables')
+    batchParser.add_argument('configs', nargs='+', metavar='CONFIG',
+                             help='configuration files, directories of *.ini files or glob patterns')
+    batchParser.add_argument('--output', default=None,
+                             help='write the rows of every configuration with a config column to this .csv file '
+                                  'or .parquet directory')
+
+    benchParser = subparsers.add_parser('bench', help='time the topology builders, node typing, scoring and sweeps')
+    benchParser.add_argument('--config', default='config.ini',
+                             help='base configuration, its topologies, chiplet shapes and pattern names are benched')
+    bench.addArguments(benchParser)
+
+    return parser
+
+
+def runCommand(argArgs: argparse.Namespace, argParser: argparse.ArgumentParser) -> int:
+
+    if('batch' == argArgs.command):
+        phaseProfiler = profiler.PhaseProfiler() if argArgs.profile else None
+
+        try:
+            resultDict = batch.runBatch(argArgs.configs, argArgs.output, argArgs.workers, argArgs.cache_dir,
+                                        argArgs.cache_size << 20, phaseProfiler)
+        except sim.ConfigError as error:
+            argParser.error(str(error))
+        finally:
+            if(phaseProfiler):
+                phaseProfiler.write(argArgs.profile, argArgs.profile_format)
+
+        if(not argArgs.quiet):
+            batch.printBatchResult(resultDict)
+
+        return 0
+
+    if(not os.path.isfile(argArgs.config)):
+        argParser.error(f"config {argArgs.config} does not exist")
+
+    if('bench' == argArgs.command):
+        return bench.runCommand(argArgs, bench.getBaseConfig(argArgs, argParser))
+
+    if('resilience' == argArgs.command and (argArgs.failures < 1 or argArgs.samples < 1)):
+        argParser.error('--failures and --samples must be at least 1')
+
+    if('sweep' == argArgs.command and argArgs.resume and None == argArgs.output):
+        argParser.error('--resume needs --output')
+
+    if('sweep' == argArgs.command and None != argArgs.shard):
+        if(None == argArgs.output):
+            argParser.error('--shard needs --output, one per shard')
+
+        if(argArgs.render or argArgs.link_load or None != argArgs.link_load_output or argArgs.queueing):
+            argParser.error('--shard only sweeps the avg hop counts, --render, --link-load and --queueing need the '
+                            'whole sweep')
+
+    # the isolated placements are drawn from the random module
+    if('sweep' == argArgs.command and (None != argArgs.seed or None != argArgs.shard)):
+        random.seed(0 if None == argArgs.seed else argArgs.seed)
+
+    config = parseConfig(argArgs.config, not argArgs.quiet)
+
+    phaseProfiler = profiler.PhaseProfiler() if argArgs.profile else None
+
+    try:
+        hopSim = sim.HopSim(config, argNumWorkers=argArgs.workers,
+                            argOutputPath=getattr(argArgs, 'output', None),
+                            argResume=getattr(argArgs, 'resume', False), argCacheDir=argArgs.cache_dir,
+                            argCacheMaxBytes=argArgs.cache_size << 20, argProfiler=phaseProfiler)
+
+        match argArgs.command:
+            case 'sweep':
+                with hopSim.profiler.phase('run'):
+                    hopSim.run(argArgs.link_load or (argArgs.render and 'load' == argArgs.render_color),
+                               argArgs.link_load_output, argArgs.queueing,
+                               None if argArgs.no_plot else argArgs.plot, argArgs.shard)
+
+            case 'render':
+                # link loads come from a sweep, run it without its plot first
+                if('load' == argArgs.render_color):
+                    with hopSim.profiler.phase('run'):
+                        hopSim.run(True, argPlotPath=None)
+
+            case 'optimize':
+                with hopSim.profiler.phase('optimize'):
+                    hopSim.optimize(argArgs.method, argArgs.initial_layout, argArgs.max_moves, argArgs.time_budget,
+                                    argArgs.seed, argArgs.placement_output)
+
+            case 'search':
+                with hopSim.profiler.phase('search'):
+                    hopSim.search(argArgs.k, argArgs.bins, argArgs.samples, argArgs.seed)
+
+            case 'monte-carlo':
+                with hopSim.profiler.phase('monteCarlo'):
+                    hopSim.runMonteCarlo(argArgs.samples, argArgs.seed)
+
+            case 'merge':
+                with hopSim.profiler.phase('merge'):
+                    hopSim.mergeShards(argArgs.shards, None if argArgs.no_plot else argArgs.plot)
+
+            case 'resilience':
+                with hopSim.profiler.phase('resilience'):
+                    hopSim.runResilience(argArgs.failures, argArgs.samples, argArgs.target, argArgs.seed)
+
+        if('render' == argArgs.command or ('sweep' == argArgs.command and argArgs.render)):
+            os.makedirs(argArgs.render_dir, exist_ok=True)
+
+            with hopSim.profiler.phase('visualize'):
+                hopSim.visualize(argArgs.render_color, argArgs.render_dir)
+    except sim.ConfigError as error:
+        # what the configuration or the options ask for cannot be done, e.g. too many layouts to sweep
+        argParser.error(str(error))
+    finally:
+        # a failed run still leaves its phases behind
+        if(phaseProfiler):
+            phaseProfiler.write(argArgs.profile, argArgs.profile_format)
+
+    return 0
+
+
 if (__name__ == '__main__'):
 
-    config = parseConfig('config.ini')
+    parser = getParser()
+    argList = sys.argv[1:]
 
-    hopSim = sim.HopSim(config)
+    # without a command it keeps doing what it always did, sweep and draw
+    if(not argList or (argList[0] not in COMMAND_LIST and argList[0] not in ['-h', '--help'])):
+        argList = ['sweep', '--render'] + argList
 
-    hopSim.run()
+    args = parser.parse_args(argList)
 
-    hopSim.visualize()
-    #hopSim.checkNodeType()
+    sys.exit(runCommand(args, parser))
@@ -0,0 +1,85 @@
+import numpy as np
+import evaluator
+from sweep import MAX_CHUNK_MASK_BYTES, SweepJob, getLayoutEvaluator
+
+
+# two-sided 95% quantile of the standard normal distribution
+CONFIDENCE_Z = 1.959963984540054
+
+
+def getSampleMaskBatch(argRng: np.random.Generator, argJob: SweepJob, argChipletOffsetArray: np.ndarray,
+                       argChipletDispArray: np.ndarray, argNumTSVPerChiplet: int,
+                       argIsolatedPatternNo: int, argNumSamples: int) -> tuple:
+    # (TSV mask, numTotalTSV) of uniformly drawn layouts, every isolated chiplet
+    # of every sample gets its own placement drawn without replacement
+    numLayout = len(argJob.patternIndexArray if argJob.layoutClassArray is None else argJob.layoutClassArray)
+    layoutArray = argRng.integers(numLayout, size=argNumSamples)
+
+    if(argJob.layoutClassArray is not None):
+        layoutArray = argJob.layoutClassArray[layoutArray]
+
+    patternIndexArray = argJob.patternIndexArray[layoutArray]
+
+    if(None == argIsolatedPatternNo):
+        return evaluator.getLayoutMask(argJob.tsvMaskTable, argJob.numTSVTable, patternIndexArray)
+
+    # the job's own isolated draw is left out, fresh ones are added below
+    tsvMaskTable = argJob.tsvMaskTable.copy()
+    tsvMaskTable[:, argIsolatedPatternNo] = False
+    numTSVTable = argJob.numTSVTable.copy()
+    numTSVTable[:, argIsolatedPatternNo] = 0
+
+    (tsvMask, numTotalTSV) = evaluator.getLayoutMask(tsvMaskTable, numTSVTable, patternIndexArray)
+
+    # the first k of a random key ordering is a uniform k-subset, for all samples at once
+    numChiplet = len(argChipletOffsetArray)
+    sampleKey = argRng.random((argNumSamples, numChiplet, len(argChipletDispArray)))
+    dispNoArray = np.argpartition(sampleKey, argNumTSVPerChiplet - 1, axis=2)[:, :, :argNumTSVPerChiplet]
+
+    tsvNodeIdArray = argChipletOffsetArray[None, :, None] + argChipletDispArray[dispNoArray]
+    isIsolated = np.broadcast_to((patternIndexArray == argIsolatedPatternNo)[:, :, None], tsvNodeIdArray.shape)
+    sampleNoArray = np.broadcast_to(np.arange(argNumSamples)[:, None, None], tsvNodeIdArray.shape)
+
+    tsvMask[sampleNoArray[isIsolated], tsvNodeIdArray[isIsolated]] = True
+    numTotalTSV = numTotalTSV + argNumTSVPerChiplet * (patternIndexArray == argIsolatedPatternNo).sum(axis=1)
+
+    return (tsvMask, numTotalTSV)
+
+
+def runMonteCarlo(argJob: SweepJob, argChipletOffsetArray: np.ndarray, argChipletDispArray: np.ndarray,
+                  argNumTSVPerChiplet: int, argIsolatedPatternNo: int, argNumSamples: int,
+                  argSeed) -> np.ndarray:
+    # avg hop counts of argNumSamples random (layout, isolated placement) draws,
+    # the same seed always gives the same samples
+    rng = np.random.default_rng(argSeed)
+    layoutEvaluator = getLayoutEvaluator(argJob)
+
+    chipletOffsetArray = np.asarray(argChipletOffsetArray, dtype=np.int64)
+    chipletDispArray = np.asarray(argChipletDispArray, dtype=np.int64)
+
+    # the random keys outweigh the mask itself
+    sampleBytes = len(argJob.memCtrlMask) + 8 * len(chipletOffsetArray) * len(chipletDispArray)
+    batchSize = max(1, MAX_CHUNK_MASK_BYTES // sampleBytes)
+
+    avgHopCountArray = np.empty(argNumSamples, dtype=np.float32)
+
+    for start in range(0, argNumSamples, batchSize):
+        stop = min(start + batchSize, argNumSamples)
+
+        (tsvMask, numTotalTSV) = getSampleMaskBatch(rng, argJob, chipletOffsetArray, chipletDispArray,
+                                                    argNumTSVPerChiplet, argIsolatedPatternNo, stop - start)
+        avgHopCountArray[start:stop] = layoutEvaluator.evaluate(tsvMask, numTotalTSV)
+
+    return avgHopCountArray
+
+
+def getSampleStats(argAvgHopCountArray: np.ndarray) -> tuple:
+    # (mean, variance, ciLow, ciHigh) with a normal 95% confidence interval of the mean
+    avgHopCountArray = np.asarray(argAvgHopCountArray, dtype=np.float64)
+    numSamples = len(avgHopCountArray)
+
+    mean = avgHopCountArray.mean()
+    variance = avgHopCountArray.var(ddof=1) if numSamples > 1 else 0.0
+    halfWidth = CONFIDENCE_Z * np.sqrt(variance / max(1, numSamples))
+
+    return (mean, variance, mean - halfWidth, mean + halfWidth)
@@ -0,0 +1,200 @@
+import time
+import numpy as np
+import evaluator
+
+
+class PlacementOptimizer:
+    # moves one TSV at a time inside its chiplet, keeping the per chiplet TSV counts;
+    # hop sums are tracked as integers so the score never drifts from a full evaluation
+
+    def __init__(self, argLayoutEvaluator: evaluator.LayoutEvaluator, argChipletNoArray: np.ndarray,
+                 argTSVMask: np.ndarray, argNumTotalTSV: int, argSeed=0):
+
+        self.rng = np.random.default_rng(argSeed)
+
+        # integer valued float64, shared with the evaluator instead of copied
+        self.tsvToTSVHop = argLayoutEvaluator.tsvToTSVHop
+        self.tsvToMemCtrlHop = argLayoutEvaluator.tsvToMemCtrlHop
+        self.memCtrlToTSVHop = argLayoutEvaluator.memCtrlToTSVHop
+
+        self.numTotalTSV = int(argNumTotalTSV)
+        self.numTotalMemCtrl = argLayoutEvaluator.numTotalMemCtrl
+
+        (self.probCoreToCore, self.probCoreToMemCtrl, self.probMemCtrlToCore) = \
+            [float(prob) for prob in evaluator.getTrafficProb(self.numTotalTSV, self.numTotalMemCtrl)]
+
+        # TSVs on MEMCTRL nodes are ignored by the evaluator, so they never move
+        tsvMask = np.asarray(argTSVMask, dtype=bool) & ~argLayoutEvaluator.memCtrlMask
+        chipletNoArray = np.asarray(argChipletNoArray)
+        self.chipletNoArray = chipletNoArray
+        isMovable = (chipletNoArray >= 0) & ~argLayoutEvaluator.memCtrlMask
+
+        # per chiplet slot array holding its TSV nodes first, then its free nodes
+        self.slotList = []
+        self.numTSVList = []
+        self.slotNoArray = np.full(len(tsvMask), -1, dtype=np.int64)
+
+        for chipletNo in range(int(chipletNoArray.max(initial=-1)) + 1):
+            nodeIdArray = np.flatnonzero(isMovable & (chipletNoArray == chipletNo))
+            slotArray = np.concatenate([nodeIdArray[tsvMask[nodeIdArray]], nodeIdArray[~tsvMask[nodeIdArray]]])
+
+            self.slotList.append(slotArray)
+            self.numTSVList.append(int(tsvMask[nodeIdArray].sum()))
+            self.slotNoArray[slotArray] = np.arange(len(slotArray))
+
+        # a TSV is picked uniformly among those that have somewhere to go
+        moveWeight = np.array([numTSV if numTSV < len(slotArray) else 0
+                               for (numTSV, slotArray) in zip(self.numTSVList, self.slotList)], dtype=np.float64)
+        self.chipletProb = moveWeight / moveWeight.sum() if moveWeight.sum() > 0 else None
+
+        self.tsvMask = tsvMask
+        tsvWeight = tsvMask.astype(np.float64)
+
+        # hop sum from every node to the current TSVs, kept up to date per move
+        self.tsvHopSumArray = self.tsvToTSVHop @ tsvWeight
+        self.tsvToTSV = int(tsvWeight @ self.tsvHopSumArray)
+        self.tsvToMemCtrl = int(self.tsvToMemCtrlHop @ tsvWeight)
+        self.memCtrlToTSV = int(self.memCtrlToTSVHop @ tsvWeight)
+
+        self.bestScore = self.getScore()
+        self.bestTSVMask = self.tsvMask.copy()
+        self.numMoves = 0
+        self.traceList = [(0, 0.0, self.bestScore)]
+
+    def getScore(self) -> float:
+        hopCountSum = self.probCoreToCore * self.tsvToTSV + self.probCoreToMemCtrl * self.tsvToMemCtrl + \
+            self.probMemCtrlToCore * self.memCtrlToTSV
+
+        return float(np.float32(hopCountSum / (self.numTotalTSV + self.numTotalMemCtrl)))
+
+    def getMoveDeltaArray(self, argSrcNodeId: int, argDstNodeIdArray: np.ndarray) -> np.ndarray:
+        # score change of moving the TSV at argSrcNodeId to each free node of argDstNodeIdArray, O(len(dst))
+        tsvToTSVDelta = 2 * (self.tsvHopSumArray[argDstNodeIdArray] - self.tsvHopSumArray[argSrcNodeId] -
+                             self.tsvToTSVHop[argSrcNodeId, argDstNodeIdArray])
+        tsvToMemCtrlDelta = self.tsvToMemCtrlHop[argDstNodeIdArray] - self.tsvToMemCtrlHop[argSrcNodeId]
+        memCtrlToTSVDelta = self.memCtrlToTSVHop[argDstNodeIdArray] - self.memCtrlToTSVHop[argSrcNodeId]
+
+        return (self.probCoreToCore * tsvToTSVDelta + self.probCoreToMemCtrl * tsvToMemCtrlDelta +
+                self.probMemCtrlToCore * memCtrlToTSVDelta) / (self.numTotalTSV + self.numTotalMemCtrl)
+
+    def move(self, argSrcNodeId: int, argDstNodeId: int, argElapsed: float = 0.0):
+        # O(numNodes): one column update of the hop sums
+        self.tsvToTSV += 2 * int(self.tsvHopSumArray[argDstNodeId] - self.tsvHopSumArray[argSrcNodeId] -
+                                 self.tsvToTSVHop[argSrcNodeId, argDstNodeId])
+        self.tsvToMemCtrl += int(self.tsvToMemCtrlHop[argDstNodeId] - self.tsvToMemCtrlHop[argSrcNodeId])
+        self.memCtrlToTSV += int(self.memCtrlToTSVHop[argDstNodeId] - self.memCtrlToTSVHop[argSrcNodeId])
+
+        self.tsvHopSumArray += self.tsvToTSVHop[:, argDstNodeId] - self.tsvToTSVHop[:, argSrcNodeId]
+
+        self.tsvMask[argSrcNodeId] = False
+        self.tsvMask[argDstNodeId] = True
+
+        # both nodes belong to the same chiplet, swap their slots
+        slotArray = self.slotList[self.chipletNoArray[argSrcNodeId]]
+        (srcSlotNo, dstSlotNo) = (self.slotNoArray[argSrcNodeId], self.slotNoArray[argDstNodeId])
+
+        (slotArray[srcSlotNo], slotArray[dstSlotNo]) = (argDstNodeId, argSrcNodeId)
+        (self.slotNoArray[argSrcNodeId], self.slotNoArray[argDstNodeId]) = (dstSlotNo, srcSlotNo)
+
+        self.numMoves += 1
+
+        score = self.getScore()
+
+        if(score < self.bestScore):
+            self.bestScore = score
+            self.bestTSVMask = self.tsvMask.copy()
+            self.traceList.append((self.numMoves, argElapsed, score))
+
+    def __getRandomTSV(self) -> tuple:
+        # (chipletNo, TSV node) drawn uniformly among the movable TSVs
+        chipletNo = int(self.rng.choice(len(self.slotList), p=self.chipletProb))
+
+        return (chipletNo, int(self.slotList[chipletNo][self.rng.integers(self.numTSVList[chipletNo])]))
+
+    def __getFreeNodeArray(self, argChipletNo: int) -> np.ndarray:
+        return self.slotList[argChipletNo][self.numTSVList[argChipletNo]:]
+
+    def anneal(self, argMaxMoves: int = None, argTimeBudget: float = None,
+               argStartTemp: float = None, argEndTempRatio: float = 1e-3) -> float:
+        # simulated annealing with a geometric schedule over whichever budget runs out first
+        if(self.chipletProb is None or (None == argMaxMoves and None == argTimeBudget)):
+            return self.bestScore
+
+        startTemp = argStartTemp
+
+        if(None == startTemp):
+            # about the size of a typical uphill move
+            deltaList = []
+
+            for _ in range(64):
+                (chipletNo, srcNodeId) = self.__getRandomTSV()
+                freeNodeArray = self.__getFreeNodeArray(chipletNo)
+
+                deltaList.append(self.getMoveDeltaArray(srcNodeId, freeNodeArray[self.rng.integers(len(freeNodeArray))]))
+
+            startTemp = max(float(np.mean(np.abs(deltaList))), 1e-12)
+
+        startTime = time.perf_counter()
+        moveNo = 0
+
+        while(True):
+            elapsed = time.perf_counter() - startTime
+            progress = max(moveNo / argMaxMoves if argMaxMoves else 0.0,
+                           elapsed / argTimeBudget if argTimeBudget else 0.0)
+
+            if(progress >= 1.0):
+                break
+
+            temp = startTemp * argEndTempRatio ** progress
+
+            (chipletNo, srcNodeId) = self.__getRandomTSV()
+            freeNodeArray = self.__getFreeNodeArray(chipletNo)
+            dstNodeId = int(freeNodeArray[self.rng.integers(len(freeNodeArray))])
+
+            delta = float(self.getMoveDeltaArray(srcNodeId, dstNodeId))
+
+            if(delta <= 0 or self.rng.random() < np.exp(-delta / temp)):
+                self.move(srcNodeId, dstNodeId, elapsed)
+
+            moveNo += 1
+
+        return self.bestScore
+
+    def greedy(self, argMaxMoves: int = None, argTimeBudget: float = None) -> float:
+        # best improving destination for each TSV in turn, until a full pass finds nothing
+        if(self.chipletProb is None):
+            return self.bestScore
+
+        startTime = time.perf_counter()
+        moveNo = 0
+        isImproved = True
+
+        while(isImproved):
+            isImproved = False
+
+            tsvList = [(chipletNo, int(nodeId)) for (chipletNo, slotArray) in enumerate(self.slotList)
+                       for nodeId in slotArray[:self.numTSVList[chipletNo]]]
+
+            for tsvNo in self.rng.permutation(len(tsvList)):
+                (chipletNo, srcNodeId) = tsvList[tsvNo]
+                elapsed = time.perf_counter() - startTime
+
+                if((argMaxMoves and moveNo >= argMaxMoves) or (argTimeBudget and elapsed >= argTimeBudget)):
+                    return self.bestScore
+
+                freeNodeArray = self.__getFreeNodeArray(chipletNo)
+
+                if(len(freeNodeArray) == 0):
+                    continue
+
+                deltaArray = self.getMoveDeltaArray(srcNodeId, freeNodeArray)
+                bestNo = int(np.argmin(deltaArray))
+
+                # float noise must not make two equal placements swap forever
+                if(deltaArray[bestNo] < -1e-12):
+                    self.move(srcNodeId, int(freeNodeArray[bestNo]), elapsed)
+                    isImproved = True
+
+                moveNo += 1
+
+        return self.bestScore
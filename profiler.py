@@ -0,0 +1,163 @@
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+
+# shared by every disabled phase, entering it does nothing
+_NULL_CONTEXT = nullcontext()
+
+
+def getRSSBytes() -> tuple:
+    # (current, peak) resident set size, current is only known where /proc is
+    peakRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    if(sys.platform != 'darwin'):
+        peakRSS *= 1024
+
+    try:
+        with open('/proc/self/statm') as statmFile:
+            currentRSS = int(statmFile.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        currentRSS = None
+
+    return (currentRSS, peakRSS)
+
+
+class NullProfiler:
+    # stands in when profiling is off, every hook is a no-op
+
+    isEnabled = False
+
+    def phase(self, argName: str, **argArgs):
+        return _NULL_CONTEXT
+
+    def addPhase(self, argName: str, argStartTime: float, **argArgs):
+        pass
+
+    def count(self, argName: str, argNum: int = 1):
+        pass
+
+
+class PhaseProfiler(NullProfiler):
+    # nested wall time phases, event counters and RSS samples of one run
+
+    isEnabled = True
+
+    def __init__(self):
+
+        self.startTime = time.perf_counter()
+
+        # (name, start, duration, depth, args, rss at the end), start relative to startTime
+        self.phaseList = []
+        self.counterDict = {}
+        self.depth = 0
+        self.peakRSSBytes = 0
+
+    def __getRSSArgs(self) -> dict:
+        (currentRSS, peakRSS) = getRSSBytes()
+
+        # the two come from different counters, keep the peak consistent with what was sampled
+        peakRSS = max(peakRSS, currentRSS or 0)
+        self.peakRSSBytes = max(self.peakRSSBytes, peakRSS)
+
+        return {'rssBytes': currentRSS, 'peakRSSBytes': peakRSS}
+
+    @contextmanager
+    def phase(self, argName: str, **argArgs):
+        startTime = time.perf_counter()
+        depth = self.depth
+        self.depth += 1
+
+        try:
+            yield
+        finally:
+            self.depth = depth
+            self.phaseList.append((argName, startTime - self.startTime, time.perf_counter() - startTime,
+                                   depth, argArgs, self.__getRSSArgs()))
+
+    def addPhase(self, argName: str, argStartTime: float, **argArgs):
+        # phase from argStartTime (a time.perf_counter() value) until now, for spans a with block cannot wrap
+        self.phaseList.append((argName, argStartTime - self.startTime, time.perf_counter() - argStartTime,
+                               self.depth, argArgs, self.__getRSSArgs()))
+
+    def count(self, argName: str, argNum: int = 1):
+        self.counterDict[argName] = self.counterDict.get(argName, 0) + argNum
+
+    def getSummary(self, argField: str = None) -> dict:
+        # per phase name, or per value of args[argField] and phase name: calls, total and max seconds
+        summaryDict = {}
+
+        for (name, _, duration, _, args, _) in self.phaseList:
+            if(None == argField):
+                nameSummaryDict = summaryDict
+            elif(argField in args):
+                nameSummaryDict = summaryDict.setdefault(str(args[argField]), {})
+            else:
+                continue
+
+            summary = nameSummaryDict.setdefault(name, {'numCalls': 0, 'totalTime': 0.0, 'maxTime': 0.0})
+            summary['numCalls'] += 1
+            summary['totalTime'] += duration
+            summary['maxTime'] = max(summary['maxTime'], duration)
+
+        return summaryDict
+
+    def getReport(self) -> dict:
+        self.__getRSSArgs()
+
+        # phases in start order, a parent comes before its children
+        phaseList = sorted(self.phaseList, key=lambda phase: (phase[1], phase[3]))
+
+        return {'wallTime': time.perf_counter() - self.startTime,
+                'peakRSSBytes': self.peakRSSBytes,
+                'counterDict': dict(self.counterDict),
+                'summary': self.getSummary(),
+                'topologySummary': self.getSummary('topology'),
+                'phaseList': [{'name': name, 'start': start, 'duration': duration, 'depth': depth,
+                               'args': args, **rssArgs,
+                               # layouts are scored in vectorized chunks, this is the chunk's share per layout
+                               **({'timePerLayout': duration / args['numLayouts']}
+                                  if args.get('numLayouts') else {})}
+                              for (name, start, duration, depth, args, rssArgs) in phaseList]}
+
+    def getChromeTrace(self) -> dict:
+        # trace event format, loads in chrome://tracing and Perfetto
+        pid = os.getpid()
+        eventList = []
+
+        for (name, start, duration, depth, args, rssArgs) in self.phaseList:
+            eventList.append({'name': name, 'cat': 'phase', 'ph': 'X', 'pid': pid, 'tid': 0,
+                              'ts': start * 1e6, 'dur': duration * 1e6, 'args': args})
+
+            if(None != rssArgs['rssBytes']):
+                eventList.append({'name': 'rss', 'ph': 'C', 'pid': pid, 'tid': 0, 'ts': (start + duration) * 1e6,
+                                  'args': {'MB': rssArgs['rssBytes'] / (1 << 20)}})
+
+        endTime = (time.perf_counter() - self.startTime) * 1e6
+
+        eventList.append({'name': 'counters', 'ph': 'C', 'pid': pid, 'tid': 0, 'ts': endTime,
+                          'args': dict(self.counterDict)})
+
+        # parents first when a phase starts together with its first child
+        eventList.sort(key=lambda event: (event['ts'], -event.get('dur', 0)))
+
+        return {'traceEvents': eventList, 'displayTimeUnit': 'ms',
+                'otherData': {'peakRSSBytes': self.peakRSSBytes}}
+
+    def write(self, argPath: str, argFormat: str = 'json'):
+        match argFormat:
+            case 'json':
+                report = self.getReport()
+
+            case 'chrome':
+                report = self.getChromeTrace()
+
+            case _:
+                raise ValueError(f"unknown profile format {argFormat}")
+
+        with open(argPath, 'w') as profileFile:
+            json.dump(report, profileFile, indent=1)
@@ -0,0 +1,44 @@
+import numpy as np
+from sweep import MAX_CHUNK_MASK_BYTES
+
+
+# Every channel is an M/D/1 server moving one flit per cycle. Channel loads come per injected flit
+# (linkload.LinkLoadTable), every TSV and memory controller injects argInjectionRate flits per cycle,
+# so channel e is busy rho_e = rate * numEndpoints * load_e of the time. A flit spends one cycle
+# on every channel it takes plus the M/D/1 wait rho / (2 (1 - rho)), which gives the avg hop count
+# at zero load and diverges when the busiest channel saturates.
+
+
+def getSaturationRate(argMaxLoad, argNumEndpoints) -> np.ndarray:
+    # per endpoint injection rate at which the busiest channel is busy every cycle
+    maxLoad = np.asarray(argMaxLoad, dtype=np.float64)
+
+    with np.errstate(divide='ignore'):
+        return 1 / (maxLoad * np.asarray(argNumEndpoints, dtype=np.float64))
+
+
+def getLatencyCurve(argChannelLoad: np.ndarray, argNumEndpoints, argRateArray) -> np.ndarray:
+    # (numLayout x numRates) mean packet latency in cycles, inf at and past saturation
+    channelLoad = np.atleast_2d(np.asarray(argChannelLoad, dtype=np.float64))
+    numEndpoints = np.broadcast_to(np.asarray(argNumEndpoints, dtype=np.float64), (len(channelLoad),))
+    rateArray = np.asarray(argRateArray, dtype=np.float64).reshape(-1)
+
+    (numLayout, numChannels) = channelLoad.shape
+    latency = np.empty((numLayout, len(rateArray)), dtype=np.float64)
+
+    # (layout, rate, channel) utilizations are the big temporary, bounded like the sweep's chunks
+    chunkSize = max(1, MAX_CHUNK_MASK_BYTES // (8 * max(1, numChannels) * max(1, len(rateArray))))
+
+    for start in range(0, numLayout, chunkSize):
+        load = channelLoad[start:start + chunkSize]
+        utilization = (numEndpoints[start:start + chunkSize, None] * rateArray[None, :])[:, :, None] * \
+            load[:, None, :]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            wait = np.where(utilization < 1, utilization / (2 * (1 - utilization)), np.inf)
+
+        # unused channels add nothing, even when some other channel saturated
+        waitSum = np.where(load[:, None, :] > 0, load[:, None, :] * wait, 0).sum(axis=2)
+        latency[start:start + chunkSize] = load.sum(axis=1)[:, None] + waitSum
+
+    return latency
@@ -0,0 +1,145 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from topology import NodeKind
+
+
+KIND_COLOR_DICT = {NodeKind.NORMAL: 'lightblue', NodeKind.TSV: 'orange', NodeKind.MEMCTRL: 'lightgreen'}
+
+# node labels stop being readable past this
+MAX_LABELED_NODES = 1024
+
+
+@dataclass
+class RenderJob:
+    # everything one topology image needs, plain arrays so jobs pickle cheaply to the workers
+    path: str
+    posArray: np.ndarray
+    srcArray: np.ndarray
+    dstArray: np.ndarray
+    kindArray: np.ndarray = None
+    linkLoad: np.ndarray = None
+    title: str = None
+
+
+def getNodePosArray(argNumXDimNodes: int, argNumYDimNodes: int) -> np.ndarray:
+    # (numNodes x 2) drawing positions, row 0 (the memory controllers) on top
+    nodeIdArray = np.arange(argNumXDimNodes * argNumYDimNodes)
+
+    return np.stack([nodeIdArray % argNumXDimNodes,
+                     argNumYDimNodes - 1 - nodeIdArray // argNumXDimNodes], axis=1).astype(np.float64)
+
+
+def getLinkLoad(argChannelLoad: np.ndarray) -> np.ndarray:
+    # per link load of linkload's channel order, the busier of its two directions
+    numEdges = len(argChannelLoad) // 2
+
+    return np.maximum(argChannelLoad[:numEdges], argChannelLoad[numEdges:])
+
+
+def getLoadColormap():
+    # light gray to black, so even idle links stay visible next to the kind colored nodes
+    from matplotlib import colormaps
+    from matplotlib.colors import ListedColormap
+
+    return ListedColormap(colormaps['Greys'](np.linspace(0.25, 1, 256)))
+
+
+def renderTopology(argJob: RenderJob) -> str:
+    # matplotlib is only loaded by the processes that draw, Agg needs no display
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+    from matplotlib.lines import Line2D
+
+    posArray = argJob.posArray
+    (numXDimNodes, numYDimNodes) = posArray.max(axis=0) + 1
+    numNodes = len(posArray)
+
+    # default figure for small grids, about 0.4 inch per node beyond that
+    figure = Figure(figsize=(max(6.4, 0.4 * numXDimNodes), max(4.8, 0.4 * numYDimNodes)))
+    FigureCanvasAgg(figure)
+    # room on top for the title or the kind legend
+    isHeader = bool(argJob.title) or argJob.kindArray is not None
+    axes = figure.add_axes((0.02, 0.02, 0.96, 0.9) if isHeader else (0.02, 0.02, 0.96, 0.96))
+    axes.set_axis_off()
+
+    if(argJob.title):
+        axes.set_title(argJob.title)
+
+    # node size in points^2, shrinking with the spacing so large grids do not overlap
+    (widthInch, heightInch) = figure.get_size_inches()
+    spacing = 72 * min(widthInch / numXDimNodes, heightInch / numYDimNodes)
+    nodeSize = min(200, (0.6 * spacing) ** 2)
+
+    segmentArray = np.stack([posArray[argJob.srcArray], posArray[argJob.dstArray]], axis=1)
+
+    if(argJob.linkLoad is None):
+        lineCollection = LineCollection(segmentArray, colors='gray', linewidths=1, zorder=1)
+    else:
+        lineCollection = LineCollection(segmentArray, cmap=getLoadColormap(), linewidths=1.5, zorder=1)
+        lineCollection.set_array(np.asarray(argJob.linkLoad, dtype=np.float64))
+        figure.colorbar(lineCollection, ax=axes, shrink=0.8, label='max channel load')
+
+    axes.add_collection(lineCollection)
+
+    if(argJob.kindArray is None):
+        nodeColor = 'lightblue'
+    else:
+        nodeColor = [KIND_COLOR_DICT[NodeKind(int(kind))] for kind in argJob.kindArray]
+        axes.legend(handles=[Line2D([], [], marker='o', linestyle='', color=color, label=kind.name)
+                             for (kind, color) in KIND_COLOR_DICT.items()],
+                    loc='lower right', bbox_to_anchor=(1, 1), ncol=len(KIND_COLOR_DICT), fontsize='small',
+                    frameon=False)
+
+    axes.scatter(posArray[:, 0], posArray[:, 1], s=nodeSize, c=nodeColor, zorder=2)
+
+    if(numNodes <= MAX_LABELED_NODES):
+        fontSize = min(12, 0.85 * np.sqrt(nodeSize))
+
+        for (nodeId, (posX, posY)) in enumerate(posArray):
+            axes.text(posX, posY, str(nodeId), fontsize=fontSize, ha='center', va='center', zorder=3)
+
+    axes.set_xlim(-0.5, numXDimNodes - 0.5)
+    axes.set_ylim(-0.5, numYDimNodes - 0.5)
+
+    figure.savefig(argJob.path)
+
+    return argJob.path
+
+
+def renderTopologyList(argJobList: list, argNumWorkers: int = 1) -> list:
+    # images are independent, each worker draws on its own figures
+    if(argNumWorkers <= 1 or len(argJobList) <= 1):
+        return [renderTopology(job) for job in argJobList]
+
+    with ProcessPoolExecutor(max_workers=min(argNumWorkers, len(argJobList))) as executor:
+        return list(executor.map(renderTopology, argJobList))
+
+
+def saveResultPlot(argPath: str, argTopologyList: list, argHopCountListList: list):
+    # avg hop count of every layout per topology, plus the topology means
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+
+    axes.set_ylim(0, 8)
+
+    topologyIndexList = list(range(len(argTopologyList)))
+
+    for (topologyIndex, hopCountList) in zip(topologyIndexList, argHopCountListList):
+        axes.scatter([topologyIndex] * len(hopCountList), hopCountList, s = 30, color = 'blue')
+
+    meanList = [np.mean(hopCountList) for hopCountList in argHopCountListList]
+    axes.plot(topologyIndexList, meanList, marker = 's', linestyle = '--', color = 'orange')
+
+    axes.set_xticks(topologyIndexList, argTopologyList)
+
+    axes.set_xlabel("NoI Topology")
+    axes.set_ylabel("Averge Hop Count")
+    axes.set_title("Average Hop Counts Of Different NoI Topologies")
+
+    figure.savefig(argPath)
@@ -0,0 +1,213 @@
+import numpy as np
+import distance
+import evaluator
+import sweep
+from copy import copy
+from dataclasses import replace
+from topology import Topology
+
+
+# marks an unreachable pair in the int32 distances of a failure set
+UNREACHABLE = -1
+
+# memory budget of the (sources x nodes x degree) parent count temporary
+PARENT_COUNT_BATCH_BYTES = 1 << 26
+
+
+class IncrementalDistance:
+    # all pairs hop distances of a topology with some of its links failed. A source's distances only
+    # change when some node loses every shortest path parent, so only those sources run a new BFS.
+    # The baseline matrix the sweep job already holds is the only numNodes^2 array: parents are counted
+    # on demand for the nodes a failure set touches, and a set yields only the rows it changed
+
+    def __init__(self, argEdgeArray: tuple, argNumNodes: int, argHopDistance: np.ndarray):
+
+        (srcArray, dstArray) = argEdgeArray
+
+        self.srcArray = np.asarray(srcArray, dtype=np.int64)
+        self.dstArray = np.asarray(dstArray, dtype=np.int64)
+        self.numNodes = argNumNodes
+
+        self.hopDistance = np.asarray(argHopDistance)
+
+        if((self.hopDistance == np.iinfo(self.hopDistance.dtype).max).any()):
+            raise ValueError("link failures need a connected topology to start from")
+
+        topology = Topology(argNumNodes)
+        topology.addEdgeArray(self.srcArray, self.dstArray)
+        self.neighborTable = distance.getNeighborTable(topology)
+
+    def __getNumParent(self, argNodeIdArray: np.ndarray) -> np.ndarray:
+        # [source, i]: neighbors of node argNodeIdArray[i] one hop closer to source
+        neighborArray = self.neighborTable[argNodeIdArray]
+        isNeighbor = neighborArray < self.numNodes
+        neighborArray = np.where(isNeighbor, neighborArray, 0)
+
+        numParent = np.empty((self.numNodes, len(argNodeIdArray)), dtype=np.int16)
+        batchSize = max(1, PARENT_COUNT_BATCH_BYTES // (4 * neighborArray.size))
+
+        for start in range(0, self.numNodes, batchSize):
+            distanceBatch = self.hopDistance[start:start + batchSize]
+            isParent = (distanceBatch[:, neighborArray].astype(np.int32) + 1 ==
+                        distanceBatch[:, argNodeIdArray, None]) & isNeighbor
+            numParent[start:start + batchSize] = isParent.sum(axis=2)
+
+        return numParent
+
+    def getAffectedMask(self, argFailedEdgeArray) -> np.ndarray:
+        # per source, whether removing the failed links changes any of its distances
+        failedEdgeArray = np.asarray(argFailedEdgeArray, dtype=np.int64)
+        (srcArray, dstArray) = (self.srcArray[failedEdgeArray], self.dstArray[failedEdgeArray])
+
+        # every failed link counts against the node at its far end, seen from each source
+        nearArray = np.concatenate([srcArray, dstArray])
+        farArray = np.concatenate([dstArray, srcArray])
+        isLostParent = self.hopDistance[:, nearArray].astype(np.int32) + 1 == self.hopDistance[:, farArray]
+
+        (nodeArray, nodeIndexArray) = np.unique(farArray, return_inverse=True)
+        numLostParent = np.zeros((self.numNodes, len(nodeArray)), dtype=np.int16)
+        np.add.at(numLostParent.T, nodeIndexArray, isLostParent.T)
+
+        return ((numLostParent > 0) & (numLostParent == self.__getNumParent(nodeArray))).any(axis=1)
+
+    def getDistance(self, argFailedEdgeArray) -> tuple:
+        # (int32 hop distance rows with UNREACHABLE marks, affected source ids) with the failed links
+        # removed; every other row, and by symmetry every other column, keeps its baseline distances
+        affectedNodeIdArray = np.flatnonzero(self.getAffectedMask(argFailedEdgeArray))
+
+        if(0 == len(affectedNodeIdArray)):
+            return (np.empty((0, self.numNodes), dtype=np.int32), affectedNodeIdArray)
+
+        isAlive = np.ones(len(self.srcArray), dtype=bool)
+        isAlive[np.asarray(argFailedEdgeArray, dtype=np.int64)] = False
+
+        topology = Topology(self.numNodes)
+        topology.addEdgeArray(self.srcArray[isAlive], self.dstArray[isAlive])
+
+        hopRows = distance.getHopDistanceMatrix(topology, affectedNodeIdArray)
+
+        return (np.where(hopRows == np.iinfo(hopRows.dtype).max, UNREACHABLE, hopRows.astype(np.int32)),
+                affectedNodeIdArray)
+
+
+def getDisconnectedPairCount(argHopRows: np.ndarray, argAffectedNodeIdArray: np.ndarray,
+                             argEndpointMask: np.ndarray, argChipletNoArray: np.ndarray) -> np.ndarray:
+    # per row of the (numLayout x numNodes) endpoint mask, unordered endpoint pairs that could carry traffic
+    # (different chiplets, or a memory controller) and no longer reach each other; only affected sources
+    # can have lost anyone
+    (rowNo, dstNodeIdArray) = np.nonzero(argHopRows == UNREACHABLE)
+    srcNodeIdArray = argAffectedNodeIdArray[rowNo]
+
+    isCandidate = (argChipletNoArray[srcNodeIdArray] != argChipletNoArray[dstNodeIdArray]) & \
+        (srcNodeIdArray < dstNodeIdArray)
+    (srcNodeIdArray, dstNodeIdArray) = (srcNodeIdArray[isCandidate], dstNodeIdArray[isCandidate])
+
+    endpointMask = np.asarray(argEndpointMask, dtype=bool)
+
+    return (endpointMask[..., srcNodeIdArray] & endpointMask[..., dstNodeIdArray]).sum(axis=-1)
+
+
+class FailureEvaluator:
+    # (avg hop count over the pairs still connected, disconnected traffic per injected flit) of every
+    # layout of a job under failure sets. Only the distances among the affected sources change, so the
+    # job's score tables are shifted by the hop sums of that block instead of being rebuilt
+
+    def __init__(self, argJob: sweep.SweepJob):
+
+        self.job = argJob
+        self.isTable = sweep.isTableJob(argJob)
+
+        (numChiplet, numPattern, numNodes) = argJob.tsvMaskTable.shape
+        self.tsvWeight = (argJob.tsvMaskTable & ~argJob.memCtrlMask).reshape(numChiplet * numPattern, numNodes) \
+            .astype(np.float64)
+
+        # the 0/1 unreachable matrix under the same traffic model counts the traffic with nowhere to go,
+        # its baseline tables are all zero
+        if(self.isTable):
+            self.zeroScoreTable = copy(argJob.scoreTable)
+
+            for name in ['tsvToTSVTable', 'tsvToMemCtrlTable', 'memCtrlToTSVTable']:
+                setattr(self.zeroScoreTable, name, np.zeros_like(getattr(argJob.scoreTable, name)))
+
+    def __getScoreTable(self, argBaseScoreTable, argDeltaBlock: np.ndarray,
+                        argAffectedNodeIdArray: np.ndarray) -> evaluator.ScoreTable:
+        # argBaseScoreTable with the distances among the affected nodes shifted by the symmetric argDeltaBlock
+        (numChiplet, numPattern) = argBaseScoreTable.tsvToMemCtrlTable.shape
+        tsvWeight = self.tsvWeight[:, argAffectedNodeIdArray]
+
+        chipletNoArray = self.job.chipletNoArray[argAffectedNodeIdArray]
+        isMemCtrl = self.job.memCtrlMask[argAffectedNodeIdArray]
+
+        tsvToTSVDelta = tsvWeight @ np.where(chipletNoArray[:, None] != chipletNoArray[None, :], argDeltaBlock, 0) \
+            @ tsvWeight.T
+        tsvToMemCtrlDelta = tsvWeight @ argDeltaBlock[:, isMemCtrl].sum(axis=1)
+        memCtrlToTSVDelta = tsvWeight @ argDeltaBlock[isMemCtrl].sum(axis=0)
+
+        scoreTable = copy(argBaseScoreTable)
+
+        for (name, delta) in [('tsvToTSVTable', tsvToTSVDelta.reshape(numChiplet, numPattern, numChiplet, numPattern)
+                               .transpose(0, 2, 1, 3)),
+                              ('tsvToMemCtrlTable', tsvToMemCtrlDelta.reshape(numChiplet, numPattern)),
+                              ('memCtrlToTSVTable', memCtrlToTSVDelta.reshape(numChiplet, numPattern))]:
+            table = getattr(argBaseScoreTable, name)
+
+            if(np.issubdtype(table.dtype, np.integer)):
+                delta = np.rint(delta).astype(table.dtype)
+
+            setattr(scoreTable, name, table + delta)
+
+        return scoreTable
+
+    def evaluate(self, argHopRows: np.ndarray, argAffectedNodeIdArray: np.ndarray) -> tuple:
+        # under the rows IncrementalDistance.getDistance yields; a pair can only lose its path when both
+        # ends are affected, so the unreachable marks lie in the block as well
+        if(not self.isTable):
+            return self.__evaluateMatrix(argHopRows, argAffectedNodeIdArray)
+
+        numLayouts = len(self.job.patternIndexArray)
+
+        hopBlock = argHopRows[:, argAffectedNodeIdArray]
+        isUnreachable = hopBlock == UNREACHABLE
+
+        deltaBlock = np.where(isUnreachable, 0, hopBlock) - \
+            self.job.hopDistance[np.ix_(argAffectedNodeIdArray, argAffectedNodeIdArray)].astype(np.int64)
+
+        hopJob = replace(self.job, scoreTable=self.__getScoreTable(self.job.scoreTable, deltaBlock,
+                                                                   argAffectedNodeIdArray))
+        avgHopCountArray = sweep.evaluateJob(hopJob, 0, numLayouts)
+
+        if(not isUnreachable.any()):
+            return (avgHopCountArray, np.zeros(numLayouts, dtype=np.float32))
+
+        lostJob = replace(self.job, scoreTable=self.__getScoreTable(self.zeroScoreTable, isUnreachable.astype(np.int64),
+                                                                    argAffectedNodeIdArray))
+
+        return (avgHopCountArray, sweep.evaluateJob(lostJob, 0, numLayouts))
+
+    def __evaluateMatrix(self, argHopRows: np.ndarray, argAffectedNodeIdArray: np.ndarray) -> tuple:
+        # jobs without exact score tables are scored from their TSV masks, on whole matrices
+        hopDistance = self.job.hopDistance.astype(np.int32)
+        hopDistance[argAffectedNodeIdArray] = argHopRows
+        isUnreachable = hopDistance == UNREACHABLE
+
+        numLayouts = len(self.job.patternIndexArray)
+        avgHopCountArray = sweep.evaluateJob(replace(self.job, hopDistance=np.where(isUnreachable, 0, hopDistance),
+                                                     scoreTable=None), 0, numLayouts)
+
+        if(not isUnreachable.any()):
+            return (avgHopCountArray, np.zeros(numLayouts, dtype=np.float32))
+
+        return (avgHopCountArray, sweep.evaluateJob(replace(self.job, hopDistance=isUnreachable.astype(np.uint8),
+                                                            scoreTable=None), 0, numLayouts))
+
+
+def getFailureSetArray(argRng: np.random.Generator, argCandidateEdgeArray: np.ndarray, argNumFailures: int,
+                       argNumSamples: int) -> np.ndarray:
+    # (numSamples x numFailures) distinct links per set, drawn uniformly from the candidates
+    if(argNumFailures > len(argCandidateEdgeArray)):
+        raise ValueError(f"cannot fail {argNumFailures} of {len(argCandidateEdgeArray)} candidate links")
+
+    keyArray = argRng.random((argNumSamples, len(argCandidateEdgeArray)))
+
+    return argCandidateEdgeArray[np.argpartition(keyArray, argNumFailures - 1, axis=1)[:, :argNumFailures]]
+
@@ -0,0 +1,161 @@
+import csv
+import json
+import os
+import numpy as np
+
+
+RESULT_COLUMN_LIST = ['topology', 'isSquare', 'tsvLayout', 'avgHopCount']
+
+
+def getPartPathList(argPath: str) -> list:
+    return sorted(os.path.join(argPath, fileName) for fileName in os.listdir(argPath)
+                  if fileName.startswith('part-') and fileName.endswith('.parquet'))
+
+
+def readMeta(argPath: str) -> dict:
+    # the run metadata next to a result file, None when there is none
+    metaPath = argPath + '.meta.json'
+
+    if(not os.path.exists(metaPath)):
+        return None
+
+    with open(metaPath) as file:
+        return json.load(file)
+
+
+def readResultDict(argPath: str) -> dict:
+    # {(topology, isSquare, tsvLayout): avgHopCount} of every row of a result file
+    resultDict = {}
+
+    if(argPath.endswith('.csv')):
+        with open(argPath, newline='') as file:
+            for row in csv.DictReader(file):
+                resultDict[(row['topology'], int(row['isSquare']), row['tsvLayout'])] = \
+                    np.float32(float(row['avgHopCount']))
+    else:
+        import pyarrow.parquet as pq
+
+        for partPath in getPartPathList(argPath):
+            table = pq.read_table(partPath).to_pydict()
+
+            for (topology, isSquare, tsvLayout, avgHopCount) in zip(*[table[column] for column in RESULT_COLUMN_LIST]):
+                resultDict[(topology, int(isSquare), tsvLayout)] = np.float32(avgHopCount)
+
+    return resultDict
+
+
+class ResultSink:
+    # streams one (topology, isSquare, tsvLayout, avgHopCount) row per layout to disk,
+    # CSV for a *.csv path, otherwise a directory of Parquet part files (needs pyarrow);
+    # argScenarioColumn prepends a column naming the scenario of every row
+
+    def __init__(self, argPath: str, argResume: bool = False, argBufferSize: int = 8192,
+                 argScenarioColumn: str = None):
+
+        self.path = argPath
+        self.metaPath = argPath + '.meta.json'
+        self.isCSV = argPath.endswith('.csv')
+        self.resume = argResume
+        self.bufferSize = argBufferSize
+        self.columnList = RESULT_COLUMN_LIST
+
+        if(None != argScenarioColumn):
+            self.columnList = [argScenarioColumn] + RESULT_COLUMN_LIST
+
+        self.rowBuffer = []
+        self.numPart = 0
+
+        if(not self.isCSV):
+            # fail before any work is done
+            import pyarrow
+
+        if(not argResume):
+            self.__removeExisting()
+
+        if(self.isCSV):
+            self.__prepareCSV()
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            # continue numbering after the last existing part
+            self.numPart = 1 + max([int(os.path.basename(partPath)[5:-8]) for partPath in self.__getPartPathList()],
+                                   default=-1)
+
+    def __removeExisting(self):
+        if(self.isCSV and os.path.exists(self.path)):
+            os.remove(self.path)
+
+        if(not self.isCSV and os.path.isdir(self.path)):
+            for partPath in self.__getPartPathList():
+                os.remove(partPath)
+
+        if(os.path.exists(self.metaPath)):
+            os.remove(self.metaPath)
+
+    def __prepareCSV(self):
+        # a run killed mid-write can leave a partial last line, cut it off
+        if(os.path.exists(self.path)):
+            with open(self.path, 'rb+') as file:
+                content = file.read()
+                file.truncate(content.rfind(b'\n') + 1)
+
+        if(not os.path.exists(self.path) or os.path.getsize(self.path) == 0):
+            with open(self.path, 'w', newline='') as file:
+                csv.writer(file).writerow(self.columnList)
+
+    def __getPartPathList(self) -> list:
+        return getPartPathList(self.path)
+
+    def loadMeta(self) -> dict:
+        return readMeta(self.path)
+
+    def saveMeta(self, argMeta: dict):
+        with open(self.metaPath + '.tmp', 'w') as file:
+            json.dump(argMeta, file)
+
+        os.replace(self.metaPath + '.tmp', self.metaPath)
+
+    def getDoneDict(self) -> dict:
+        # {(topology, isSquare, tsvLayout): avgHopCount} of every row already on disk
+        if(not self.resume):
+            return {}
+
+        return readResultDict(self.path)
+
+    def write(self, argTopology: str, argIsSquare: int, argTSVLayoutList: list, argAvgHopCountArray,
+              argScenario: str = None):
+        # tsvLayout is stored as the pattern names joined by spaces
+        scenarioTuple = () if len(self.columnList) == len(RESULT_COLUMN_LIST) else (argScenario,)
+
+        for (tsvLayout, avgHopCount) in zip(argTSVLayoutList, argAvgHopCountArray):
+            self.rowBuffer.append(scenarioTuple + (argTopology, int(argIsSquare), tsvLayout, float(avgHopCount)))
+
+        if(len(self.rowBuffer) >= self.bufferSize):
+            self.flush()
+
+    def flush(self):
+        if(not self.rowBuffer):
+            return
+
+        if(self.isCSV):
+            with open(self.path, 'a', newline='') as file:
+                csv.writer(file).writerows(self.rowBuffer)
+                file.flush()
+                os.fsync(file.fileno())
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.table({column: list(values) for (column, values) in
+                              zip(self.columnList, zip(*self.rowBuffer))})
+
+            # written under a temporary name so a killed run never leaves a broken part
+            partPath = os.path.join(self.path, f"part-{self.numPart:06d}.parquet")
+            pq.write_table(table, partPath + '.tmp')
+            os.replace(partPath + '.tmp', partPath)
+
+            self.numPart += 1
+
+        self.rowBuffer.clear()
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,268 @@
+import numpy as np
+import distance
+from topology import Topology
+
+
+# Deterministic routing is kept as a next hop table: nextHop[node, destination] is the neighbor a
+# packet at node moves to on its way to destination, the node itself at the destination and -1
+# when the destination cannot be reached. Routed hop counts and channel loads come from walking
+# the table one hop per step for many (node, destination) pairs at once.
+
+ROUTING_ALGORITHM_LIST = ['xy', 'updown']
+
+# memory budget of the (nodes x degree x destinations) temporaries of one table batch
+ROUTING_BATCH_BYTES = 1 << 26
+
+# memory budget of the (sources x destinations) walk of one routed hop batch
+ROUTE_WALK_BATCH_BYTES = 1 << 26
+
+# unreachable while building a table, half the int32 range so one more hop cannot overflow
+ROUTE_INF = np.iinfo(np.int32).max // 2
+
+
+def getNodeIdDtype(argNumNodes: int):
+    # smallest signed dtype that fits every node id and the -1 marker
+    if(argNumNodes < np.iinfo(np.int16).max):
+        return np.int16
+
+    return np.int32
+
+
+def isAxisAligned(argTopology: Topology, argNumXDimNodes: int) -> bool:
+    # every link runs along a row or a column of the node grid
+    (srcIndexY, srcIndexX) = np.divmod(argTopology.srcArray.astype(np.int64), argNumXDimNodes)
+    (dstIndexY, dstIndexX) = np.divmod(argTopology.dstArray.astype(np.int64), argNumXDimNodes)
+
+    return bool(((srcIndexX == dstIndexX) | (srcIndexY == dstIndexY)).all())
+
+
+def getRoutingTable(argAlgorithm: str, argTopology: Topology, argNumXDimNodes: int) -> np.ndarray:
+    match argAlgorithm:
+        case 'xy':
+            return getDimensionOrderTable(argTopology, argNumXDimNodes)
+
+        case 'updown':
+            return getUpDownTable(argTopology)
+
+        case _:
+            raise ValueError(f"unknown routing algorithm: {argAlgorithm}")
+
+
+def getShortestNextHopTable(argTopology: Topology) -> np.ndarray:
+    # minimal routing towards the lowest numbered neighbor one hop closer to the destination
+    numNodes = argTopology.numNodes
+    neighborTable = distance.getNeighborTable(argTopology)
+    nodeIdArray = np.arange(numNodes)
+
+    hopMatrix = distance.getHopDistanceMatrix(argTopology)
+
+    # the padding row of the neighbor table never wins
+    hopDistance = np.full((numNodes + 1, numNodes), ROUTE_INF, dtype=np.int32)
+    hopDistance[:numNodes] = np.where(hopMatrix == np.iinfo(hopMatrix.dtype).max, ROUTE_INF, hopMatrix)
+
+    nextHopTable = np.empty((numNodes, numNodes), dtype=getNodeIdDtype(numNodes))
+    batchSize = max(1, ROUTING_BATCH_BYTES // (4 * numNodes * neighborTable.shape[1]))
+
+    for start in range(0, numNodes, batchSize):
+        batchNodeIdArray = nodeIdArray[start:start + batchSize]
+        batchNeighborTable = neighborTable[batchNodeIdArray]
+
+        # neighbor lists are sorted, argmin keeps the first of the closest
+        slotArray = hopDistance[batchNeighborTable].argmin(axis=1)
+        nextHop = np.take_along_axis(batchNeighborTable, slotArray, axis=1)
+
+        nextHop = np.where(hopDistance[batchNodeIdArray] < ROUTE_INF, nextHop, -1)
+        nextHopTable[batchNodeIdArray] = np.where(batchNodeIdArray[:, None] == nodeIdArray[None, :],
+                                                  batchNodeIdArray[:, None], nextHop)
+
+    return nextHopTable
+
+
+def getDimensionOrderTable(argTopology: Topology, argNumXDimNodes: int) -> np.ndarray:
+    # XY routing: minimal along the row to the destination's column, then minimal along that column;
+    # rows and columns may be rings (folded torus), so the shorter way around is taken
+    if(not isAxisAligned(argTopology, argNumXDimNodes)):
+        raise ValueError("dimension order routing needs every link along a row or a column")
+
+    numNodes = argTopology.numNodes
+    nodeIdArray = np.arange(numNodes)
+
+    isHorizontal = argTopology.srcArray // argNumXDimNodes == argTopology.dstArray // argNumXDimNodes
+
+    rowTopology = Topology(numNodes)
+    rowTopology.addEdgeArray(argTopology.srcArray[isHorizontal], argTopology.dstArray[isHorizontal])
+
+    columnTopology = Topology(numNodes)
+    columnTopology.addEdgeArray(argTopology.srcArray[~isHorizontal], argTopology.dstArray[~isHorizontal])
+
+    rowNextHopTable = getShortestNextHopTable(rowTopology)
+    columnNextHopTable = getShortestNextHopTable(columnTopology)
+
+    # [node, destination]: the node in node's row and destination's column, where the packet turns
+    turnNodeIdArray = (nodeIdArray // argNumXDimNodes * argNumXDimNodes)[:, None] + \
+        (nodeIdArray % argNumXDimNodes)[None, :]
+
+    return np.where(turnNodeIdArray == nodeIdArray[:, None], columnNextHopTable,
+                    rowNextHopTable[nodeIdArray[:, None], turnNodeIdArray])
+
+
+def getUpDownTable(argTopology: Topology, argRootNodeId: int = 0) -> np.ndarray:
+    # up*/down* routing: links point up towards the root by BFS level, then node id; a route takes
+    # its up hops before any down hop, so no cycle of channel dependencies can form. Packets go down
+    # as soon as a down-only route exists and take the shortest one, otherwise they climb towards
+    # the closest node that has one; routes can be longer than minimal
+    numNodes = argTopology.numNodes
+    neighborTable = distance.getNeighborTable(argTopology)
+    nodeIdArray = np.arange(numNodes)
+
+    levelArray = distance.getHopDistanceMatrix(argTopology, [argRootNodeId])[0]
+
+    # the padding neighbor ranks last, it is never up
+    rankArray = np.full(numNodes + 1, numNodes, dtype=np.int64)
+    rankArray[np.lexsort((nodeIdArray, levelArray))] = nodeIdArray
+
+    isUp = rankArray[neighborTable] < rankArray[:numNodes, None]
+    isDown = ~isUp & (neighborTable < numNodes)
+
+    # both tables keep the sorted neighbor order, padded with numNodes
+    upNeighborTable = np.where(isUp, neighborTable, numNodes)
+    downNeighborTable = np.where(isDown, neighborTable, numNodes)
+
+    # [node, destination] hops of the shortest down-only route and the next hop on it; down links
+    # lead to higher ranks, so walking the ranks backwards every neighbor row is final when read.
+    # The padding row stays unreachable
+    rankOrder = np.lexsort((nodeIdArray, levelArray))
+    routeHop = np.full((numNodes + 1, numNodes), ROUTE_INF, dtype=np.int32)
+    nextHopTable = np.empty((numNodes, numNodes), dtype=getNodeIdDtype(numNodes))
+
+    for nodeId in rankOrder[::-1]:
+        neighborArray = downNeighborTable[nodeId]
+        neighborHop = routeHop[neighborArray]
+
+        # argmin keeps the lowest numbered of the closest neighbors
+        slotArray = neighborHop.argmin(axis=0)
+        routeHop[nodeId] = np.minimum(ROUTE_INF, 1 + neighborHop[slotArray, nodeIdArray])
+        routeHop[nodeId, nodeId] = 0
+        nextHopTable[nodeId] = neighborArray[slotArray]
+
+    # without a down-only route the packet climbs, towards lower ranks, which are final in rank order
+    isClimbingTable = routeHop[:numNodes] == ROUTE_INF
+
+    for nodeId in rankOrder:
+        isClimbing = isClimbingTable[nodeId]
+
+        if(not isClimbing.any()):
+            continue
+
+        neighborArray = upNeighborTable[nodeId]
+        neighborHop = routeHop[neighborArray][:, isClimbing]
+
+        slotArray = neighborHop.argmin(axis=0)
+        routeHop[nodeId, isClimbing] = np.minimum(ROUTE_INF, 1 + neighborHop[slotArray, np.arange(len(slotArray))])
+        nextHopTable[nodeId, isClimbing] = neighborArray[slotArray]
+
+    nextHopTable[routeHop[:numNodes] == ROUTE_INF] = -1
+    nextHopTable[nodeIdArray, nodeIdArray] = nodeIdArray
+
+    return nextHopTable
+
+
+def getRoutedHopMatrix(argNextHopTable: np.ndarray, argSrcNodeIdArray=None) -> np.ndarray:
+    # (numSources x numNodes) hop counts along the routes, unreachable pairs are marked with the max
+    # value of the returned dtype as in distance.getHopDistanceMatrix. Routes to one destination form
+    # a tree, so hop counts double along it: after k rounds every node knows its 2^k-th successor
+    # and the hops up to it
+    numNodes = len(argNextHopTable)
+    nodeIdArray = np.arange(numNodes)
+
+    hopMatrix = np.empty((numNodes, numNodes), dtype=np.int32)
+    batchSize = max(1, ROUTE_WALK_BATCH_BYTES // (8 * (numNodes + 1)))
+
+    for start in range(0, numNodes, batchSize):
+        dstNodeIdArray = nodeIdArray[start:start + batchSize]
+        columnArray = np.arange(len(dstNodeIdArray))
+
+        # unreachable destinations lead into the extra last row, which never gets anywhere
+        successor = np.full((numNodes + 1, len(dstNodeIdArray)), numNodes, dtype=np.int32)
+        successor[:numNodes] = argNextHopTable[:, dstNodeIdArray]
+        successor[successor < 0] = numNodes
+
+        hop = np.ones((numNodes + 1, len(dstNodeIdArray)), dtype=np.int32)
+        hop[numNodes] = ROUTE_INF
+        hop[dstNodeIdArray, columnArray] = 0
+
+        # a loop free route has fewer hops than there are nodes
+        for _ in range(numNodes.bit_length()):
+            isArrived = (successor[:numNodes] == dstNodeIdArray[None, :]) | (successor[:numNodes] == numNodes)
+
+            if(isArrived.all()):
+                break
+
+            hop = np.minimum(ROUTE_INF, hop + np.take_along_axis(hop, successor, axis=0))
+            successor = np.take_along_axis(successor, successor, axis=0)
+
+        if(((successor[:numNodes] != dstNodeIdArray[None, :]) & (hop[:numNodes] < ROUTE_INF)).any()):
+            raise ValueError("the routing table loops")
+
+        hopMatrix[:, start:start + batchSize] = np.where(hop[:numNodes] < ROUTE_INF, hop[:numNodes], -1)
+
+    if(argSrcNodeIdArray is not None):
+        hopMatrix = hopMatrix[np.asarray(argSrcNodeIdArray, dtype=np.int64).ravel()]
+
+    routedHopMatrix = hopMatrix.astype(distance.getHopDtype(int(hopMatrix.max(initial=0))))
+    routedHopMatrix[hopMatrix < 0] = np.iinfo(routedHopMatrix.dtype).max
+
+    return routedHopMatrix
+
+
+def getRoutedChannelFlow(argChannelArray: tuple, argNextHopTable: np.ndarray, argSrcNodeIdArray: np.ndarray,
+                         argDemand: np.ndarray) -> np.ndarray:
+    # (numSources x numChannels x K) flow of argDemand (numSources x numNodes x K, per destination)
+    # along the routes of the table, the counterpart of linkload.getChannelFlow
+    (chanSrcArray, chanDstArray) = argChannelArray
+    srcNodeIdArray = np.asarray(argSrcNodeIdArray, dtype=np.int64)
+    flatNextHopTable = argNextHopTable.ravel()
+
+    (numSources, numNodes, numCommodity) = argDemand.shape
+    numChannels = len(chanSrcArray)
+
+    # channel number of a (node, next node) hop by binary search over the sorted channel keys
+    channelKeyArray = chanSrcArray.astype(np.int64) * numNodes + chanDstArray
+    channelOrder = np.argsort(channelKeyArray)
+    sortedChannelKeyArray = channelKeyArray[channelOrder]
+
+    demand = argDemand.reshape(numSources * numNodes, numCommodity)
+    flow = np.zeros((numSources * numChannels, numCommodity), dtype=np.float64)
+
+    # every (source, destination) pair with demand walks its route
+    (sourceNo, dstNodeIdArray) = np.nonzero(argDemand.any(axis=2))
+    pairNo = sourceNo * numNodes + dstNodeIdArray
+    curNodeIdArray = srcNodeIdArray[sourceNo]
+
+    for _ in range(numNodes):
+        isActive = curNodeIdArray != dstNodeIdArray
+
+        (sourceNo, dstNodeIdArray, pairNo, curNodeIdArray) = \
+            (sourceNo[isActive], dstNodeIdArray[isActive], pairNo[isActive], curNodeIdArray[isActive])
+
+        if(0 == len(pairNo)):
+            break
+
+        nextNodeIdArray = flatNextHopTable[curNodeIdArray * numNodes + dstNodeIdArray].astype(np.int64)
+
+        # unreachable destinations carry no flow, as with ECMP
+        isRouted = nextNodeIdArray >= 0
+
+        (sourceNo, dstNodeIdArray, pairNo, curNodeIdArray, nextNodeIdArray) = \
+            (sourceNo[isRouted], dstNodeIdArray[isRouted], pairNo[isRouted], curNodeIdArray[isRouted],
+             nextNodeIdArray[isRouted])
+
+        channelNo = channelOrder[np.searchsorted(sortedChannelKeyArray, curNodeIdArray * numNodes + nextNodeIdArray)]
+        np.add.at(flow, sourceNo * numChannels + channelNo, demand[pairNo])
+
+        curNodeIdArray = nextNodeIdArray
+    else:
+        if((curNodeIdArray != dstNodeIdArray).any()):
+            raise ValueError("the routing table loops")
+
+    return flow.reshape(numSources, numChannels, numCommodity)
@@ -0,0 +1,321 @@
+import heapq
+import numpy as np
+import evaluator
+
+
+# layout spaces up to this size are enumerated, larger ones are searched
+MAX_ENUMERATE_LAYOUTS = 1 << 22
+
+# layouts scored per table lookup batch
+ENUMERATE_CHUNK_SIZE = 1 << 16
+
+
+def iterPatternIndexChunk(argNumChiplet: int, argNumPattern: int, argChunkSize: int = ENUMERATE_CHUNK_SIZE):
+    # lazily yields (start, patternIndexArray) over every layout, chiplet 0 varying slowest
+    numLayout = argNumPattern ** argNumChiplet
+    placeValue = argNumPattern ** np.arange(argNumChiplet - 1, -1, -1, dtype=np.int64)
+
+    for start in range(0, numLayout, argChunkSize):
+        layoutNo = np.arange(start, min(start + argChunkSize, numLayout), dtype=np.int64)
+
+        yield (start, ((layoutNo[:, None] // placeValue) % argNumPattern).astype(np.int16))
+
+
+class LayoutSearch:
+    # exact best/worst layouts and score statistics over every choice of one pattern per
+    # chiplet, from the decomposed hop sums of a ScoreTable instead of enumerating the space
+
+    def __init__(self, argScoreTable: evaluator.ScoreTable):
+
+        if(not argScoreTable.isExact):
+            raise ValueError("layout search needs disjoint chiplet footprints")
+
+        self.scoreTable = argScoreTable
+        self.numChiplet = argScoreTable.numChiplet
+        self.numPattern = argScoreTable.numPattern
+        self.numLayout = self.numPattern ** self.numChiplet
+        self.numTotalMemCtrl = argScoreTable.numTotalMemCtrl
+
+        self.numTSVTable = argScoreTable.numTSVTable.astype(np.int64)
+        self.tsvToMemCtrlTable = argScoreTable.tsvToMemCtrlTable.astype(np.float64)
+        self.memCtrlToTSVTable = argScoreTable.memCtrlToTSVTable.astype(np.float64)
+
+        tsvToTSVTable = argScoreTable.tsvToTSVTable.astype(np.float64)
+
+        # [c, p]: TSV -> TSV hops of pattern p within chiplet c, zero unless the chiplet spans chiplet numbers
+        self.innerTable = np.einsum('ccpp->cp', tsvToTSVTable)
+        # [c1, c2, p1, p2]: TSV -> TSV hops between two chiplets in both directions, used for c1 < c2
+        self.pairTable = tsvToTSVTable + tsvToTSVTable.transpose(1, 0, 3, 2)
+
+    def __getCoefficient(self, argNumTotalTSV) -> tuple:
+        # avg hop count = a * tsvToTSV + b * tsvToMemCtrl + c * memCtrlToTSV for a fixed numTotalTSV
+        numTotalTSV = np.asarray(argNumTotalTSV, dtype=np.float64)
+        (probCoreToCore, probCoreToMemCtrl, probMemCtrlToCore) = \
+            evaluator.getTrafficProb(numTotalTSV, self.numTotalMemCtrl)
+
+        numTotalNode = numTotalTSV + self.numTotalMemCtrl
+
+        return (probCoreToCore / numTotalNode, probCoreToMemCtrl / numTotalNode, probMemCtrlToCore / numTotalNode)
+
+    def getTopK(self, argK: int, argIsBest: bool = True) -> tuple:
+        # (patternIndexArray, avgHopCountArray) of the k lowest (or highest) scoring layouts,
+        # layouts without any TSV have no score and are skipped
+        if(self.numLayout <= MAX_ENUMERATE_LAYOUTS):
+            patternIndexArray = self.__enumerateTopK(argK, 1 if argIsBest else -1)
+        else:
+            patternIndexArray = self.__branchAndBound(argK, 1 if argIsBest else -1)
+
+        avgHopCountArray = self.scoreTable.evaluate(patternIndexArray)
+        order = np.argsort(avgHopCountArray if argIsBest else -avgHopCountArray, kind='stable')
+
+        return (patternIndexArray[order], avgHopCountArray[order])
+
+    def __enumerateTopK(self, argK: int, argSign: int) -> np.ndarray:
+        candidateArray = np.empty((0, self.numChiplet), dtype=np.int16)
+        candidateCost = np.empty(0, dtype=np.float32)
+
+        for (_, patternIndexArray) in iterPatternIndexChunk(self.numChiplet, self.numPattern):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cost = argSign * self.scoreTable.evaluate(patternIndexArray)
+            isScored = ~np.isnan(cost)
+
+            candidateArray = np.vstack([candidateArray, patternIndexArray[isScored]])
+            candidateCost = np.concatenate([candidateCost, cost[isScored]])
+
+            # stable, so equal scores keep the earlier layouts
+            keep = np.argsort(candidateCost, kind='stable')[:argK]
+            (candidateArray, candidateCost) = (candidateArray[keep], candidateCost[keep])
+
+        return candidateArray
+
+    def __branchAndBound(self, argK: int, argSign: int) -> np.ndarray:
+        # depth first over chiplets, separately for every reachable numTotalTSV: with the
+        # normalization fixed the score is a sum of per chiplet and per chiplet pair costs
+        numChiplet = self.numChiplet
+        numPattern = self.numPattern
+        numTSVTable = self.numTSVTable
+
+        # open chiplets are bounded one by one (Gilmore-Lawler): each takes half of its pair costs
+        # against the other open chiplets, [d, c, p] are bounds against the open chiplets d.. except c
+        signedPairTable = argSign * self.pairTable
+        diagonal = (np.arange(numChiplet), np.arange(numChiplet))
+
+        # cheapest partner pattern for each pair
+        signedPairMin = signedPairTable.min(axis=3)
+        signedPairMin[diagonal] = 0
+
+        openPairSumArray = np.zeros((numChiplet + 1, numChiplet, numPattern))
+        openPairSumArray[:numChiplet] = np.cumsum(signedPairMin[:, ::-1], axis=1)[:, ::-1].transpose(1, 0, 2)
+
+        # cheapest cost per partner TSV; the open partners hold exactly the TSVs still missing from
+        # numTotalTSV, spread over the cheapest rates like a fractional knapsack, which keeps the bound
+        # from pairing with patterns the total cannot afford
+        with np.errstate(divide='ignore', invalid='ignore'):
+            signedPairRate = np.where(numTSVTable[None, :, None, :] > 0,
+                                      signedPairTable / numTSVTable[None, :, None, :], np.inf).min(axis=3)
+
+        signedPairRate[np.isinf(signedPairRate)] = 0
+
+        # [d, c, p, c']: partner c' of chiplet c while chiplets d.. are open, sorted by rate
+        isPartner = (np.arange(numChiplet)[None, None, :] >= np.arange(numChiplet + 1)[:, None, None]) & \
+            (np.arange(numChiplet)[None, :, None] != np.arange(numChiplet)[None, None, :])
+        isPartner = np.broadcast_to(isPartner[:, :, None, :], (numChiplet + 1, numChiplet, numPattern, numChiplet))
+
+        partnerRate = np.where(isPartner, signedPairRate.transpose(0, 2, 1)[None], 0.0)
+        partnerMinTSV = np.where(isPartner, numTSVTable.min(axis=1), 0)
+        partnerCapacity = np.where(isPartner, numTSVTable.max(axis=1) - numTSVTable.min(axis=1), 0)
+
+        rateOrder = np.argsort(partnerRate, axis=3, kind='stable')
+        partnerRate = np.take_along_axis(partnerRate, rateOrder, axis=3)
+        partnerCapacity = np.take_along_axis(partnerCapacity, rateOrder, axis=3)
+
+        partnerCapacityBefore = np.cumsum(partnerCapacity, axis=3) - partnerCapacity
+        openMinTSVArray = partnerMinTSV.sum(axis=3)
+        openMinTSVCostArray = (np.take_along_axis(partnerMinTSV, rateOrder, axis=3) * partnerRate).sum(axis=3)
+
+        maxNumTotalTSV = int(numTSVTable.max(axis=1).sum())
+
+        # shiftIndexArray[c, p, t]: knapsack entry left before pattern p of chiplet c adds up to t TSVs,
+        # maxNumTotalTSV + 1 points at an always infinite pad
+        shiftIndexArray = np.arange(maxNumTotalTSV + 1)[None, None, :] - numTSVTable[:, :, None]
+        shiftIndexArray[shiftIndexArray < 0] = maxNumTotalTSV + 1
+
+        def getChildBound(argChipletNo, argNumTSV, argKnownCost, argCrossCost):
+            # lower bound of every pattern of chiplet argChipletNo, the open chiplets after it must
+            # still add up to numTotalTSV, which a min-plus knapsack over their separate bounds respects
+            remainder = numTotalTSV - argNumTSV
+            spareTSV = remainder - numTSVTable - openMinTSVArray[argChipletNo]
+            partnerTSV = np.clip(spareTSV[:, :, None] - partnerCapacityBefore[argChipletNo], 0,
+                                 partnerCapacity[argChipletNo])
+
+            openPairCost = np.maximum(openPairSumArray[argChipletNo], openMinTSVCostArray[argChipletNo] +
+                                      (partnerRate[argChipletNo] * partnerTSV).sum(axis=2))
+            localCost = unaryCost + argCrossCost + coefTSVToTSV * openPairCost / 2
+
+            suffixCost = np.full(maxNumTotalTSV + 2, np.inf)
+            suffixCost[0] = 0.0
+
+            for chipletNo in range(numChiplet - 1, argChipletNo, -1):
+                suffixCost[:-1] = (suffixCost[shiftIndexArray[chipletNo]] + localCost[chipletNo][:, None]).min(axis=0)
+
+            childBound = np.full(numPattern, np.inf)
+            isFit = numTSVTable[argChipletNo] <= remainder
+
+            childBound[isFit] = argKnownCost + localCost[argChipletNo, isFit] + \
+                suffixCost[remainder - numTSVTable[argChipletNo, isFit]]
+
+            return childBound
+
+        # max-heap of the k best costs found so far, as (-cost, -foundNo, layout)
+        heap = []
+        layout = [0] * numChiplet
+        numFoundList = [0]
+
+        def getThreshold():
+            return -heap[0][0] if len(heap) >= argK else np.inf
+
+        def visit(argChipletNo, argNumTSV, argKnownCost, argCrossCost, argChildBound):
+            # argCrossCost[c, p]: cost of pattern p on open chiplet c against the assigned chiplets
+            for patternNo in np.argsort(argChildBound, kind='stable'):
+                # ascending, so every later pattern is pruned as well
+                if(argChildBound[patternNo] >= getThreshold()):
+                    break
+
+                layout[argChipletNo] = patternNo
+
+                knownCost = argKnownCost + unaryCost[argChipletNo, patternNo] + argCrossCost[argChipletNo, patternNo]
+                numTSV = argNumTSV + int(numTSVTable[argChipletNo, patternNo])
+
+                if(argChipletNo == numChiplet - 1):
+                    entry = (-knownCost, -numFoundList[0], tuple(layout))
+                    numFoundList[0] += 1
+
+                    if(len(heap) < argK):
+                        heapq.heappush(heap, entry)
+                    elif(knownCost < getThreshold()):
+                        heapq.heapreplace(heap, entry)
+
+                    continue
+
+                crossCost = argCrossCost + pairCost[argChipletNo, :, patternNo, :]
+                visit(argChipletNo + 1, numTSV, knownCost, crossCost,
+                      getChildBound(argChipletNo + 1, numTSV, knownCost, crossCost))
+
+        targetList = []
+
+        for numTotalTSV in range(max(1, int(numTSVTable.min(axis=1).sum())), maxNumTotalTSV + 1):
+            (coefTSVToTSV, coefTSVToMemCtrl, coefMemCtrlToTSV) = self.__getCoefficient(numTotalTSV)
+
+            unaryCost = argSign * (coefTSVToTSV * self.innerTable + coefTSVToMemCtrl * self.tsvToMemCtrlTable +
+                                   coefMemCtrlToTSV * self.memCtrlToTSVTable)
+            rootChildBound = getChildBound(0, 0, 0.0, np.zeros((numChiplet, numPattern)))
+
+            # unreachable totals have no finite bound
+            if(np.isfinite(rootChildBound.min())):
+                targetList.append((rootChildBound.min(), numTotalTSV, unaryCost, coefTSVToTSV, rootChildBound))
+
+        for (rootBound, numTotalTSV, unaryCost, coefTSVToTSV, rootChildBound) in sorted(targetList,
+                                                                                         key=lambda target: target[:2]):
+            # targets are in bound order, none of the rest can do better
+            if(rootBound >= getThreshold()):
+                break
+
+            pairCost = argSign * coefTSVToTSV * self.pairTable
+            visit(0, 0, 0.0, np.zeros((numChiplet, numPattern)), rootChildBound)
+
+        return np.array([entry[2] for entry in heap], dtype=np.int16).reshape(-1, numChiplet)
+
+    def getMean(self) -> float:
+        # exact mean over every layout with at least one TSV: the hop sums of all layouts
+        # sharing a numTotalTSV are collected as polynomials in numTotalTSV
+        numChiplet = self.numChiplet
+
+        countPolyList = []
+
+        for chipletNo in range(numChiplet):
+            countPoly = np.zeros(self.numTSVTable[chipletNo].max() + 1)
+            np.add.at(countPoly, self.numTSVTable[chipletNo], 1)
+            countPolyList.append(countPoly)
+
+        # layout counts per numTotalTSV of the chiplets before / from each chiplet
+        prefixList = [np.ones(1)]
+        suffixList = [np.ones(1)]
+
+        for chipletNo in range(numChiplet):
+            prefixList.append(np.convolve(prefixList[-1], countPolyList[chipletNo]))
+            suffixList.insert(0, np.convolve(countPolyList[numChiplet - 1 - chipletNo], suffixList[0]))
+
+        countPoly = prefixList[-1]
+        hopSumPolyList = [np.zeros(len(countPoly)) for _ in range(3)]
+
+        def addPoly(argTargetPoly, argPoly):
+            argTargetPoly[:len(argPoly)] += argPoly
+
+        for chipletNo in range(numChiplet):
+            otherPoly = np.convolve(prefixList[chipletNo], suffixList[chipletNo + 1])
+
+            for (hopSumPoly, table) in zip(hopSumPolyList, (self.innerTable, self.tsvToMemCtrlTable,
+                                                            self.memCtrlToTSVTable)):
+                weightPoly = np.zeros(len(countPolyList[chipletNo]))
+                np.add.at(weightPoly, self.numTSVTable[chipletNo], table[chipletNo])
+
+                addPoly(hopSumPoly, np.convolve(weightPoly, otherPoly))
+
+        for srcChipletNo in range(numChiplet):
+            # counts of the chiplets other than the pair, grown one chiplet at a time
+            betweenPoly = prefixList[srcChipletNo]
+
+            for dstChipletNo in range(srcChipletNo + 1, numChiplet):
+                otherPoly = np.convolve(betweenPoly, suffixList[dstChipletNo + 1])
+
+                numTSVPairArray = self.numTSVTable[srcChipletNo][:, None] + self.numTSVTable[dstChipletNo][None, :]
+                weightPoly = np.zeros(numTSVPairArray.max() + 1)
+                np.add.at(weightPoly, numTSVPairArray, self.pairTable[srcChipletNo, dstChipletNo])
+
+                addPoly(hopSumPolyList[0], np.convolve(weightPoly, otherPoly))
+
+                betweenPoly = np.convolve(betweenPoly, countPolyList[dstChipletNo])
+
+        numTotalTSVArray = np.arange(len(countPoly))
+        isScored = (numTotalTSVArray > 0) & (countPoly > 0)
+
+        coefList = self.__getCoefficient(numTotalTSVArray[isScored])
+        avgHopCountSum = sum(coef * hopSumPoly[isScored] for (coef, hopSumPoly) in zip(coefList, hopSumPolyList))
+
+        return float(avgHopCountSum.sum() / countPoly[isScored].sum())
+
+    def getStats(self, argNumBins: int = 20, argNumSamples: int = 1 << 20, argSeed=0) -> dict:
+        # mean (always exact), stdDev and histogram, exact when the space can be enumerated,
+        # otherwise from argNumSamples uniformly drawn layouts; bins span the exact best/worst scores
+        (_, bestArray) = self.getTopK(1, True)
+        (_, worstArray) = self.getTopK(1, False)
+
+        binRange = (float(bestArray[0]), float(worstArray[0])) if len(bestArray) else (0.0, 1.0)
+        histogram = np.zeros(argNumBins, dtype=np.int64)
+        isExact = self.numLayout <= MAX_ENUMERATE_LAYOUTS
+
+        # running sums of the centered scores, the exact mean keeps them well conditioned
+        mean = self.getMean()
+        (numScored, squareSum) = (0, 0.0)
+
+        if(isExact):
+            chunkIter = (patternIndexArray for (_, patternIndexArray) in
+                         iterPatternIndexChunk(self.numChiplet, self.numPattern))
+        else:
+            rng = np.random.default_rng(argSeed)
+            chunkIter = (rng.integers(self.numPattern, size=(min(ENUMERATE_CHUNK_SIZE, argNumSamples - start),
+                                                             self.numChiplet))
+                         for start in range(0, argNumSamples, ENUMERATE_CHUNK_SIZE))
+
+        for patternIndexArray in chunkIter:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                avgHopCountArray = self.scoreTable.evaluate(patternIndexArray).astype(np.float64)
+            avgHopCountArray = avgHopCountArray[~np.isnan(avgHopCountArray)]
+
+            numScored += len(avgHopCountArray)
+            squareSum += float(((avgHopCountArray - mean) ** 2).sum())
+            histogram += np.histogram(avgHopCountArray, bins=argNumBins, range=binRange)[0]
+
+        return {'numLayout': self.numLayout, 'isExact': isExact, 'numScored': numScored,
+                'mean': mean, 'stdDev': float(np.sqrt(squareSum / max(1, numScored))),
+                'histogram': histogram, 'binEdges': np.linspace(*binRange, argNumBins + 1)}
@@ -1,50 +1,105 @@
-import networkx as nx
-import matplotlib.pyplot as plt
 import numpy as np
 import random
+import json
+import os
+import distance
+import evaluator
+import sweep
+import symmetry
+import results
+import cache
+import montecarlo
+import optimizer
+import search
+import profiler
+import linkload
+import queueing
+import render
+import stack
+import resilience
+import routing
+import time
 from itertools import product
-from enum import Enum, auto
-from dataclasses import dataclass
+from dataclasses import replace
+from topology import NodeKind, NodeType, Topology
 
 
-class NodeKind(Enum):
-    NORMAL = auto()
-    TSV = auto()
-    MEMCTRL = auto()
+# bump whenever a link builder or the chiplet geometry changes, cached matrices are then rebuilt
+TOPOLOGY_GENERATOR_VERSION = 1
 
 
-@dataclass
-class NodeType:
-    kind: NodeKind = None
-    chiplet_no: int = None
+class ConfigError(ValueError):
+    # the configuration or the command line asks for something the run cannot do
+    pass
 
 
 class HopSim:
-    def __init__(self, argConfig):
+    def __init__(self, argConfig, argNumWorkers: int = 1, argOutputPath: str = None, argResume: bool = False,
+                 argCacheDir: str = None, argCacheMaxBytes: int = 4 << 30, argProfiler: profiler.NullProfiler = None,
+                 argDistanceCache: cache.MemoryDistanceCache = None):
 
         self.config = argConfig
-        self.icn = nx.Graph()
+        self.numWorkers = argNumWorkers
+        self.outputPath = argOutputPath
+        self.resume = argResume
+
+        # phases and counters, the null profiler keeps every hook a no-op
+        self.profiler = argProfiler or profiler.NullProfiler()
+
+        # a cache handed in is shared with other instances and wins over argCacheDir
+        self.distanceCache = argDistanceCache
+
+        if(None == self.distanceCache and None != argCacheDir):
+            self.distanceCache = cache.DistanceCache(argCacheDir, argCacheMaxBytes)
 
         self.numXDimNodes = int(self.config['topology']['numxdimnodes'])
         self.numYDimNodes = int(self.config['topology']['numydimnodes'])
         self.numTotalNodes = self.numXDimNodes * self.numYDimNodes
         self.numTotalMemCtrl = 2 * self.numXDimNodes
+        self.numChiplet = int(self.config['chiplet']['numChiplet'])
+
+        self.icn = Topology(self.numTotalNodes)
 
         self.topolgyList = self.config['topology']['type'].split(' ')
         self.isSquareList = list(map(int, self.config['topology']['isSquare'].split(' ')))
         self.tsvPatternTypeList = self.config['tsv']['tsvpatterntype'].split(' ')
 
-        self.topolgy = None
-        self.isSquare = None
-        self.tsvLayout: tuple = None
+        # per link weights of the latency metric, 'none' keeps it off
+        self.linkWeightModel = self.config.get('latency', 'linkWeight', fallback='none')
+        self.routerDelay = self.config.getfloat('latency', 'routerDelay', fallback=1.0)
+        self.wireDelay = self.config.getfloat('latency', 'wireDelay', fallback=1.0)
 
-        self.tsvIndexList = []
+        if(self.linkWeightModel not in ['none', 'manhattan', 'delay']):
+            raise ConfigError(f"unknown link weight model: {self.linkWeightModel}")
 
-        self.numTotalTSV = None
+        # deterministic routing next to the minimal hop counts, 'auto' picks XY where every link runs
+        # along the grid and up*/down* elsewhere, 'none' keeps it off
+        self.routingAlgorithm = self.config.get('routing', 'algorithm', fallback='none')
 
-        self.probCoreToCore = None
-        self.probCoreToMemCtrl = None
-        self.probMemCtrlToCore = None
+        if(self.routingAlgorithm not in ['none', 'auto'] + routing.ROUTING_ALGORITHM_LIST):
+            raise ConfigError(f"unknown routing algorithm: {self.routingAlgorithm}")
+
+        # dies stacked on the interposer, scored end to end from core to core through the TSVs
+        self.isStacked = self.config.getboolean('stack', 'enabled', fallback=False)
+
+        # injection rates of the queueing latency curves, in flits per cycle per TSV and memory controller
+        self.maxInjectionRate = self.config.getfloat('queueing', 'maxInjectionRate', fallback=0.5)
+        self.numInjectionRates = self.config.getint('queueing', 'numInjectionRates', fallback=50)
+
+        # (shardNo, numShards) of a sharded sweep, None sweeps everything
+        self.shard = None
+
+        self.topolgy = None
+        self.isSquare = None
+        self.hopDistance = None
+        self.latencyDistanceDict = {}
+        self.routingAlgorithmDict = {}
+        self.nextHopDict = {}
+        self.routedDistanceDict = {}
+        self.channelArrayDict = {}
+
+        # per topology (kindArray, linkLoad) of the layout visualize() draws
+        self.renderDict = {}
 
         self.tsvDispListSquare = None
         self.tsvDispListNotSquare = None
@@ -57,95 +112,124 @@ class HopSim:
 
         return indexY * self.numXDimNodes + indexX
     
-    def __place(self) -> tuple:
+    def __getChipletGridShape(self) -> tuple:
+        # (columns, rows) of chiplets in the grid arrangement, as square as possible
+        numColumn = int(np.ceil(np.sqrt(self.numChiplet)))
+
+        return (numColumn, -(-self.numChiplet // numColumn))
+
+    def __getChipletSize(self) -> tuple:
+        # (width, height) of one chiplet, row 0 is kept for the memory controllers
+        if(self.isSquare):  #grid, e.g. 2 x 2 chiplets
+            (numColumn, numRow) = self.__getChipletGridShape()
+            chipletSize = (self.numXDimNodes // numColumn, (self.numYDimNodes - 2) // numRow)
+        else:   #list, chiplets stacked with a 2-row gap in the middle
+            chipletSize = (self.numXDimNodes, (self.numYDimNodes - 4) // self.numChiplet)
+
+        if(min(chipletSize) < 1):
+            raise ConfigError(f"{self.numXDimNodes}x{self.numYDimNodes} nodes is too small to place "
+                              f"{self.numChiplet} chiplets")
 
-        tsvDispDict = {}
+        return chipletSize
+
+    def __getChipletOffsetList(self) -> list:
+        # 1D index of the top-left node of each chiplet
+        (chipletWidth, chipletHeight) = self.__getChipletSize()
 
         if(self.isSquare):
-            chipletOffsetList = [8, 12, 64, 68]
+            (numColumn, _) = self.__getChipletGridShape()
+            originList = [((chipletNo % numColumn) * chipletWidth, 1 + (chipletNo // numColumn) * chipletHeight)
+                          for chipletNo in range(self.numChiplet)]
         else:
-            chipletOffsetList = [8, 32, 72, 96]
+            gapChipletNo = max(1, self.numChiplet // 2)
+            originList = [(0, 1 + chipletNo * chipletHeight + (2 if chipletNo >= gapChipletNo else 0))
+                          for chipletNo in range(self.numChiplet)]
 
-        for chipletNo in range(len(self.tsvLayout)):
-            tsvPattern = self.tsvLayout[chipletNo]
+        return [self.__get1DIndex(origin) for origin in originList]
 
-            match tsvPattern:
-                case 'border':
-                    if(self.isSquare):
-                        tsvDispList = [0, 1, 2, 3, 8, 11, 16, 19, \
-                                        24, 27, 32, 35, 40, 43, 48, 49, 50, 51]
-                    else:
-                        tsvDispList = [0, 1, 2, 3, 4, 5, 6, 7, 
-                                    8, 15, 
-                                    16, 17, 18, 19, 20, 21, 22, 23]
-                        
-                case 'bundle':
-                    if(self.isSquare):
-                        tsvDispList = [9, 10, 17, 18, 25, 26, 33, 34, 41, 42]
-                    else:
-                        tsvDispList = [9, 10, 11, 12, 13, 14]
+    def __getChipletDispArray(self) -> np.ndarray:
+        # displacement of every node of a chiplet, row by row
+        (chipletWidth, chipletHeight) = self.__getChipletSize()
+        (dispY, dispX) = np.divmod(np.arange(chipletWidth * chipletHeight), chipletWidth)
 
-                case 'shielded':
-                    if(self.isSquare):
-                        tsvDispList = [9, 10, 25, 26, 41, 42]
-                    else:
-                        tsvDispList = [9, 10, 13, 14]
+        return dispY * self.numXDimNodes + dispX
 
-                case 'isolated':
-                    tsvDispList = []
+    def __getNumIsolatedTSV(self) -> int:
+        (chipletWidth, chipletHeight) = self.__getChipletSize()
 
-                    if(self.isSquare):
-                        if(None != self.tsvDispListSquare):
-                            tsvDispList = self.tsvDispListSquare
-                        else:
-                            maxTSVDisp = 28
-                            numTSVPerChiplet = 7
+        return (chipletWidth * chipletHeight) // 4
+
+    def __getTSVDispList(self, argTSVPattern: str) -> list:
+        # displacements are 1D index offsets from the chiplet's top-left node
+        (chipletWidth, chipletHeight) = self.__getChipletSize()
+
+        (dispX, dispY) = np.meshgrid(np.arange(chipletWidth), np.arange(chipletHeight))
+        (dispX, dispY) = (dispX.ravel(), dispY.ravel())
 
-                            while(len(tsvDispList) < numTSVPerChiplet):
-                                tsvDisp = random.randint(0, maxTSVDisp)
+        isInner = (1 <= dispX) & (dispX <= chipletWidth - 2) & (1 <= dispY) & (dispY <= chipletHeight - 2)
+
+        match argTSVPattern:
+            case 'border':
+                isTSV = (dispX == 0) | (dispX == chipletWidth - 1) | (dispY == 0) | (dispY == chipletHeight - 1)
+
+            case 'bundle':
+                isTSV = isInner
+
+            case 'shielded':
+                # every other row of the bundle, in pairs of columns
+                isTSV = isInner & ((dispY - 1) % 2 == 0) & (((dispX - 1) // 2) % 2 == 0)
+
+            case 'isolated':
+                # one random draw per chiplet shape, shared by every isolated chiplet
+                if(self.isSquare):
+                    tsvDispList = self.tsvDispListSquare
+                else:
+                    tsvDispList = self.tsvDispListNotSquare
 
-                                if(tsvDisp not in tsvDispList):
-                                    tsvDispList.append(tsvDisp)
+                if(None == tsvDispList):
+                    tsvDispList = random.sample(range(chipletWidth * chipletHeight), self.__getNumIsolatedTSV())
+                    tsvDispList = self.__getChipletDispArray()[tsvDispList].tolist()
 
-                            self.tsvDispListSquare = tsvDispList
+                    if(self.isSquare):
+                        self.tsvDispListSquare = tsvDispList
                     else:
-                        if(None != self.tsvDispListNotSquare):
-                            tsvDispList = self.tsvDispListNotSquare
-                        else:
-                            maxTSVDisp = 24
-                            numTSVPerChiplet = 6
+                        self.tsvDispListNotSquare = tsvDispList
 
-                            while(len(tsvDispList) < numTSVPerChiplet):
-                                tsvDisp = random.randint(0, maxTSVDisp)
+                return tsvDispList
 
-                                if(tsvDisp not in tsvDispList):
-                                    tsvDispList.append(tsvDisp)
+            case _:
+                return []
 
-                            self.tsvDispListNotSquare = tsvDispList
+        return (dispY[isTSV] * self.numXDimNodes + dispX[isTSV]).tolist()
 
-                case _:
-                    chipletOffsetList = []
-                    tsvDispList = []
+    def __getTSVMaskTable(self) -> tuple:
+        # (numChiplet x numPattern x numNodes) TSV membership of every pattern on every chiplet
+        chipletOffsetList = self.__getChipletOffsetList()
 
-            tsvDispDict[chipletNo] = tsvDispList
+        numChiplet = len(chipletOffsetList)
+        numPattern = len(self.tsvPatternTypeList)
 
-        self.tsvIndexList.clear()
+        tsvMaskTable = np.zeros((numChiplet, numPattern, self.numTotalNodes), dtype=bool)
+        numTSVTable = np.zeros((numChiplet, numPattern), dtype=np.int64)
 
-        for chipletNo in range(len(chipletOffsetList)):
-            for tsvDisp in tsvDispDict[chipletNo]:
-                self.tsvIndexList.append(self.__get2DIndex(chipletOffsetList[chipletNo] + tsvDisp))
+        for (chipletNo, patternNo) in product(range(numChiplet), range(numPattern)):
+            tsvDispList = self.__getTSVDispList(self.tsvPatternTypeList[patternNo])
+            tsvNodeIdArray = chipletOffsetList[chipletNo] + np.asarray(tsvDispList, dtype=np.int64)
 
-        self.numTotalTSV = len(tsvDispDict[0]) + len(tsvDispDict[1]) +\
-        len(tsvDispDict[2]) + len(tsvDispDict[3])
+            tsvMaskTable[chipletNo, patternNo, tsvNodeIdArray] = True
+            numTSVTable[chipletNo, patternNo] = len(tsvDispList)
 
-        self.probCoreToCore = np.float32(0.3 / self.numTotalTSV)
-        self.probCoreToMemCtrl = np.float32(0.7 / self.numTotalMemCtrl)
-        self.probMemCtrlToCore = np.float32(1/self.numTotalTSV)
+        return (tsvMaskTable, numTSVTable)
 
-    def __setTopolgy(self):
-        for nodeId in range(self.numTotalNodes):
-            self.icn.add_node(nodeId)
+    def __getPatternIndexArray(self, argTSVLayoutList: list) -> np.ndarray:
+        # (numLayout x numChiplet) index of each chiplet's pattern in tsvPatternTypeList
+        patternNoDict = {tsvPattern: patternNo for (patternNo, tsvPattern) in enumerate(self.tsvPatternTypeList)}
+        numChiplet = len(self.__getChipletOffsetList())
 
+        return np.array([[patternNoDict[tsvPattern] for tsvPattern in tsvLayout] for tsvLayout in argTSVLayoutList],
+                        dtype=np.int16).reshape(-1, numChiplet)
+
+    def __setTopolgy(self):
         match self.topolgy:
             case 'mesh':
                 self.__setMesh()
@@ -165,419 +249,1288 @@ class HopSim:
             case _:
                 pass
 
-        self.__setNodeType()
+    def __getCacheKeyFields(self, argIsSquare: int = None) -> dict:
+        keyFields = {'topology': self.topolgy, 'numXDimNodes': self.numXDimNodes,
+                     'numYDimNodes': self.numYDimNodes, 'version': TOPOLOGY_GENERATOR_VERSION}
+
+        if(None != argIsSquare):
+            keyFields['isSquare'] = argIsSquare
+            keyFields['numChiplet'] = self.numChiplet
+
+        return keyFields
+
+    def __getHopDistanceMatrix(self) -> np.ndarray:
+        # one BFS per node
+        self.profiler.count('shortestPathCall')
+        self.profiler.count('shortestPathSource', self.numTotalNodes)
+
+        return distance.getHopDistanceMatrix(self.icn)
+
+    def __setHopDistance(self):
+        # link structure does not depend on the TSV layout, so this runs once per topology
+        if(None == self.distanceCache):
+            self.hopDistance = self.__getHopDistanceMatrix()
+            return
+
+        # nor on the chiplet shape, so one cached matrix serves every isSquare
+        keyFields = self.__getCacheKeyFields()
+        key = self.distanceCache.getKey(**keyFields)
+        cachedDict = self.distanceCache.load(key)
+
+        if(cachedDict and 'hopDistance' in cachedDict):
+            self.profiler.count('distanceCacheHit')
+            self.hopDistance = cachedDict['hopDistance']
+            return
+
+        self.hopDistance = self.__getHopDistanceMatrix()
+        self.distanceCache.store(key, {'hopDistance': self.hopDistance}, keyFields)
+
+    def __getLinkWeightArray(self) -> np.ndarray:
+        # weight of every link of the current topology, in the order of icn.srcArray
+        (srcIndexX, srcIndexY) = self.__get2DIndex(self.icn.srcArray.astype(np.int64))
+        (dstIndexX, dstIndexY) = self.__get2DIndex(self.icn.dstArray.astype(np.int64))
+
+        # in node pitches, folded links span 2 and butterfly links 1 + their stride
+        wireLengthArray = np.abs(srcIndexX - dstIndexX) + np.abs(srcIndexY - dstIndexY)
+
+        match self.linkWeightModel:
+            case 'manhattan':
+                return wireLengthArray.astype(np.float64)
+
+            case 'delay':
+                # cycles: the router plus the wire, pipelined into whole cycles
+                return self.routerDelay + np.ceil(self.wireDelay * wireLengthArray)
+
+            case _:
+                raise ValueError(f"no link weights for the link weight model {self.linkWeightModel}")
+
+    def __setRoutingTable(self):
+        # next hop table of the current topology and the routed hop counts walked from it
+        algorithm = self.routingAlgorithm
+
+        if('auto' == algorithm):
+            algorithm = 'xy' if routing.isAxisAligned(self.icn, self.numXDimNodes) else 'updown'
+
+        if('xy' == algorithm and not routing.isAxisAligned(self.icn, self.numXDimNodes)):
+            raise ConfigError(f"xy routing needs every link of {self.topolgy} along a row or a column, "
+                              f"use auto or updown")
+
+        nextHopTable = routing.getRoutingTable(algorithm, self.icn, self.numXDimNodes)
+
+        self.routingAlgorithmDict[self.topolgy] = algorithm
+        self.nextHopDict[self.topolgy] = nextHopTable
+        self.routedDistanceDict[self.topolgy] = routing.getRoutedHopMatrix(nextHopTable)
+
+    def __setLatencyDistance(self):
+        # weighted counterpart of __setHopDistance, kept per topology for the latency pass of run()
+        if(self.linkWeightModel == 'none'):
+            return
+
+        keyFields = {**self.__getCacheKeyFields(), 'linkWeight': self.linkWeightModel}
+
+        if(self.linkWeightModel == 'delay'):
+            keyFields.update({'routerDelay': self.routerDelay, 'wireDelay': self.wireDelay})
+
+        key = None
+
+        if(None != self.distanceCache):
+            key = self.distanceCache.getKey(**keyFields)
+            cachedDict = self.distanceCache.load(key)
+
+            if(cachedDict and 'latencyDistance' in cachedDict):
+                self.profiler.count('distanceCacheHit')
+                self.latencyDistanceDict[self.topolgy] = cachedDict['latencyDistance']
+                return
+
+        self.profiler.count('weightedShortestPathSource', self.numTotalNodes)
+
+        latencyDistance = distance.getWeightedDistanceMatrix(self.icn, self.__getLinkWeightArray())
+        self.latencyDistanceDict[self.topolgy] = latencyDistance
+
+        if(None != key):
+            self.distanceCache.store(key, {'latencyDistance': latencyDistance}, keyFields)
+
+    def __getNodeArrays(self) -> tuple:
+        # (kindArray without TSVs, chipletNoArray) of the current topology and chiplet shape
+        keyFields = self.__getCacheKeyFields(self.isSquare)
+        key = None
+
+        if(None != self.distanceCache):
+            key = self.distanceCache.getKey(**keyFields)
+            cachedDict = self.distanceCache.load(key)
+
+            if(cachedDict and 'kindArray' in cachedDict and 'chipletNoArray' in cachedDict):
+                return (cachedDict['kindArray'], cachedDict['chipletNoArray'])
+
+        kindArray = np.full(self.numTotalNodes, NodeKind.NORMAL.value, dtype=np.int8)
+        kindArray[self.__getMemCtrlMask()] = NodeKind.MEMCTRL.value
+
+        chipletNoArray = self.__getChipletNoArray().astype(np.int32)
+
+        if(None != key):
+            self.distanceCache.store(key, {'kindArray': kindArray, 'chipletNoArray': chipletNoArray}, keyFields)
+
+        return (kindArray, chipletNoArray)
 
     def __getChipletNo(self, argIndexX, argIndexY):
-        if(self.isSquare):  #grid
-            if(argIndexY in [0, self.numYDimNodes]):
-                return -1   # does not belong to a chiplet
-            else:
-                return (argIndexY // 8) * 2 + (argIndexX // 4)
-        else:   #list
-            if(argIndexY in [0, 7, 8, self.numYDimNodes]):
-                return -1   # does not belong to a chiplet
-            else:
-                return argIndexY // 4
+        # works element-wise on index arrays
+        (chipletWidth, chipletHeight) = self.__getChipletSize()
+        chipletNo = np.full(np.shape(argIndexX), -1)    # -1: does not belong to a chiplet
 
-    def __setNodeType(self):
-        for (srcIndexX, srcIndexY) in product(range(self.numXDimNodes), range(self.numYDimNodes)):
-            # Chiplet number that this node belongs to
-            chipletNo = self.__getChipletNo(srcIndexX, srcIndexY)
+        for (no, chipletOffset) in enumerate(self.__getChipletOffsetList()):
+            (originX, originY) = self.__get2DIndex(chipletOffset)
 
-            src1DIndex = self.__get1DIndex((srcIndexX, srcIndexY))
-            nodeKind = NodeKind.NORMAL
+            isInside = (originX <= argIndexX) & (argIndexX < originX + chipletWidth) & \
+                (originY <= argIndexY) & (argIndexY < originY + chipletHeight)
+            chipletNo[isInside] = no
 
-            if (srcIndexY in [0, self.numYDimNodes]):
-                # Edge case
-                nodeKind = NodeKind.MEMCTRL
+        return chipletNo
 
-            elif ((srcIndexX, srcIndexY) in self.tsvIndexList):
-                nodeKind = NodeKind.TSV
+    def __getChipletNoArray(self) -> np.ndarray:
+        return self.__getChipletNo(*self.__get2DIndex(np.arange(self.numTotalNodes)))
 
-            self.icn.nodes[src1DIndex]['type'] = NodeType(
-                kind=nodeKind, chiplet_no=chipletNo)
+    def __getMemCtrlMask(self) -> np.ndarray:
+        indexYArray = np.arange(self.numTotalNodes) // self.numXDimNodes
 
-    def __setMesh(self):
-        for (srcIndexX, srcIndexY) in product(range(self.numXDimNodes), range(self.numYDimNodes)):
-            dstIndexX = srcIndexX
-            dstIndexY = srcIndexY + 1
+        return np.isin(indexYArray, [0, self.numYDimNodes])
 
-            if (self.numYDimNodes <= dstIndexY):
-                continue
+    def __addLinkArray(self, argSrcIndex: tuple, argDstIndex: tuple):
+        # (indexX, indexY) arrays on both ends, links leaving the grid are dropped
+        (srcIndexX, srcIndexY) = np.broadcast_arrays(*argSrcIndex)
+        (dstIndexX, dstIndexY) = np.broadcast_arrays(*argDstIndex)
 
-            srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-            dstNodeId = self.__get1DIndex((dstIndexX, dstIndexY))
+        isInside = (0 <= dstIndexX) & (dstIndexX < self.numXDimNodes) & \
+            (0 <= dstIndexY) & (dstIndexY < self.numYDimNodes)
 
-            self.icn.add_edge(srcNodeId, dstNodeId)
-            self.icn.add_edge(dstNodeId, srcNodeId)
+        self.profiler.count('edgeAdded', int(np.count_nonzero(isInside)))
 
-        for (srcIndexY, srcIndexX) in product(range(self.numYDimNodes), range(self.numXDimNodes)):
-            dstIndexX = srcIndexX + 1
-            dstindexY = srcIndexY
+        self.icn.addEdgeArray(self.__get1DIndex((srcIndexX[isInside], srcIndexY[isInside])),
+                              self.__get1DIndex((dstIndexX[isInside], dstIndexY[isInside])))
 
-            if (self.numXDimNodes <= dstIndexX):
-                continue
+    def __getGridIndex(self) -> tuple:
+        # (indexX, indexY) of every node
+        return self.__get2DIndex(np.arange(self.numTotalNodes))
 
-            srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-            dstNodeId = self.__get1DIndex((dstIndexX, dstindexY))
+    def __setMesh(self):
+        (srcIndexX, srcIndexY) = self.__getGridIndex()
 
-            self.icn.add_edge(srcNodeId, dstNodeId)
-            self.icn.add_edge(dstNodeId, srcNodeId)
+        self.__addLinkArray((srcIndexX, srcIndexY), (srcIndexX, srcIndexY + 1))
+        self.__addLinkArray((srcIndexX, srcIndexY), (srcIndexX + 1, srcIndexY))
 
         return 1
 
     def __setCMesh(self):
+        # concentration 4: every 2 x 2 cluster hangs off its top-left router,
+        # and the routers form a mesh with stride 2
+        (srcIndexX, srcIndexY) = self.__getGridIndex()
 
-        pass
+        self.__addLinkArray((srcIndexX, srcIndexY), (srcIndexX - srcIndexX % 2, srcIndexY - srcIndexY % 2))
 
-    def __setDButterfly(self):
-        # Horizontal links
-        for (srcIndexY, srcIndexX) in product(range(self.numYDimNodes), range(self.numXDimNodes)):
-            dstIndexX = srcIndexX + 1
-            dstIndexY = srcIndexY
+        isRouter = (srcIndexX % 2 == 0) & (srcIndexY % 2 == 0)
+        (srcIndexX, srcIndexY) = (srcIndexX[isRouter], srcIndexY[isRouter])
 
-            if (self.numXDimNodes <= dstIndexX):
-                continue
+        self.__addLinkArray((srcIndexX, srcIndexY), (srcIndexX, srcIndexY + 2))
+        self.__addLinkArray((srcIndexX, srcIndexY), (srcIndexX + 2, srcIndexY))
 
-            srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-            dstNodeId = self.__get1DIndex((dstIndexX, dstIndexY))
+        return
 
-            self.icn.add_edge(srcNodeId, dstNodeId)
-            self.icn.add_edge(dstNodeId, srcNodeId)
+    def __setButterflyLinks(self):
+        # column x links to column x + 1 with the row index xor'ed by its stride;
+        # strides double towards the middle column and mirror back (1, 2, 4, 8, 4, 2, 1 for 8 columns),
+        # wrapping around once they would exceed the number of rows
+        numStage = max(1, int(np.log2(self.numYDimNodes)))
 
-        # Vertical links
-        for (srcIndexX, srcIndexY) in product(range(self.numXDimNodes - 1), range(self.numYDimNodes)):
-            dstIndexX = srcIndexX + 1
+        (srcIndexX, srcIndexY) = self.__getGridIndex()
+        isSrc = srcIndexX < self.numXDimNodes - 1
+
+        (srcIndexX, srcIndexY) = (srcIndexX[isSrc], srcIndexY[isSrc])
+        stageArray = np.minimum(srcIndexX, self.numXDimNodes - 2 - srcIndexX) % numStage
+        strideArray = np.left_shift(1, stageArray)
 
-            if srcIndexX == 0 or srcIndexX == 6:
-                dstIndexX = srcIndexX + 1
-                dstIndexY = (srcIndexY // 2) * 2 + ((srcIndexY + 1) % 2)
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((dstIndexX, dstIndexY))
+        self.__addLinkArray((srcIndexX, srcIndexY), (srcIndexX + 1, srcIndexY ^ strideArray))
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+    def __setFoldedLinks(self, argAxis: int):
+        # every other node along the axis, plus the two ends folded back
+        gridIndex = self.__getGridIndex()
+        numAxisNodes = [self.numXDimNodes, self.numYDimNodes][argAxis]
 
-            elif srcIndexX == 1 or srcIndexX == 5:
-                dstIndexX = srcIndexX + 1
-                dstIndexY = (srcIndexY // 4) * 4 + ((srcIndexY + 2) % 4)
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((dstIndexX, dstIndexY))
+        srcAxisIndex = gridIndex[argAxis]
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+        for dstAxisIndex in [srcAxisIndex + 2,
+                             np.where(srcAxisIndex == 0, 1, -1),
+                             np.where(srcAxisIndex == numAxisNodes - 2, numAxisNodes - 1, -1)]:
+            dstIndex = list(gridIndex)
+            dstIndex[argAxis] = dstAxisIndex
 
-            elif srcIndexX == 2 or srcIndexX == 4:
-                dstIndexX = srcIndexX + 1
-                dstIndexY = (srcIndexY // 8) * 8 + ((srcIndexY + 4) % 8)
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((dstIndexX, dstIndexY))
+            self.__addLinkArray(gridIndex, tuple(dstIndex))
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+    def __setDButterfly(self):
+        (srcIndexX, srcIndexY) = self.__getGridIndex()
 
-            elif srcIndexX == 3:
-                dstIndexX = srcIndexX + 1
-                dstIndexY = (srcIndexY // 16) * 16 + ((srcIndexY + 8) % 16)
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((dstIndexX, dstIndexY))
+        # Horizontal links
+        self.__addLinkArray((srcIndexX, srcIndexY), (srcIndexX + 1, srcIndexY))
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+        # Vertical links
+        self.__setButterflyLinks()
 
         return
 
     def __setFTorus(self):
         # Horizontal links
-        for (srcIndexY, srcIndexX) in product(range(self.numYDimNodes), range(self.numXDimNodes)):
-            dstIndexY = srcIndexY
+        self.__setFoldedLinks(0)
 
-            xdst_lst = []
-            if srcIndexX == self.numXDimNodes - 2:
-                xdst_lst.append(self.numXDimNodes - 1)
-            else:
-                xdst_lst.append(srcIndexX + 2)
-                if srcIndexX == 0:
-                    xdst_lst.append(1)
-
-            for xdst in xdst_lst:
-                if (self.numXDimNodes <= xdst):
-                    continue
+        # Vertical links
+        self.__setFoldedLinks(1)
 
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((xdst, dstIndexY))
+        return
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+    def __setBDonut(self):
+        # Horizontal links
+        self.__setFoldedLinks(0)
 
         # Vertical links
-        for (srcIndexY, srcIndexX) in product(range(self.numYDimNodes), range(self.numXDimNodes)):
-            dstIndexX = srcIndexX
+        self.__setButterflyLinks()
 
-            ydst_lst = []
-            if srcIndexY == self.numYDimNodes - 2:
-                ydst_lst.append(self.numYDimNodes - 1)
-            else:
-                ydst_lst.append(srcIndexY + 2)
-                if srcIndexY == 0:
-                    ydst_lst.append(1)
+        return
 
-            for ydst in ydst_lst:
-                if (self.numYDimNodes <= ydst):
-                    continue
+    def __getLayoutKindArray(self, argSweepJob: sweep.SweepJob, argPatternRow: np.ndarray) -> np.ndarray:
+        kindArray = np.full(self.numTotalNodes, NodeKind.NORMAL.value, dtype=np.int8)
 
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((dstIndexX, ydst))
+        tsvMaskTable = argSweepJob.tsvMaskTable
+        kindArray[tsvMaskTable[np.arange(tsvMaskTable.shape[0]), argPatternRow].any(axis=0)] = NodeKind.TSV.value
+        kindArray[argSweepJob.memCtrlMask] = NodeKind.MEMCTRL.value
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+        return kindArray
 
-        return
+    def __getRenderJob(self, argColorBy: str, argOutputDir: str) -> render.RenderJob:
+        # the links of a sweep are reused, the topology is only rebuilt when nothing swept it yet
+        if(self.topolgy not in self.channelArrayDict):
+            with self.profiler.phase('setTopology', topology=self.topolgy):
+                self.__clear()
+                self.__setTopolgy()
 
-    def __setBDonut(self):
-        # Horizontal links
-        for (srcIndexY, srcIndexX) in product(range(self.numYDimNodes), range(self.numXDimNodes)):
-            dstIndexY = srcIndexY
+            self.channelArrayDict[self.topolgy] = linkload.getChannelArray(self.icn)
 
-            xdst_lst = []
-            if srcIndexX == self.numXDimNodes - 2:
-                xdst_lst.append(self.numXDimNodes - 1)
-            else:
-                xdst_lst.append(srcIndexX + 2)
-                if srcIndexX == 0:
-                    xdst_lst.append(1)
+        (chanSrcArray, chanDstArray) = self.channelArrayDict[self.topolgy]
+        numEdges = len(chanSrcArray) // 2
+        (kindArray, channelLoad) = self.renderDict.get(self.topolgy, (None, None))
+
+        return render.RenderJob(path=os.path.join(argOutputDir, self.topolgy + ".png"),
+                                posArray=render.getNodePosArray(self.numXDimNodes, self.numYDimNodes),
+                                srcArray=chanSrcArray[:numEdges], dstArray=chanDstArray[:numEdges],
+                                kindArray=kindArray if argColorBy in ['kind', 'load'] else None,
+                                linkLoad=render.getLinkLoad(channelLoad)
+                                if 'load' == argColorBy and channelLoad is not None else None)
+
+    def visualize(self, argColorBy: str = 'none', argOutputDir: str = '.'):
+        # 'kind' colors the nodes of the drawn layout by NodeKind, 'load' also the links by their
+        # channel load when run() computed link loads
+        renderJobList = []
+
+        for topology in self.topolgyList:
+            self.topolgy = topology
+            renderJobList.append(self.__getRenderJob(argColorBy, argOutputDir))
+
+        with self.profiler.phase('renderTopology', numTopologies=len(renderJobList)):
+            render.renderTopologyList(renderJobList, self.numWorkers)
+
+    def __clear(self):
+        return self.icn.clear()
+
+    def __getPossibleTSVLayout(self):
+        # lazily yields every layout, chiplet 1 varying slowest
+        return product(self.tsvPatternTypeList, repeat=self.numChiplet)
+
+    def __getNumPossibleTSVLayout(self) -> int:
+        return len(self.tsvPatternTypeList) ** self.numChiplet
+
+    def __getEnumerableTSVLayout(self):
+        # the sweep keeps every layout in memory, larger spaces go through search()
+        if(self.__getNumPossibleTSVLayout() > search.MAX_ENUMERATE_LAYOUTS):
+            raise ConfigError(f"{self.__getNumPossibleTSVLayout()} layouts are too many to sweep, "
+                              f"use main.py search")
+
+        return self.__getPossibleTSVLayout()
+
+    def __getSweepJob(self) -> sweep.SweepJob:
+        # layout independent part of the job of the current topology and chiplet shape
+        (kindArray, chipletNoArray) = self.__getNodeArrays()
+        (tsvMaskTable, numTSVTable) = self.__getTSVMaskTable()
+
+        return sweep.SweepJob(topology=self.topolgy, isSquare=self.isSquare,
+                              hopDistance=self.hopDistance,
+                              chipletNoArray=chipletNoArray,
+                              memCtrlMask=(kindArray == NodeKind.MEMCTRL.value),
+                              numTotalMemCtrl=self.numTotalMemCtrl,
+                              tsvMaskTable=tsvMaskTable,
+                              numTSVTable=numTSVTable)
+
+    def __getSweepJobList(self, argTSVLayoutList: list = None, argTopologyList: list = None) -> list:
+        # one job per (topology, isSquare) of argTopologyList (every topology by default), each topology
+        # is built only once; without a layout list the jobs only carry the score tables
+        sweepJobList = []
+
+        if(None != argTSVLayoutList):
+            argTSVLayoutList = list(argTSVLayoutList)
+
+        if(None == argTopologyList):
+            argTopologyList = self.topolgyList
+
+        for topology in argTopologyList:
+            self.topolgy = topology
+
+            with self.profiler.phase('setTopology', topology=topology):
+                self.__clear()
+                self.__setTopolgy()
+
+            self.channelArrayDict[topology] = linkload.getChannelArray(self.icn)
 
-            for xdst in xdst_lst:
-                if (self.numXDimNodes <= xdst):
+            with self.profiler.phase('setHopDistance', topology=topology, numEdges=self.icn.getNumEdges()):
+                self.__setHopDistance()
+
+            if(self.linkWeightModel != 'none'):
+                with self.profiler.phase('setLatencyDistance', topology=topology):
+                    self.__setLatencyDistance()
+
+            if(self.routingAlgorithm != 'none'):
+                with self.profiler.phase('setRoutingTable', topology=topology):
+                    self.__setRoutingTable()
+
+            for isSquare in self.isSquareList:
+                self.isSquare = isSquare
+
+                with self.profiler.phase('getSweepJob', topology=topology, isSquare=isSquare):
+                    sweepJob = self.__getSweepJob()
+
+                # every layout of the sweep becomes a handful of table lookups
+                with self.profiler.phase('getScoreTable', topology=topology, isSquare=isSquare):
+                    sweepJob = replace(sweepJob, scoreTable=sweep.getScoreTable(sweepJob))
+
+                # the first pattern on every chiplet until a run picks a more telling layout
+                if(topology not in self.renderDict):
+                    self.renderDict[topology] = (self.__getLayoutKindArray(sweepJob, np.zeros(
+                        sweepJob.tsvMaskTable.shape[0], dtype=np.intp)), None)
+
+                if(None == argTSVLayoutList):
+                    sweepJobList.append(sweepJob)
                     continue
 
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((xdst, dstIndexY))
+                patternIndexArray = self.__getPatternIndexArray(argTSVLayoutList)
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+                # evaluate one layout per symmetry class, results are expanded back afterwards
+                with self.profiler.phase('getLayoutClass', topology=topology, isSquare=isSquare,
+                                         numLayouts=len(patternIndexArray)):
+                    permutationList = [permutation for permutation in
+                                       symmetry.getGridPermutationDict(self.numXDimNodes, self.numYDimNodes).values()
+                                       if symmetry.isScorePreserving(permutation, self.icn,
+                                                                     sweepJob.chipletNoArray, sweepJob.memCtrlMask)]
 
-        # Vertical links
-        for (srcIndexX, srcIndexY) in product(range(self.numXDimNodes - 1), range(self.numYDimNodes)):
-            dstIndexX = srcIndexX + 1
+                    layoutClass = symmetry.getLayoutClass(sweepJob.tsvMaskTable, sweepJob.numTSVTable,
+                                                          patternIndexArray, permutationList)
+                    (representativeArray, layoutClassArray) = np.unique(layoutClass, return_inverse=True)
 
-            if srcIndexX == 0 or srcIndexX == 6:
-                dstIndexX = srcIndexX + 1
-                dstIndexY = (srcIndexY // 2) * 2 + ((srcIndexY + 1) % 2)
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((dstIndexX, dstIndexY))
+                sweepJobList.append(replace(sweepJob, patternIndexArray=patternIndexArray[representativeArray],
+                                            layoutClassArray=layoutClassArray))
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+        return sweepJobList
 
-            elif srcIndexX == 1 or srcIndexX == 5:
-                dstIndexX = srcIndexX + 1
-                dstIndexY = (srcIndexY // 4) * 4 + ((srcIndexY + 2) % 4)
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((dstIndexX, dstIndexY))
+    def __getLatencyJobList(self, argSweepJobList: list) -> list:
+        # the sweep jobs over the weighted distances, layouts and symmetry classes carry over since
+        # the grid symmetries preserve wire lengths
+        latencyJobList = []
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+        for sweepJob in argSweepJobList:
+            latencyJob = replace(sweepJob, hopDistance=self.latencyDistanceDict[sweepJob.topology], scoreTable=None)
+            latencyJobList.append(replace(latencyJob, scoreTable=sweep.getScoreTable(latencyJob)))
 
-            elif srcIndexX == 2 or srcIndexX == 4:
-                dstIndexX = srcIndexX + 1
-                dstIndexY = (srcIndexY // 8) * 8 + ((srcIndexY + 4) % 8)
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((dstIndexX, dstIndexY))
+        return latencyJobList
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+    def __getRoutedJobList(self, argSweepJobList: list, argTSVLayoutList: list) -> list:
+        # the sweep jobs over the routed hop counts; routes need not map onto each other under the grid
+        # symmetries (up*/down* hangs off one root), so every layout is scored, from the score tables
+        patternIndexArray = self.__getPatternIndexArray(argTSVLayoutList)
+        routedJobList = []
 
-            elif srcIndexX == 3:
-                dstIndexX = srcIndexX + 1
-                dstIndexY = (srcIndexY // 16) * 16 + ((srcIndexY + 8) % 16)
-                srcNodeId = self.__get1DIndex((srcIndexX, srcIndexY))
-                dstNodeId = self.__get1DIndex((dstIndexX, dstIndexY))
+        for sweepJob in argSweepJobList:
+            routedJob = replace(sweepJob, hopDistance=self.routedDistanceDict[sweepJob.topology],
+                                patternIndexArray=patternIndexArray,
+                                layoutClassArray=np.arange(len(patternIndexArray)), scoreTable=None)
+            routedJobList.append(replace(routedJob, scoreTable=sweep.getScoreTable(routedJob)))
 
-                self.icn.add_edge(srcNodeId, dstNodeId)
-                self.icn.add_edge(dstNodeId, srcNodeId)
+        return routedJobList
 
-        return
+    def __runStacked(self, argSweepJobList: list) -> list:
+        # end to end avg hop count of every layout per job, on the interposer with its dies stacked
+        # on top; the grid symmetries map die meshes onto die meshes, so representatives suffice
+        stackedHopCountList = []
 
-    def __visualize(self):
-        # dict with two of the positions set
-        fixed_positions = {}
-        for (y, x) in product(range(self.numYDimNodes), range(self.numXDimNodes)):
-            node_num = x + (self.numXDimNodes * (self.numYDimNodes - 1 - y))
-            fixed_positions[node_num] = (x, y)
+        for sweepJob in argSweepJobList:
+            (chanSrcArray, chanDstArray) = self.channelArrayDict[sweepJob.topology]
+            numEdges = len(chanSrcArray) // 2
 
-        fixed_nodes = fixed_positions.keys()
+            stackedNetwork = stack.StackedNetwork((chanSrcArray[:numEdges], chanDstArray[:numEdges]),
+                                                  self.numTotalNodes, self.numXDimNodes,
+                                                  sweepJob.chipletNoArray, sweepJob.memCtrlMask,
+                                                  sweepJob.numTotalMemCtrl)
 
-        pos = nx.spring_layout(
-            self.icn, dim=2, pos=fixed_positions, fixed=fixed_nodes)
+            (tsvMask, _) = evaluator.getLayoutMask(sweepJob.tsvMaskTable, sweepJob.numTSVTable,
+                                                   sweepJob.patternIndexArray)
 
-        nx.draw(self.icn, pos, with_labels=True,
-                node_color='lightblue', edge_color='gray', node_size = 200)
+            with self.profiler.phase('evaluateStacked', topology=sweepJob.topology, isSquare=sweepJob.isSquare,
+                                     numLayouts=len(tsvMask), numNodes=stackedNetwork.numNodes):
+                repHopCountArray = stackedNetwork.getAvgHopCountArray(tsvMask, self.numWorkers).astype(np.float32)
 
-        figName = self.topolgy + ".png"
+            self.profiler.count('stackedShortestPathSource', len(tsvMask) * stackedNetwork.getNumSources())
 
-        plt.savefig(figName)
-        plt.cla()
+            stackedHopCountList.append(repHopCountArray[sweepJob.layoutClassArray])
 
-    def visualize(self):
-        for topology in self.topolgyList:
-            self.topolgy = topology
+        return stackedHopCountList
 
-            self.__clear()
-            self.__setTopolgy()
-            self.__visualize()
+    def __getInjectionRateArray(self) -> np.ndarray:
+        return np.linspace(0, self.maxInjectionRate, self.numInjectionRates + 1)[1:]
 
+    def __runLinkLoad(self, argSweepJobList: list, argTSVLayoutList: list, argOutputPath: str = None,
+                      argIsQueueing: bool = False, argIsRouted: bool = False) -> list:
+        # ECMP channel loads of every layout under the avg hop count's traffic mix, returns
+        # (maxLoadArray, meanLoadArray, saturationRateArray, latencyArray) over every layout per job,
+        # the last two only with argIsQueueing; argIsRouted follows the routing tables instead of ECMP
+        channelLoadList = []
+        outputDict = {'tsvLayout': np.array([' '.join(tsvLayout) for tsvLayout in argTSVLayoutList])}
+        rateArray = self.__getInjectionRateArray()
+        renderTopologySet = set()
+
+        if(argIsQueueing):
+            outputDict['injectionRate'] = rateArray
+
+        for sweepJob in argSweepJobList:
+            (chanSrcArray, chanDstArray) = self.channelArrayDict[sweepJob.topology]
 
-    def __getNodeType(self, argNodeId: int) -> NodeType:
-        return self.icn.nodes[argNodeId]['type']
+            nextHopTable = self.nextHopDict[sweepJob.topology] if argIsRouted else None
+
+            with self.profiler.phase('getLinkLoadTable', topology=sweepJob.topology, isSquare=sweepJob.isSquare,
+                                     isRouted=argIsRouted):
+                linkLoadTable = linkload.LinkLoadTable((chanSrcArray, chanDstArray), sweepJob.hopDistance,
+                                                       sweepJob.chipletNoArray, sweepJob.memCtrlMask,
+                                                       sweepJob.numTotalMemCtrl, sweepJob.tsvMaskTable,
+                                                       sweepJob.numTSVTable, nextHopTable)
+
+            # symmetric layouts load the permuted channels, so only representatives are computed
+            numRep = len(sweepJob.patternIndexArray)
+            chunkSize = max(1, sweep.MAX_CHUNK_MASK_BYTES // (8 * len(chanSrcArray)))
+
+            maxLoadArray = np.empty(numRep, dtype=np.float32)
+            meanLoadArray = np.empty(numRep, dtype=np.float32)
+            repLoadList = []
+            repLatencyList = []
+
+            numEndpointsArray = sweepJob.numTSVTable[np.arange(sweepJob.numTSVTable.shape[0]),
+                                                     sweepJob.patternIndexArray].sum(axis=1) + \
+                sweepJob.numTotalMemCtrl
+
+            for start in range(0, numRep, chunkSize):
+                # layouts without any TSV have no traffic model and come out as nan, like their score
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    channelLoad = linkLoadTable.getLoad(sweepJob.patternIndexArray[start:start + chunkSize])
+
+                maxLoadArray[start:start + chunkSize] = channelLoad.max(axis=1)
+                meanLoadArray[start:start + chunkSize] = channelLoad.mean(axis=1)
+
+                if(None != argOutputPath):
+                    repLoadList.append(channelLoad.astype(np.float32))
+
+                if(argIsQueueing):
+                    with self.profiler.phase('getLatencyCurve', topology=sweepJob.topology,
+                                             isSquare=sweepJob.isSquare, numLayouts=len(channelLoad)):
+                        repLatencyList.append(queueing.getLatencyCurve(
+                            channelLoad, numEndpointsArray[start:start + chunkSize], rateArray))
+
+            # visualize() draws the bottleneck layout of each topology's first chiplet shape
+            if(not argIsRouted and sweepJob.topology not in renderTopologySet and not np.isnan(maxLoadArray).all()):
+                renderTopologySet.add(sweepJob.topology)
+                patternRow = sweepJob.patternIndexArray[np.nanargmax(maxLoadArray)]
+
+                self.renderDict[sweepJob.topology] = (self.__getLayoutKindArray(sweepJob, patternRow),
+                                                      linkLoadTable.getLoad(patternRow)[0])
+
+            layoutClassArray = sweepJob.layoutClassArray
+            saturationRateArray = None
+            latencyArray = None
+
+            # both only depend on the multiset of channel loads, which symmetric layouts share
+            if(argIsQueueing):
+                saturationRateArray = queueing.getSaturationRate(maxLoadArray, numEndpointsArray)[layoutClassArray]
+                latencyArray = np.concatenate(repLatencyList)[layoutClassArray]
+
+            channelLoadList.append((maxLoadArray[layoutClassArray], meanLoadArray[layoutClassArray],
+                                    saturationRateArray, latencyArray))
+
+            if(None != argOutputPath):
+                prefix = f"{sweepJob.topology}_{sweepJob.isSquare}_"
+
+                outputDict[prefix + 'srcArray'] = chanSrcArray
+                outputDict[prefix + 'dstArray'] = chanDstArray
+                # [representative, channel], layoutClass maps every layout to its representative's row
+                outputDict[prefix + 'channelLoad'] = np.concatenate(repLoadList)
+                outputDict[prefix + 'layoutClass'] = layoutClassArray
+                outputDict[prefix + 'maxLoad'] = maxLoadArray[layoutClassArray]
+                outputDict[prefix + 'meanLoad'] = meanLoadArray[layoutClassArray]
+
+                if(argIsQueueing):
+                    outputDict[prefix + 'saturationRate'] = saturationRateArray
+                    outputDict[prefix + 'latency'] = latencyArray.astype(np.float32)
+
+        if(None != argOutputPath):
+            np.savez_compressed(argOutputPath, **outputDict)
+
+        return channelLoadList
+
+    def __getSweepMeta(self) -> dict:
+        # everything a resumed run must share with the original one, and the shards of one sweep
+        # with each other
+        return {'numXDimNodes': self.numXDimNodes, 'numYDimNodes': self.numYDimNodes, 'numChiplet': self.numChiplet,
+                'tsvPatternTypeList': self.tsvPatternTypeList,
+                'topolgyList': self.topolgyList, 'isSquareList': self.isSquareList,
+                'shard': None if None == self.shard else list(self.shard),
+                'tsvDispListSquare': self.tsvDispListSquare,
+                'tsvDispListNotSquare': self.tsvDispListNotSquare}
+
+    def __loadSweepMeta(self, argResultSink: results.ResultSink):
+        sweepMeta = argResultSink.loadMeta()
+
+        if(None == sweepMeta):
+            return
+
+        for key in ['numXDimNodes', 'numYDimNodes', 'numChiplet', 'tsvPatternTypeList', 'shard']:
+            if(sweepMeta.get(key) != self.__getSweepMeta()[key]):
+                raise ConfigError(f"cannot resume {argResultSink.path}: {key} differs from the configuration")
+
+        # reuse the isolated placements the existing rows were computed with
+        self.tsvDispListSquare = sweepMeta['tsvDispListSquare']
+        self.tsvDispListNotSquare = sweepMeta['tsvDispListNotSquare']
+
+    def __runSweep(self, argSweepJobList: list, argTSVLayoutList: list, argResultSink,
+                   argLayoutRangeList: list = None) -> list:
+        # evaluates every job, or the (start, stop) layouts per job of argLayoutRangeList, and streams
+        # its rows to the sink in layout order, returns the avg hop count of every layout per job
+        tsvLayoutStrList = [' '.join(tsvLayout) for tsvLayout in argTSVLayoutList]
+        doneDict = argResultSink.getDoneDict() if argResultSink else {}
 
-    def __getNodeKind(self, argNodeId: int) -> NodeKind:
-        return self.__getNodeType(argNodeId).kind
+        if(None == argLayoutRangeList):
+            argLayoutRangeList = [(0, len(argTSVLayoutList))] * len(argSweepJobList)
 
-    def __getNodeChipletNo(self, argNodeId: int) -> int:
-        return self.__getNodeType(argNodeId).chiplet_no
+        avgHopCountList = []
+        isDoneList = []
+        isOtherList = []
+        repHopCountList = []
+        pendingRepList = []
+        pendingJobList = []
 
-    def __getHopCountBetween(self, argSrcNodeId: int, argDstNodeId: int) -> int:
-        return (len(nx.shortest_path(self.icn, argSrcNodeId, argDstNodeId)) - 1)
+        for (sweepJob, (layoutStart, layoutStop)) in zip(argSweepJobList, argLayoutRangeList):
+            avgHopCountArray = np.full(len(argTSVLayoutList), np.nan, dtype=np.float32)
 
-    def __getAvgHopCountAt(self, argNodeId: int) -> np.float32:
-        match self.__getNodeKind(argNodeId):
-            case NodeKind.NORMAL:
-                return 0
+            if(doneDict):
+                for (layoutNo, tsvLayoutStr) in enumerate(tsvLayoutStrList):
+                    avgHopCountArray[layoutNo] = doneDict.get((sweepJob.topology, sweepJob.isSquare, tsvLayoutStr), np.nan)
 
-            case NodeKind.TSV:
-                avgHopCount = 0
-                for dstNodeId in range(self.numTotalNodes):
-                    match self.__getNodeKind(dstNodeId):
-                        case NodeKind.NORMAL:
-                            pass
-                        case NodeKind.TSV if int(self.__getNodeChipletNo(argNodeId)) != int(self.__getNodeChipletNo(dstNodeId)):
-                            avgHopCount += self.probCoreToCore * \
-                                self.__getHopCountBetween(
-                                    argNodeId, dstNodeId)
+            isDone = ~np.isnan(avgHopCountArray)
 
-                        case NodeKind.MEMCTRL:
-                            avgHopCount += self.probCoreToMemCtrl * \
-                                self.__getHopCountBetween(argNodeId, dstNodeId)
+            # layouts outside the range belong to other shards, they are neither evaluated nor written
+            isOther = np.ones(len(argTSVLayoutList), dtype=bool)
+            isOther[layoutStart:layoutStop] = False
 
-                        case _:
-                            pass
+            # a representative is known once any layout of its class is on disk
+            repHopCountArray = np.full(len(sweepJob.patternIndexArray), np.nan, dtype=np.float32)
+            repHopCountArray[sweepJob.layoutClassArray[isDone]] = avgHopCountArray[isDone]
 
-                return np.float32(avgHopCount)
+            pendingRepArray = np.unique(sweepJob.layoutClassArray[~isDone & ~isOther])
+            pendingRepArray = pendingRepArray[np.isnan(repHopCountArray[pendingRepArray])]
 
-            case NodeKind.MEMCTRL:
-                avgHopCount = 0
+            avgHopCountList.append(avgHopCountArray)
+            isDoneList.append(isDone | isOther)
+            isOtherList.append(isOther)
+            repHopCountList.append(repHopCountArray)
+            pendingRepList.append(pendingRepArray)
+            pendingJobList.append(replace(sweepJob, patternIndexArray=sweepJob.patternIndexArray[pendingRepArray],
+                                          layoutClassArray=None))
 
-                for dstNodeId in range(self.numTotalNodes):
-                    match self.__getNodeType(dstNodeId).kind:
-                        case NodeKind.NORMAL:
-                            pass
-                        case NodeKind.TSV:
-                            avgHopCount += self.probMemCtrlToCore * \
-                                self.__getHopCountBetween(argNodeId, dstNodeId)
+        numTotalLayout = sum(int((~isOther).sum()) for isOther in isOtherList)
+        numSkipped = sum(int((isDone & ~isOther).sum()) for (isDone, isOther) in zip(isDoneList, isOtherList))
+        numEvaluated = sum(len(pendingRepArray) for pendingRepArray in pendingRepList)
 
-                        case NodeKind.MEMCTRL:
-                            pass
+        if(numSkipped):
+            print(f"Resuming: {numSkipped} of {numTotalLayout} layouts already on disk")
 
-                        case _:
-                            pass
+        print(f"Evaluated {numEvaluated} of {numTotalLayout - numSkipped} layouts "
+              f"({numTotalLayout - numSkipped - numEvaluated} saved by symmetry)")
+        print()
 
-                return np.float32(avgHopCount)
+        emittedList = [0] * len(argSweepJobList)
 
-            case _:
-                pass
+        def emit(argJobNo):
+            # hands out the layouts whose representative is known, in layout order
+            sweepJob = argSweepJobList[argJobNo]
+            layoutClassArray = sweepJob.layoutClassArray
+            start = emittedList[argJobNo]
 
-    def __clear(self):
-        return self.icn.clear()
+            isReady = isDoneList[argJobNo][start:] | ~np.isnan(repHopCountList[argJobNo][layoutClassArray[start:]])
+            stop = len(layoutClassArray) if isReady.all() else start + int(np.argmin(isReady))
 
-    def __getPossibleTSVLayout(self):
-        tsvPatternTypeList = self.tsvPatternTypeList
-        tsvLayoutList = []
-
-        for chiplet1TSVType in tsvPatternTypeList:
-            for chiplet2TSVType in tsvPatternTypeList:
-                for chiplet3TSVType in tsvPatternTypeList:
-                    for chiplet4TSVType in tsvPatternTypeList:
-                        tsvLayout = (chiplet1TSVType, chiplet2TSVType,\
-                                     chiplet3TSVType, chiplet4TSVType)
-                        tsvLayoutList.append(tsvLayout)
-
-        return tsvLayoutList
-                        
-    def __run(self):
-        # returns avg hop count
-
-        hopCountSum = 0
-
-        for indexX in range(self.numXDimNodes):
-            for indexY in range(self.numYDimNodes):
-                targetNodeId = self.__get1DIndex((indexX, indexY))
-                hopCountSum += self.__getAvgHopCountAt(targetNodeId)
-
-        return np.float32(hopCountSum/(self.numTotalTSV + self.numTotalMemCtrl))
-    
-    def run(self):
+            isNew = ~isDoneList[argJobNo][start:stop]
+            avgHopCountArray = avgHopCountList[argJobNo]
+            avgHopCountArray[start:stop] = repHopCountList[argJobNo][layoutClassArray[start:stop]]
+
+            if(argResultSink and isNew.any()):
+                with self.profiler.phase('writeResult', topology=sweepJob.topology, isSquare=sweepJob.isSquare,
+                                         numLayouts=int(isNew.sum())):
+                    argResultSink.write(sweepJob.topology, sweepJob.isSquare,
+                                        [tsvLayoutStrList[layoutNo] for layoutNo in np.arange(start, stop)[isNew]],
+                                        avgHopCountArray[start:stop][isNew])
+
+            emittedList[argJobNo] = stop
+
+        for jobNo in range(len(argSweepJobList)):
+            emit(jobNo)
+
+        chunkStartTime = time.perf_counter()
+
+        for (jobNo, start, repHopCountArray) in sweep.iterSweep(pendingJobList, self.numWorkers):
+            # with workers this is the wait for the next chunk in order
+            self.profiler.addPhase('evaluate', chunkStartTime, topology=pendingJobList[jobNo].topology,
+                                   isSquare=pendingJobList[jobNo].isSquare, start=start,
+                                   numLayouts=len(repHopCountArray), isTable=sweep.isTableJob(pendingJobList[jobNo]))
+            self.profiler.count('layoutScored', len(repHopCountArray))
+
+            repNoArray = pendingRepList[jobNo][start:start + len(repHopCountArray)]
+            repHopCountList[jobNo][repNoArray] = repHopCountArray
+
+            emit(jobNo)
+
+            chunkStartTime = time.perf_counter()
+
+        if(argResultSink):
+            argResultSink.close()
+
+        return avgHopCountList
+
+    def run(self, argIsLinkLoad: bool = False, argLinkLoadPath: str = None, argIsQueueing: bool = False,
+            argPlotPath: str = "result.png", argShard: tuple = None):
+
+        tsvLayoutList = list(self.__getEnumerableTSVLayout())
+
+        resultSink = None
+        self.shard = argShard
+
+        if(None != self.outputPath):
+            resultSink = results.ResultSink(self.outputPath, argResume=self.resume)
+            self.__loadSweepMeta(resultSink)
+
+        if(None != argShard):
+            # only the rows of this shard, mergeShards() reports and plots once every shard is done
+            if(None == resultSink):
+                raise ConfigError("a sharded sweep needs an output path")
+
+            self.__runShard(tsvLayoutList, resultSink)
+            return
+
+        sweepJobList = self.__getSweepJobList(tsvLayoutList)
+
+        if(resultSink):
+            resultSink.saveMeta(self.__getSweepMeta())
+
+        with self.profiler.phase('runSweep', numLayouts=len(tsvLayoutList) * len(sweepJobList)):
+            avgHopCountList = self.__runSweep(sweepJobList, tsvLayoutList, resultSink)
+
+        avgLatencyList = None
+
+        if(self.linkWeightModel != 'none'):
+            with self.profiler.phase('runLatencySweep', numLayouts=len(tsvLayoutList) * len(sweepJobList)):
+                avgLatencyList = sweep.runSweep(self.__getLatencyJobList(sweepJobList), self.numWorkers)
 
-        topologyIndexList = []
-        meanList = []
-        tsvLayoutList = self.__getPossibleTSVLayout()
+        routedJobList = None
+        routedHopCountList = None
 
-        plt.ylim(0, 8)
+        if(self.routingAlgorithm != 'none'):
+            routedJobList = self.__getRoutedJobList(sweepJobList, tsvLayoutList)
+
+            with self.profiler.phase('runRoutedSweep', numLayouts=len(tsvLayoutList) * len(sweepJobList)):
+                routedHopCountList = sweep.runSweep(routedJobList, self.numWorkers)
+
+        stackedHopCountList = None
+
+        if(self.isStacked):
+            with self.profiler.phase('runStacked', numLayouts=len(tsvLayoutList) * len(sweepJobList)):
+                stackedHopCountList = self.__runStacked(sweepJobList)
+
+        channelLoadList = None
+
+        if(argIsLinkLoad or None != argLinkLoadPath or argIsQueueing):
+            with self.profiler.phase('runLinkLoad', numLayouts=len(tsvLayoutList) * len(sweepJobList)):
+                channelLoadList = self.__runLinkLoad(sweepJobList, tsvLayoutList, argLinkLoadPath, argIsQueueing)
+
+        routedLoadList = None
+
+        if(channelLoadList and routedJobList):
+            with self.profiler.phase('runRoutedLinkLoad', numLayouts=len(tsvLayoutList) * len(sweepJobList)):
+                routedLoadList = self.__runLinkLoad(routedJobList, tsvLayoutList, argIsRouted=True)
+
+        hopCountListList = []
 
         for topology in self.topolgyList:
             print(f"======= Topology: {topology}")
 
-            self.topolgy = topology
             hopCountList = []
+            latencyList = []
+            routedList = []
+            routedMaxLoadList = []
+            stackedList = []
+            maxLoadList = []
+            meanLoadList = []
+            saturationRateList = []
+            queueingLatencyList = []
+
+            for (jobNo, (sweepJob, avgHopCountArray)) in enumerate(zip(sweepJobList, avgHopCountList)):
+                if(sweepJob.topology != topology):
+                    continue
 
-            for isSquare in self.isSquareList:
-                if(isSquare):
+                if(avgLatencyList):
+                    latencyList.extend(avgLatencyList[jobNo])
+
+                if(routedHopCountList):
+                    routedList.extend(routedHopCountList[jobNo])
+
+                if(routedLoadList):
+                    routedMaxLoadList.extend(routedLoadList[jobNo][0])
+
+                if(stackedHopCountList):
+                    stackedList.extend(stackedHopCountList[jobNo])
+
+                if(channelLoadList):
+                    maxLoadList.extend(channelLoadList[jobNo][0])
+                    meanLoadList.extend(channelLoadList[jobNo][1])
+
+                if(argIsQueueing):
+                    saturationRateList.extend(channelLoadList[jobNo][2])
+                    queueingLatencyList.append(channelLoadList[jobNo][3])
+
+                if(sweepJob.isSquare):
                     isSquareStr = 'Grid'
                 else:
                     isSquareStr = 'List'
 
-                for tsvLayout in tsvLayoutList:
-                    (self.isSquare, self.tsvLayout) = isSquare, tsvLayout
-
-                    self.__clear()
-                    self.__place()
-                    self.__setTopolgy()
-                    avgHopCount = self.__run()
-                    hopCountList.append(avgHopCount)
+                hopCountList.extend(avgHopCountArray)
 
-                    #print(f"HopCount when {tsvLayout}, {isSquareStr}: {avgHopCount}")
+                #for (tsvLayout, avgHopCount) in zip(tsvLayoutList, avgHopCountArray):
+                #    print(f"HopCount when {tsvLayout}, {isSquareStr}: {avgHopCount}")
 
             stdDev = np.std(hopCountList)
             mean = np.mean(hopCountList)
-            meanList.append(mean)
 
             print(f"StdDev: {stdDev}")
             print(f"Mean: {mean}")
+
+            if(latencyList):
+                print(f"Latency StdDev: {np.std(latencyList)}")
+                print(f"Latency Mean: {np.mean(latencyList)} ({self.linkWeightModel})")
+
+            if(routedList):
+                print(f"Routed StdDev: {np.std(routedList)}")
+                print(f"Routed Mean: {np.mean(routedList)} ({self.routingAlgorithmDict[topology]})")
+
+            if(stackedList):
+                print(f"Stacked StdDev: {np.std(stackedList)}")
+                print(f"Stacked Mean: {np.mean(stackedList)}")
+
+            if(maxLoadList):
+                print(f"Max Channel Load: {np.nanmean(maxLoadList)} (worst layout {np.nanmax(maxLoadList)}, "
+                      f"best layout {np.nanmin(maxLoadList)})")
+                print(f"Mean Channel Load: {np.nanmean(meanLoadList)}")
+
+            if(routedMaxLoadList):
+                print(f"Routed Max Channel Load: {np.nanmean(routedMaxLoadList)} (worst layout "
+                      f"{np.nanmax(routedMaxLoadList)}, best layout {np.nanmin(routedMaxLoadList)})")
+
+            if(saturationRateList):
+                print(f"Saturation Rate: {np.nanmean(saturationRateList)} (worst layout "
+                      f"{np.nanmin(saturationRateList)}, best layout {np.nanmax(saturationRateList)})")
+
+                # the highest configured rate every layout of the topology still sustains
+                rateArray = self.__getInjectionRateArray()
+                queueingLatency = np.concatenate(queueingLatencyList)
+                isStableArray = np.isfinite(queueingLatency).all(axis=0)
+
+                if(isStableArray.any()):
+                    rateNo = np.flatnonzero(isStableArray)[-1]
+                    print(f"Queueing Latency Mean: {np.mean(queueingLatency[:, rateNo])} "
+                          f"at injection rate {rateArray[rateNo]}")
+
+            print()
+
+            hopCountListList.append(hopCountList)
+
+        # None skips the plot, and with it matplotlib
+        if(None != argPlotPath):
+            with self.profiler.phase('savePlot'):
+                render.saveResultPlot(argPlotPath, self.topolgyList, hopCountListList)
+
+
+
+    def __getShardRangeList(self, argNumLayouts: int) -> list:
+        # (start, stop) layouts per (topology, isSquare) job of this shard; the work items are the
+        # layouts of the jobs in sweep order, cut into numShards contiguous runs, so a shard only
+        # builds the few topologies its run crosses
+        (shardNo, numShards) = self.shard
+        numItems = len(self.topolgyList) * len(self.isSquareList) * argNumLayouts
+
+        (itemStart, itemStop) = (shardNo * numItems // numShards, (shardNo + 1) * numItems // numShards)
+
+        return [(min(argNumLayouts, max(0, itemStart - jobNo * argNumLayouts)),
+                 max(0, min(argNumLayouts, itemStop - jobNo * argNumLayouts)))
+                for jobNo in range(len(self.topolgyList) * len(self.isSquareList))]
+
+    def __runShard(self, argTSVLayoutList: list, argResultSink: results.ResultSink):
+        layoutRangeList = self.__getShardRangeList(len(argTSVLayoutList))
+        numIsSquare = len(self.isSquareList)
+
+        # isolated placements are drawn in the order of a full sweep, also by a shard without work
+        for isSquare in self.isSquareList:
+            self.isSquare = isSquare
+            self.__getTSVMaskTable()
+
+        topologyNoList = [topologyNo for topologyNo in range(len(self.topolgyList))
+                          if any(start < stop for (start, stop) in
+                                 layoutRangeList[topologyNo * numIsSquare:(topologyNo + 1) * numIsSquare])]
+
+        sweepJobList = self.__getSweepJobList(argTSVLayoutList, [self.topolgyList[topologyNo]
+                                                                 for topologyNo in topologyNoList])
+        layoutRangeList = [layoutRangeList[topologyNo * numIsSquare + isSquareNo] for topologyNo in topologyNoList
+                           for isSquareNo in range(numIsSquare)]
+
+        # the isolated placements are drawn by now, every shard has to agree on them
+        argResultSink.saveMeta(self.__getSweepMeta())
+
+        numLayouts = sum(stop - start for (start, stop) in layoutRangeList)
+
+        with self.profiler.phase('runSweep', numLayouts=numLayouts, shard=f"{self.shard[0]}/{self.shard[1]}"):
+            self.__runSweep(sweepJobList, argTSVLayoutList, argResultSink, layoutRangeList)
+
+        # the merge only takes shards that got this far
+        argResultSink.saveMeta({**self.__getSweepMeta(), 'isComplete': True})
+
+        print(f"Shard {self.shard[0]}/{self.shard[1]}: {numLayouts} layouts in {argResultSink.path}")
+
+    def mergeShards(self, argPathList: list, argPlotPath: str = "result.png"):
+        # reports and plots the results of sharded sweeps as run() does once every shard is done;
+        # the shards have to cover one sweep of this configuration, each exactly once
+        tsvLayoutStrList = [' '.join(tsvLayout) for tsvLayout in self.__getEnumerableTSVLayout()]
+        shardMetaList = []
+        resultDict = {}
+
+        for path in argPathList:
+            shardMeta = results.readMeta(path)
+
+            if(None == shardMeta or None == shardMeta.get('shard')):
+                raise ConfigError(f"{path} is not the output of a sharded sweep")
+
+            if(not shardMeta.get('isComplete')):
+                raise ConfigError(f"shard {shardMeta['shard'][0]} in {path} has not finished")
+
+            shardMetaList.append(shardMeta)
+            shardDict = results.readResultDict(path)
+
+            if(not resultDict.keys().isdisjoint(shardDict.keys())):
+                raise ConfigError(f"{path} repeats layouts of another shard")
+
+            resultDict.update(shardDict)
+
+        numShards = shardMetaList[0]['shard'][1]
+
+        if(sorted(shardMeta['shard'][0] for shardMeta in shardMetaList) != list(range(numShards)) or
+           any(shardMeta['shard'][1] != numShards for shardMeta in shardMetaList)):
+            raise ConfigError(f"the shards {[shardMeta['shard'] for shardMeta in shardMetaList]} "
+                              f"are not one sweep cut {numShards} ways")
+
+        # the same sweep, isolated placements included, everywhere
+        sweepMeta = {key: value for (key, value) in shardMetaList[0].items() if key not in ['shard', 'isComplete']}
+
+        for shardMeta in shardMetaList:
+            if({key: value for (key, value) in shardMeta.items() if key not in ['shard', 'isComplete']} != sweepMeta):
+                raise ConfigError(f"shard {shardMeta['shard'][0]} ran a different sweep than shard "
+                                  f"{shardMetaList[0]['shard'][0]}")
+
+        for key in ['numXDimNodes', 'numYDimNodes', 'numChiplet', 'tsvPatternTypeList', 'topolgyList', 'isSquareList']:
+            if(sweepMeta.get(key) != self.__getSweepMeta()[key]):
+                raise ConfigError(f"cannot merge: {key} of the shards differs from the configuration")
+
+        hopCountListList = []
+
+        for topology in self.topolgyList:
+            print(f"======= Topology: {topology}")
+
+            hopCountList = []
+
+            # rows in the order of run(), so the statistics come out bit for bit the same
+            for isSquare in self.isSquareList:
+                keyList = [(topology, isSquare, tsvLayoutStr) for tsvLayoutStr in tsvLayoutStrList]
+                numMissing = sum(key not in resultDict for key in keyList)
+
+                if(numMissing):
+                    raise ConfigError(f"{numMissing} layouts of {topology}, isSquare {isSquare} are in none of "
+                                      f"the shards")
+
+                hopCountList.extend(np.array([resultDict[key] for key in keyList], dtype=np.float32))
+
+            print(f"StdDev: {np.std(hopCountList)}")
+            print(f"Mean: {np.mean(hopCountList)}")
+            print()
+
+            hopCountListList.append(hopCountList)
+
+        if(None != argPlotPath):
+            with self.profiler.phase('savePlot'):
+                render.saveResultPlot(argPlotPath, self.topolgyList, hopCountListList)
+
+    def getAvgHopCount(self, argTSVLayoutList: list = None) -> list:
+        # [(topology, isSquare, avgHopCountArray)] of argTSVLayoutList (every layout by default),
+        # the sweep of run() without its report, result file and plot
+        if(None == argTSVLayoutList):
+            argTSVLayoutList = list(self.__getEnumerableTSVLayout())
+
+        sweepJobList = self.__getSweepJobList(argTSVLayoutList)
+
+        with self.profiler.phase('runSweep', numLayouts=len(argTSVLayoutList) * len(sweepJobList)):
+            avgHopCountList = self.__runSweep(sweepJobList, argTSVLayoutList, None)
+
+        return [(sweepJob.topology, sweepJob.isSquare, avgHopCountArray)
+                for (sweepJob, avgHopCountArray) in zip(sweepJobList, avgHopCountList)]
+
+    def runMonteCarlo(self, argNumSamples: int, argSeed: int = 0):
+        # estimates the per topology mean of run() from random layouts, drawing a fresh
+        # isolated placement for every isolated chiplet of every sample
+        sweepJobList = self.__getSweepJobList(list(self.__getEnumerableTSVLayout()))
+
+        if('isolated' in self.tsvPatternTypeList):
+            isolatedPatternNo = self.tsvPatternTypeList.index('isolated')
+        else:
+            isolatedPatternNo = None
+
+        print(f"Monte-Carlo: {argNumSamples} samples per topology and chiplet shape, seed {argSeed}")
+        print()
+
+        for topology in self.topolgyList:
+            print(f"======= Topology: {topology}")
+
+            hopCountList = []
+
+            for (jobNo, sweepJob) in enumerate(sweepJobList):
+                if(sweepJob.topology != topology):
+                    continue
+
+                self.isSquare = sweepJob.isSquare
+
+                with self.profiler.phase('runMonteCarlo', topology=topology, isSquare=sweepJob.isSquare,
+                                         numLayouts=argNumSamples):
+                    hopCountList.append(montecarlo.runMonteCarlo(sweepJob, self.__getChipletOffsetList(),
+                                                                 self.__getChipletDispArray(),
+                                                                 self.__getNumIsolatedTSV(), isolatedPatternNo,
+                                                                 argNumSamples, [argSeed, jobNo]))
+
+            (mean, variance, ciLow, ciHigh) = montecarlo.getSampleStats(np.concatenate(hopCountList))
+
+            print(f"Mean: {mean}")
+            print(f"Variance: {variance}")
+            print(f"95% CI: [{ciLow}, {ciHigh}]")
+            print()
+
+    def runResilience(self, argNumFailures: int = 1, argNumSamples: int = 1000, argTarget: str = 'random',
+                      argSeed: int = 0):
+        # fails argNumFailures links per sampled set, random ones or only the long (folded, butterfly)
+        # links, and reports how the avg hop counts and the endpoint reachability of every layout suffer;
+        # per set only the sources whose shortest paths used a failed link rerun their BFS
+        tsvLayoutList = list(self.__getEnumerableTSVLayout())
+        sweepJobList = self.__getSweepJobList(tsvLayoutList)
+        patternIndexArray = self.__getPatternIndexArray(tsvLayoutList)
+
+        print(f"Resilience: {argNumSamples} sets of {argNumFailures} failed {argTarget} links per topology, "
+              f"seed {argSeed}")
+        print()
+
+        for (topologyNo, topology) in enumerate(self.topolgyList):
+            print(f"======= Topology: {topology}")
+
+            # a failure set breaks the grid symmetry, so every layout is scored instead of the representatives
+            jobList = [replace(sweepJob, patternIndexArray=patternIndexArray,
+                               layoutClassArray=np.arange(len(patternIndexArray)))
+                       for sweepJob in sweepJobList if sweepJob.topology == topology]
+
+            (chanSrcArray, chanDstArray) = self.channelArrayDict[topology]
+            numEdges = len(chanSrcArray) // 2
+            (srcArray, dstArray) = (chanSrcArray[:numEdges], chanDstArray[:numEdges])
+
+            match argTarget:
+                case 'random':
+                    candidateEdgeArray = np.arange(numEdges)
+
+                case 'long':
+                    # wire length in node pitches as in __getLinkWeightArray, mesh links span 1
+                    (srcIndexX, srcIndexY) = self.__get2DIndex(srcArray)
+                    (dstIndexX, dstIndexY) = self.__get2DIndex(dstArray)
+                    candidateEdgeArray = np.flatnonzero(np.abs(srcIndexX - dstIndexX) +
+                                                        np.abs(srcIndexY - dstIndexY) > 1)
+
+                case _:
+                    raise ConfigError(f"unknown link failure target: {argTarget}")
+
+            if(len(candidateEdgeArray) < argNumFailures):
+                print(f"Only {len(candidateEdgeArray)} {argTarget} links of {numEdges}, nothing to fail")
+                print()
+                continue
+
+            if((jobList[0].hopDistance == np.iinfo(jobList[0].hopDistance.dtype).max).any()):
+                print("Disconnected before any link fails, skipped")
+                print()
+                continue
+
+            with self.profiler.phase('setIncrementalDistance', topology=topology, numEdges=numEdges):
+                incrementalDistance = resilience.IncrementalDistance((srcArray, dstArray), self.numTotalNodes,
+                                                                     jobList[0].hopDistance)
+
+            baseHopCountList = [sweep.evaluateJob(sweepJob, 0, len(patternIndexArray)) for sweepJob in jobList]
+            failureEvaluatorList = [resilience.FailureEvaluator(sweepJob) for sweepJob in jobList]
+            endpointMaskList = [evaluator.getLayoutMask(sweepJob.tsvMaskTable, sweepJob.numTSVTable,
+                                                        patternIndexArray)[0] | sweepJob.memCtrlMask
+                                for sweepJob in jobList]
+
+            failureSetArray = resilience.getFailureSetArray(np.random.default_rng([argSeed, topologyNo]),
+                                                            candidateEdgeArray, argNumFailures, argNumSamples)
+
+            numDisconnectedList = []
+            lostTrafficList = []
+            deltaList = []
+            numRecomputed = 0
+
+            with self.profiler.phase('runResilience', topology=topology, numSets=argNumSamples):
+                for failedEdgeArray in failureSetArray:
+                    (hopRows, affectedNodeIdArray) = incrementalDistance.getDistance(failedEdgeArray)
+                    numRecomputed += len(affectedNodeIdArray)
+
+                    for (jobNo, sweepJob) in enumerate(jobList):
+                        if(0 == len(affectedNodeIdArray)):
+                            (avgHopCountArray, lostTrafficArray) = (baseHopCountList[jobNo],
+                                                                    np.zeros(len(patternIndexArray)))
+                        else:
+                            (avgHopCountArray, lostTrafficArray) = failureEvaluatorList[jobNo].evaluate(
+                                hopRows, affectedNodeIdArray)
+
+                        numDisconnectedList.append(resilience.getDisconnectedPairCount(
+                            hopRows, affectedNodeIdArray, endpointMaskList[jobNo], sweepJob.chipletNoArray))
+
+                        lostTrafficList.append(lostTrafficArray)
+
+                        # avg hop counts only compare while every pair of the layout is still connected
+                        deltaList.append((avgHopCountArray - baseHopCountList[jobNo])[lostTrafficArray == 0])
+
+            self.profiler.count('failureSet', argNumSamples)
+            self.profiler.count('recomputedSource', numRecomputed)
+
+            # (set, isSquare, layout) disconnected endpoint pairs of each layout's own TSVs and memory controllers
+            numDisconnectedArray = np.asarray(numDisconnectedList)
+            deltaArray = np.concatenate(deltaList)
+
+            # share of the sets that cut some of a layout's endpoints apart, averaged over the layouts
+            print(f"Disconnecting Sets: {np.mean(numDisconnectedArray > 0)}")
+            print(f"Disconnected Endpoint Pairs: {np.mean(numDisconnectedArray)} (max {np.max(numDisconnectedArray)})")
+            print(f"Disconnected Traffic: {np.mean(np.concatenate(lostTrafficList))}")
+
+            if(len(deltaArray)):
+                print(f"Avg Hop Count Increase: {np.mean(deltaArray)} "
+                      f"(p95 {np.quantile(deltaArray, 0.95)}, max {np.max(deltaArray)})")
+
+            print(f"Recomputed Sources: {numRecomputed / (argNumSamples * self.numTotalNodes)}")
             print()
 
-            topologyIndex = self.topolgyList.index(topology)
-            topologyIndexList.append(topologyIndex)
+    def optimize(self, argMethod: str = 'anneal', argInitialLayout: tuple = None, argMaxMoves: int = None,
+                 argTimeBudget: float = None, argSeed: int = 0, argOutputPath: str = None):
+        # moves the TSVs of a starting layout one at a time to lower each topology's avg hop count
+        if(None == argInitialLayout):
+            argInitialLayout = tuple([self.tsvPatternTypeList[0]] * len(self.__getChipletOffsetList()))
 
-            for hopCount in hopCountList:
-                plt.scatter(topologyIndex, hopCount, s = 30, color = 'blue')
+        for tsvPattern in argInitialLayout:
+            if(tsvPattern not in self.tsvPatternTypeList):
+                raise ConfigError(f"unknown TSV pattern in the initial layout: {tsvPattern}")
 
+        if(None == argMaxMoves and None == argTimeBudget):
+            argMaxMoves = 100000
 
+        sweepJobList = self.__getSweepJobList([tuple(argInitialLayout)])
+        placementList = []
 
-        plt.plot(topologyIndexList, meanList, marker = 's', linestyle = '--', color = 'orange')
+        print(f"Optimizing {' '.join(argInitialLayout)} with {argMethod}, seed {argSeed}")
+        print()
+
+        for (jobNo, sweepJob) in enumerate(sweepJobList):
+            layoutEvaluator = sweep.getLayoutEvaluator(sweepJob)
+            (tsvMask, numTotalTSV) = evaluator.getLayoutMask(sweepJob.tsvMaskTable, sweepJob.numTSVTable,
+                                                             sweepJob.patternIndexArray[:1])
+
+            placementOptimizer = optimizer.PlacementOptimizer(layoutEvaluator, sweepJob.chipletNoArray,
+                                                              tsvMask[0], numTotalTSV[0], [argSeed, jobNo])
+            startScore = placementOptimizer.bestScore
+
+            with self.profiler.phase('optimizePlacement', topology=sweepJob.topology, isSquare=sweepJob.isSquare,
+                                     method=argMethod):
+                match argMethod:
+                    case 'anneal':
+                        placementOptimizer.anneal(argMaxMoves, argTimeBudget)
+
+                    case 'greedy':
+                        placementOptimizer.greedy(argMaxMoves, argTimeBudget)
+
+                    case _:
+                        raise ConfigError(f"unknown optimizer: {argMethod}")
+
+            self.profiler.count('placementMove', placementOptimizer.numMoves)
+
+            if(sweepJob.isSquare):
+                isSquareStr = 'Grid'
+            else:
+                isSquareStr = 'List'
+
+            print(f"======= Topology: {sweepJob.topology}, {isSquareStr}")
+            print(f"Start: {startScore}")
+            # the last trace entry is the move that reached the best layout
+            print(f"Best: {placementOptimizer.bestScore} after {placementOptimizer.traceList[-1][0]} moves "
+                  f"({placementOptimizer.numMoves} accepted moves total)")
+            print()
 
-        plt.xticks(topologyIndexList, self.topolgyList)
+            # best TSV positions as (x, y) per chiplet
+            tsvPositionList = []
 
-        plt.xlabel("NoI Topology")
-        plt.ylabel("Averge Hop Count")
-        plt.title("Average Hop Counts Of Different NoI Topologies")
+            for chipletNo in range(len(self.__getChipletOffsetList())):
+                tsvNodeIdArray = np.flatnonzero(placementOptimizer.bestTSVMask & (sweepJob.chipletNoArray == chipletNo))
+                (indexXArray, indexYArray) = self.__get2DIndex(tsvNodeIdArray)
+                tsvPositionList.append([[int(x), int(y)] for (x, y) in zip(indexXArray, indexYArray)])
 
-        plt.savefig("result.png")
-        plt.cla()
+            placementList.append({'topology': sweepJob.topology, 'isSquare': sweepJob.isSquare,
+                                  'initialLayout': list(argInitialLayout), 'method': argMethod, 'seed': argSeed,
+                                  'startScore': startScore, 'bestScore': placementOptimizer.bestScore,
+                                  'tsvPositionList': tsvPositionList,
+                                  'trace': [list(trace) for trace in placementOptimizer.traceList]})
 
+        if(None != argOutputPath):
+            with open(argOutputPath, 'w') as file:
+                json.dump(placementList, file, indent=1)
 
+        return placementList
 
-    # for debugging purposes
+    def search(self, argK: int = 10, argNumBins: int = 20, argNumSamples: int = 1 << 20, argSeed: int = 0):
+        # exact best/worst k layouts and the score distribution, without a sweep over every layout
+        sweepJobList = self.__getSweepJobList()
+
+        print(f"Searching {self.__getNumPossibleTSVLayout()} layouts of {self.numChiplet} chiplets")
+        print()
+
+        for sweepJob in sweepJobList:
+            layoutSearch = search.LayoutSearch(sweepJob.scoreTable)
+
+            if(sweepJob.isSquare):
+                isSquareStr = 'Grid'
+            else:
+                isSquareStr = 'List'
+
+            print(f"======= Topology: {sweepJob.topology}, {isSquareStr}")
+
+            for (title, isBest) in (('Best', True), ('Worst', False)):
+                with self.profiler.phase('getTopK', topology=sweepJob.topology, isSquare=sweepJob.isSquare,
+                                         isBest=isBest):
+                    (patternIndexArray, avgHopCountArray) = layoutSearch.getTopK(argK, isBest)
+
+                print(f"{title} {len(avgHopCountArray)}:")
+
+                for (patternIndexRow, avgHopCount) in zip(patternIndexArray, avgHopCountArray):
+                    print(f"  {' '.join(self.tsvPatternTypeList[patternNo] for patternNo in patternIndexRow)}: "
+                          f"{avgHopCount}")
+
+            with self.profiler.phase('getStats', topology=sweepJob.topology, isSquare=sweepJob.isSquare):
+                layoutStats = layoutSearch.getStats(argNumBins, argNumSamples, argSeed)
+
+            if(layoutStats['isExact']):
+                sourceStr = f"{layoutStats['numScored']} layouts"
+            else:
+                sourceStr = f"{layoutStats['numScored']} sampled layouts"
+
+            print(f"Mean: {layoutStats['mean']}")
+            print(f"StdDev: {layoutStats['stdDev']} (from {sourceStr})")
+            print("Histogram:")
+
+            binEdges = layoutStats['binEdges']
+
+            for (binNo, count) in enumerate(layoutStats['histogram']):
+                print(f"  [{binEdges[binNo]:.4f}, {binEdges[binNo + 1]:.4f}]: {count}")
+
+            print()
+
+    def iterBenchStage(self, argMaxLayouts: int = 1 << 12, argSeed: int = 0):
+        # yields (stage fields, callable) of every hot path for bench.py, in order:
+        # a stage may rely on the state the previous ones left behind
+        numLayout = self.__getNumPossibleTSVLayout()
+
+        if(numLayout <= argMaxLayouts):
+            tsvLayoutList = list(self.__getPossibleTSVLayout())
+        else:
+            patternIndexArray = np.random.default_rng(argSeed).integers(len(self.tsvPatternTypeList),
+                                                                        size=(argMaxLayouts, self.numChiplet))
+            tsvLayoutList = [tuple(self.tsvPatternTypeList[patternNo] for patternNo in patternIndexRow)
+                             for patternIndexRow in patternIndexArray]
+
+        for topology in self.topolgyList:
+            self.topolgy = topology
+
+            yield ({'stage': 'build', 'topology': topology}, lambda: (self.__clear(), self.__setTopolgy()))
+
+            self.__clear()
+            self.__setTopolgy()
+
+            yield ({'stage': 'distance', 'topology': topology}, lambda: distance.getHopDistanceMatrix(self.icn))
+
+            self.hopDistance = distance.getHopDistanceMatrix(self.icn)
+
+            for isSquare in self.isSquareList:
+                self.isSquare = isSquare
+
+                stageDict = {'topology': topology, 'isSquare': isSquare}
+
+                # node kinds, chiplet numbers and the TSV masks of every pattern, as __getSweepJob builds them
+                yield ({'stage': 'nodeArrays', **stageDict},
+                       lambda: (self.__getNodeArrays(), self.__getTSVMaskTable()))
+
+                sweepJob = self.__getSweepJob()
+
+                yield ({'stage': 'scoreTable', **stageDict}, lambda: sweep.getScoreTable(sweepJob))
+
+                patternIndexArray = self.__getPatternIndexArray(tsvLayoutList)
+                maskJob = replace(sweepJob, patternIndexArray=patternIndexArray)
+                tableJob = replace(maskJob, scoreTable=sweep.getScoreTable(sweepJob))
+
+                yield ({'stage': 'scoreMask', 'numItems': len(tsvLayoutList), **stageDict},
+                       lambda: sweep.evaluateJob(maskJob, 0, len(tsvLayoutList)))
+
+                if(sweep.isTableJob(tableJob)):
+                    yield ({'stage': 'scoreLookup', 'numItems': len(tsvLayoutList), **stageDict},
+                           lambda: sweep.evaluateJob(tableJob, 0, len(tsvLayoutList)))
+
+        # every topology again, from the builders to the expanded results
+        yield ({'stage': 'sweep', 'numItems': len(tsvLayoutList) * len(self.topolgyList) * len(self.isSquareList)},
+               lambda: self.__runSweep(self.__getSweepJobList(tsvLayoutList), tsvLayoutList, None))
+
+    # for debugging purposes: the nodes of the current topology and chiplet shape, TSVs of the first
+    # pattern on every chiplet as visualize() draws them by default
     def checkNodeType(self):
+        (_, chipletNoArray) = self.__getNodeArrays()
+        sweepJob = self.__getSweepJob()
+        kindArray = self.__getLayoutKindArray(sweepJob, np.zeros(sweepJob.tsvMaskTable.shape[0], dtype=np.intp))
+
         for index in range(self.numTotalNodes):
-            print(self.__getNodeKind(index).name,
+            nodeType = NodeType(kind=NodeKind(int(kindArray[index])), chiplet_no=int(chipletNoArray[index]))
+
+            print(nodeType.kind.name, nodeType.chiplet_no,
                   self.__get2DIndex(index))
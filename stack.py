@@ -0,0 +1,106 @@
+import numpy as np
+import distance
+from concurrent.futures import ProcessPoolExecutor
+import evaluator
+from topology import Topology
+
+
+class StackedNetwork:
+    # chiplet dies stacked on the interposer: every interposer node under a chiplet gets a core
+    # right above it, the cores of a chiplet form a mesh over its footprint, and a vertical link
+    # joins core and interposer node wherever the layout puts a TSV. Traffic runs core to core
+    # across chiplets and between cores and the memory controllers, end to end through the TSVs.
+    # The cores are the endpoints here and take the TSV count's place in the 2D score's formula,
+    # argNumTotalMemCtrl is the 2D score's memory controller count
+
+    def __init__(self, argEdgeArray: tuple, argNumNodes: int, argNumXDimNodes: int,
+                 argChipletNoArray: np.ndarray, argMemCtrlMask: np.ndarray, argNumTotalMemCtrl: int):
+
+        (srcArray, dstArray) = argEdgeArray
+        chipletNoArray = np.asarray(argChipletNoArray)
+
+        self.numInterposerNodes = argNumNodes
+        self.memCtrlNodeIdArray = np.flatnonzero(argMemCtrlMask)
+        self.numMemCtrlNodes = len(self.memCtrlNodeIdArray)
+        self.numTotalMemCtrl = argNumTotalMemCtrl
+
+        # core k sits above interposer node baseNodeIdArray[k], cores of a chiplet are consecutive
+        self.baseNodeIdArray = np.flatnonzero(chipletNoArray >= 0)
+        self.baseNodeIdArray = self.baseNodeIdArray[np.argsort(chipletNoArray[self.baseNodeIdArray], kind='stable')]
+        self.coreChipletNoArray = chipletNoArray[self.baseNodeIdArray]
+        self.numCores = len(self.baseNodeIdArray)
+        self.numNodes = argNumNodes + self.numCores
+
+        coreNodeIdTable = np.full(argNumNodes, -1, dtype=np.int64)
+        coreNodeIdTable[self.baseNodeIdArray] = argNumNodes + np.arange(self.numCores)
+        self.coreNodeIdTable = coreNodeIdTable
+
+        # die meshes: right and lower neighbors on the same chiplet
+        nodeIdArray = self.baseNodeIdArray
+        rightArray = nodeIdArray + 1
+        lowerArray = nodeIdArray + argNumXDimNodes
+
+        isRight = (nodeIdArray % argNumXDimNodes != argNumXDimNodes - 1) & (rightArray < argNumNodes)
+        isRight[isRight] &= chipletNoArray[rightArray[isRight]] == chipletNoArray[nodeIdArray[isRight]]
+
+        isLower = lowerArray < argNumNodes
+        isLower[isLower] &= chipletNoArray[lowerArray[isLower]] == chipletNoArray[nodeIdArray[isLower]]
+
+        self.baseSrcArray = np.concatenate([srcArray, coreNodeIdTable[nodeIdArray[isRight]],
+                                            coreNodeIdTable[nodeIdArray[isLower]]]).astype(np.int64)
+        self.baseDstArray = np.concatenate([dstArray, coreNodeIdTable[rightArray[isRight]],
+                                            coreNodeIdTable[lowerArray[isLower]]]).astype(np.int64)
+
+        numChiplet = int(self.coreChipletNoArray.max(initial=-1)) + 1
+        self.coreStartArray = np.searchsorted(self.coreChipletNoArray, np.arange(numChiplet + 1))
+
+    def getTopology(self, argTSVMask: np.ndarray) -> Topology:
+        # the stacked graph of one layout, TSVs outside every chiplet have no die to reach
+        tsvNodeIdArray = np.flatnonzero(np.asarray(argTSVMask, dtype=bool) & (self.coreNodeIdTable >= 0))
+
+        topology = Topology(self.numNodes)
+        topology.addEdgeArray(np.concatenate([self.baseSrcArray, tsvNodeIdArray]),
+                              np.concatenate([self.baseDstArray, self.coreNodeIdTable[tsvNodeIdArray]]))
+
+        return topology
+
+    def getNumSources(self) -> int:
+        return self.numMemCtrlNodes + int(self.coreStartArray[-2])
+
+    def getAvgHopCount(self, argTSVMask: np.ndarray) -> float:
+        # end to end avg hop count of one layout, inf when a chiplet has no TSV
+        topology = self.getTopology(argTSVMask)
+        coreNodeIdArray = self.numInterposerNodes + np.arange(self.numCores)
+
+        # links are undirected, so the memory controllers' BFS also gives the core -> memory hops,
+        # and core pairs are counted once from the lower chiplet; no BFS starts at the last chiplet
+        srcNodeIdArray = np.concatenate([self.memCtrlNodeIdArray, coreNodeIdArray[:self.coreStartArray[-2]]])
+        hopMatrix = distance.getHopDistanceMatrix(topology, srcNodeIdArray, coreNodeIdArray)
+
+        if((hopMatrix == np.iinfo(hopMatrix.dtype).max).any()):
+            return np.inf
+
+        memCtrlHopSum = int(hopMatrix[:self.numMemCtrlNodes].sum(dtype=np.int64))
+        coreHopMatrix = hopMatrix[self.numMemCtrlNodes:]
+
+        coreHopSum = 0
+
+        for chipletNo in range(len(self.coreStartArray) - 2):
+            (start, stop) = self.coreStartArray[chipletNo:chipletNo + 2]
+            coreHopSum += int(coreHopMatrix[start:stop, stop:].sum(dtype=np.int64))
+
+        # core pairs go both ways, and core -> memory hops equal memory -> core hops
+        return float(evaluator.getAvgHopCount(2 * coreHopSum, memCtrlHopSum, memCtrlHopSum, self.numCores,
+                                              self.numTotalMemCtrl))
+
+    def getAvgHopCountArray(self, argTSVMask: np.ndarray, argNumWorkers: int = 1) -> np.ndarray:
+        # getAvgHopCount of every (numLayout x numNodes) mask row, layouts spread over argNumWorkers processes
+        tsvMask = np.atleast_2d(argTSVMask)
+
+        if(argNumWorkers <= 1 or len(tsvMask) <= 1):
+            return np.array([self.getAvgHopCount(layoutMask) for layoutMask in tsvMask], dtype=np.float64)
+
+        with ProcessPoolExecutor(max_workers=argNumWorkers) as executor:
+            return np.array(list(executor.map(self.getAvgHopCount, tsvMask,
+                                              chunksize=-(-len(tsvMask) // (4 * argNumWorkers)))),
+                            dtype=np.float64)
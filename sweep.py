@@ -0,0 +1,181 @@
+import numpy as np
+import evaluator
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from dataclasses import dataclass, replace
+
+
+# bound on the bytes of the TSV masks materialized for one work item
+MAX_CHUNK_MASK_BYTES = 1 << 24
+
+
+@dataclass
+class SweepJob:
+    # layouts of one (topology, isSquare) pair, as rows of pattern numbers per chiplet
+    topology: str = None
+    isSquare: int = None
+    hopDistance: np.ndarray = None
+    chipletNoArray: np.ndarray = None
+    memCtrlMask: np.ndarray = None
+    numTotalMemCtrl: int = None
+    tsvMaskTable: np.ndarray = None
+    numTSVTable: np.ndarray = None
+    patternIndexArray: np.ndarray = None
+    # per layout of the full sweep, the row of patternIndexArray holding its symmetry representative
+    layoutClassArray: np.ndarray = None
+    # decomposed hop sums, layouts are scored from the tables when they are exact
+    scoreTable: evaluator.ScoreTable = None
+
+
+# per worker process: job list with shared arrays attached, evaluators built lazily
+_workerJobList = None
+_workerSharedMemoryList = []
+_workerEvaluatorDict = {}
+
+
+def getLayoutEvaluator(argJob: SweepJob) -> evaluator.LayoutEvaluator:
+    return evaluator.LayoutEvaluator(argJob.hopDistance, argJob.chipletNoArray,
+                                     argJob.memCtrlMask, argJob.numTotalMemCtrl)
+
+
+def getScoreTable(argJob: SweepJob) -> evaluator.ScoreTable:
+    return evaluator.ScoreTable(getLayoutEvaluator(argJob), argJob.tsvMaskTable, argJob.numTSVTable)
+
+
+def isTableJob(argJob: SweepJob) -> bool:
+    return argJob.scoreTable is not None and argJob.scoreTable.isExact
+
+
+def evaluateJob(argJob: SweepJob, argStart: int, argStop: int,
+                argLayoutEvaluator: evaluator.LayoutEvaluator = None) -> np.ndarray:
+    # avg hop counts of patternIndexArray rows [argStart, argStop)
+    if(isTableJob(argJob)):
+        return argJob.scoreTable.evaluate(argJob.patternIndexArray[argStart:argStop])
+
+    layoutEvaluator = argLayoutEvaluator or getLayoutEvaluator(argJob)
+
+    (tsvMask, numTotalTSV) = evaluator.getLayoutMask(argJob.tsvMaskTable, argJob.numTSVTable,
+                                                     argJob.patternIndexArray[argStart:argStop])
+
+    return layoutEvaluator.evaluate(tsvMask, numTotalTSV)
+
+
+def runSweep(argJobList: list, argNumWorkers: int = 1) -> list:
+    # returns one avg hop count array per job, expanded to every layout when the job was reduced
+    avgHopCountList = [np.empty(len(job.patternIndexArray), dtype=np.float32) for job in argJobList]
+
+    for (jobNo, start, avgHopCountArray) in iterSweep(argJobList, argNumWorkers):
+        avgHopCountList[jobNo][start:start + len(avgHopCountArray)] = avgHopCountArray
+
+    return [avgHopCountArray if job.layoutClassArray is None else avgHopCountArray[job.layoutClassArray]
+            for (job, avgHopCountArray) in zip(argJobList, avgHopCountList)]
+
+
+def iterSweep(argJobList: list, argNumWorkers: int = 1):
+    # yields (jobNo, start, avgHopCountArray) for consecutive row slices, always in job and row order
+    workItemList = getWorkItemList(argJobList, argNumWorkers)
+
+    if(argNumWorkers <= 1):
+        layoutEvaluatorDict = {}
+
+        for (jobNo, start, stop) in workItemList:
+            if(jobNo not in layoutEvaluatorDict and not isTableJob(argJobList[jobNo])):
+                layoutEvaluatorDict = {jobNo: getLayoutEvaluator(argJobList[jobNo])}
+
+            yield (jobNo, start, evaluateJob(argJobList[jobNo], start, stop, layoutEvaluatorDict.get(jobNo)))
+
+        return
+
+    sharedMemoryList = []
+    sharedDict = {}
+
+    try:
+        # graphs never cross the process boundary, only shared memory names,
+        # and jobs scored from their tables do not need the hop matrix at all
+        jobSpecList = [replace(job,
+                               hopDistance=None if isTableJob(job) else
+                               _shareArray(job.hopDistance, sharedMemoryList, sharedDict),
+                               patternIndexArray=_shareArray(job.patternIndexArray, sharedMemoryList, sharedDict),
+                               layoutClassArray=None)
+                       for job in argJobList]
+
+        with ProcessPoolExecutor(max_workers=argNumWorkers, initializer=_initWorker,
+                                 initargs=(jobSpecList,)) as executor:
+            # map() yields in submission order, so the merge is deterministic
+            yield from executor.map(_evaluateWorkItem, workItemList)
+
+    finally:
+        for sharedMemory in sharedMemoryList:
+            sharedMemory.close()
+            sharedMemory.unlink()
+
+
+def getWorkItemList(argJobList: list, argNumWorkers: int) -> list:
+    # (jobNo, start, stop) slices, a few per worker so stragglers even out
+    numTotalLayout = sum(len(job.patternIndexArray) for job in argJobList)
+    maxNumNodes = max([len(job.memCtrlMask) for job in argJobList], default=1)
+
+    chunkSize = -(-numTotalLayout // (4 * max(1, argNumWorkers)))
+    chunkSize = max(1, min(chunkSize, MAX_CHUNK_MASK_BYTES // maxNumNodes))
+
+    workItemList = []
+
+    for (jobNo, job) in enumerate(argJobList):
+        numLayout = len(job.patternIndexArray)
+
+        for start in range(0, numLayout, chunkSize):
+            workItemList.append((jobNo, start, min(start + chunkSize, numLayout)))
+
+    return workItemList
+
+
+def _shareArray(argArray: np.ndarray, argSharedMemoryList: list, argSharedDict: dict) -> tuple:
+    # copies the array into a shared memory block once, returns (name, shape, dtype)
+    if(id(argArray) not in argSharedDict):
+        sharedMemory = shared_memory.SharedMemory(create=True, size=max(1, argArray.nbytes))
+        argSharedMemoryList.append(sharedMemory)
+
+        np.ndarray(argArray.shape, dtype=argArray.dtype, buffer=sharedMemory.buf)[...] = argArray
+
+        argSharedDict[id(argArray)] = (sharedMemory.name, argArray.shape, argArray.dtype.str)
+
+    return argSharedDict[id(argArray)]
+
+
+def _attachArray(argSpec: tuple) -> np.ndarray:
+    (name, shape, dtype) = argSpec
+
+    # workers share the parent's resource tracker, the parent unlinks the block
+    sharedMemory = shared_memory.SharedMemory(name=name)
+    _workerSharedMemoryList.append(sharedMemory)
+
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=sharedMemory.buf)
+    array.flags.writeable = False
+
+    return array
+
+
+def _initWorker(argJobSpecList: list):
+    global _workerJobList
+
+    attachedDict = {}
+    _workerJobList = []
+
+    for jobSpec in argJobSpecList:
+        for spec in (jobSpec.hopDistance, jobSpec.patternIndexArray):
+            if(spec is not None and spec not in attachedDict):
+                attachedDict[spec] = _attachArray(spec)
+
+        _workerJobList.append(replace(jobSpec, hopDistance=attachedDict.get(jobSpec.hopDistance),
+                                      patternIndexArray=attachedDict[jobSpec.patternIndexArray]))
+
+
+def _evaluateWorkItem(argWorkItem: tuple) -> tuple:
+    (jobNo, start, stop) = argWorkItem
+
+    # work items arrive grouped by job, so one cached evaluator is enough
+    if(jobNo not in _workerEvaluatorDict and not isTableJob(_workerJobList[jobNo])):
+        _workerEvaluatorDict.clear()
+        _workerEvaluatorDict[jobNo] = getLayoutEvaluator(_workerJobList[jobNo])
+
+    return (jobNo, start, evaluateJob(_workerJobList[jobNo], start, stop, _workerEvaluatorDict.get(jobNo)))
@@ -0,0 +1,106 @@
+import numpy as np
+import evaluator
+from sweep import MAX_CHUNK_MASK_BYTES
+
+
+def getGridPermutationDict(argNumXDimNodes: int, argNumYDimNodes: int) -> dict:
+    # mirrors/rotations of the node grid, each as perm[nodeId] = image nodeId
+    (indexY, indexX) = np.divmod(np.arange(argNumXDimNodes * argNumYDimNodes), argNumXDimNodes)
+    (lastX, lastY) = (argNumXDimNodes - 1, argNumYDimNodes - 1)
+
+    permutationDict = {
+        'mirrorX': indexY * argNumXDimNodes + (lastX - indexX),
+        'mirrorY': (lastY - indexY) * argNumXDimNodes + indexX,
+        'rotate180': (lastY - indexY) * argNumXDimNodes + (lastX - indexX),
+    }
+
+    if(argNumXDimNodes == argNumYDimNodes):
+        permutationDict['rotate90'] = indexX * argNumXDimNodes + (lastY - indexY)
+        permutationDict['rotate270'] = (lastX - indexX) * argNumXDimNodes + indexY
+        permutationDict['transpose'] = indexX * argNumXDimNodes + indexY
+        permutationDict['antiTranspose'] = (lastX - indexX) * argNumXDimNodes + (lastY - indexY)
+
+    return permutationDict
+
+
+def isScorePreserving(argPermutation: np.ndarray, argTopology,
+                      argChipletNoArray: np.ndarray, argMemCtrlMask: np.ndarray) -> bool:
+    # True when the permutation is a graph automorphism (so every hop count is kept)
+    # that also keeps the MEMCTRL nodes and the same/different chiplet relation
+    if(not np.array_equal(argMemCtrlMask[argPermutation], argMemCtrlMask)):
+        return False
+
+    # chiplet numbers must map one to one
+    chipletPairArray = np.unique(np.stack([argChipletNoArray, argChipletNoArray[argPermutation]]), axis=1)
+
+    if(len(np.unique(chipletPairArray[0])) != chipletPairArray.shape[1] or
+       len(np.unique(chipletPairArray[1])) != chipletPairArray.shape[1]):
+        return False
+
+    numNodes = argTopology.numNodes
+
+    def getEdgeKeyArray(argSrcArray, argDstArray):
+        return np.sort(np.minimum(argSrcArray, argDstArray).astype(np.int64) * numNodes +
+                       np.maximum(argSrcArray, argDstArray))
+
+    return np.array_equal(getEdgeKeyArray(argPermutation[argTopology.srcArray], argPermutation[argTopology.dstArray]),
+                          getEdgeKeyArray(argTopology.srcArray, argTopology.dstArray))
+
+
+def getLayoutClass(argTSVMaskTable: np.ndarray, argNumTSVTable: np.ndarray,
+                   argPatternIndexArray: np.ndarray, argPermutationList: list) -> np.ndarray:
+    # maps every layout to the lowest index of its equivalence class; two layouts are
+    # equivalent when a score preserving permutation turns one TSV mask into the other
+    numLayout = len(argPatternIndexArray)
+
+    if(numLayout == 0):
+        return np.empty(0, dtype=np.int64)
+
+    chunkSize = max(1, MAX_CHUNK_MASK_BYTES // max(1, argTSVMaskTable.shape[-1]))
+
+    # packed mask + numTotalTSV of every layout and of every layout's image
+    keyList = [[] for _ in range(len(argPermutationList) + 1)]
+    inversePermutationList = [np.argsort(permutation) for permutation in argPermutationList]
+
+    for start in range(0, numLayout, chunkSize):
+        (tsvMask, numTotalTSV) = evaluator.getLayoutMask(argTSVMaskTable, argNumTSVTable,
+                                                         argPatternIndexArray[start:start + chunkSize])
+        numTotalTSVBytes = numTotalTSV.astype(np.int64).reshape(-1, 1).view(np.uint8)
+
+        for (imageNo, inversePermutation) in enumerate([None] + inversePermutationList):
+            imageMask = tsvMask if inversePermutation is None else tsvMask[:, inversePermutation]
+            keyList[imageNo].append(np.hstack([np.packbits(imageMask, axis=1), numTotalTSVBytes]))
+
+    keyArray = np.vstack([np.vstack(imageKeyList) for imageKeyList in keyList])
+
+    # identical keys share an id, images without a matching layout never point below numLayout
+    (_, keyIdArray) = np.unique(keyArray, axis=0, return_inverse=True)
+    keyIdArray = keyIdArray.reshape(-1)
+
+    firstLayoutOfKey = np.full(keyIdArray.max() + 1, numLayout, dtype=np.int64)
+    np.minimum.at(firstLayoutOfKey, keyIdArray[:numLayout], np.arange(numLayout))
+
+    layoutClass = firstLayoutOfKey[keyIdArray[:numLayout]]
+    edgeList = []
+
+    for imageNo in range(len(argPermutationList)):
+        imageLayout = firstLayoutOfKey[keyIdArray[(imageNo + 1) * numLayout:(imageNo + 2) * numLayout]]
+        isFound = imageLayout < numLayout
+
+        edgeList.append(np.stack([np.arange(numLayout)[isFound], imageLayout[isFound]]))
+
+    if(edgeList):
+        (srcArray, dstArray) = np.hstack(edgeList)
+
+        # propagate the smallest index along the image links until it settles
+        while(True):
+            prevLayoutClass = layoutClass.copy()
+
+            np.minimum.at(layoutClass, srcArray, layoutClass[dstArray])
+            np.minimum.at(layoutClass, dstArray, layoutClass[srcArray])
+            layoutClass = layoutClass[layoutClass]
+
+            if(np.array_equal(layoutClass, prevLayoutClass)):
+                break
+
+    return layoutClass
@@ -0,0 +1,84 @@
+import numpy as np
+from enum import Enum, auto
+from dataclasses import dataclass
+
+
+class NodeKind(Enum):
+    NORMAL = auto()
+    TSV = auto()
+    MEMCTRL = auto()
+
+
+@dataclass
+class NodeType:
+    kind: NodeKind = None
+    chiplet_no: int = None
+
+
+class Topology:
+    # undirected interposer graph kept as CSR adjacency plus per-node kind/chiplet arrays
+
+    def __init__(self, argNumNodes: int):
+
+        self.numNodes = argNumNodes
+
+        # unique undirected links, srcArray < dstArray
+        self.srcArray = np.empty(0, dtype=np.int32)
+        self.dstArray = np.empty(0, dtype=np.int32)
+
+        self.indptr = np.zeros(argNumNodes + 1, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int32)
+
+        self.kindArray = np.full(argNumNodes, NodeKind.NORMAL.value, dtype=np.int8)
+        self.chipletNoArray = np.full(argNumNodes, -1, dtype=np.int32)
+
+    def clear(self):
+        self.__init__(self.numNodes)
+
+    def addEdgeArray(self, argSrcArray, argDstArray):
+        # links are undirected, duplicates and either direction collapse into one
+        srcArray = np.asarray(argSrcArray, dtype=np.int64).ravel()
+        dstArray = np.asarray(argDstArray, dtype=np.int64).ravel()
+
+        edgeKeyArray = np.concatenate([self.srcArray.astype(np.int64) * self.numNodes + self.dstArray,
+                                       np.minimum(srcArray, dstArray) * self.numNodes + np.maximum(srcArray, dstArray)])
+        edgeKeyArray = np.unique(edgeKeyArray)
+
+        (srcArray, dstArray) = np.divmod(edgeKeyArray, self.numNodes)
+        isLink = srcArray != dstArray
+
+        self.srcArray = srcArray[isLink].astype(np.int32)
+        self.dstArray = dstArray[isLink].astype(np.int32)
+
+        self.__setCSR()
+
+    def __setCSR(self):
+        # both directions, grouped by source node
+        fromArray = np.concatenate([self.srcArray, self.dstArray])
+        toArray = np.concatenate([self.dstArray, self.srcArray])
+
+        order = np.lexsort((toArray, fromArray))
+
+        self.indices = toArray[order]
+        self.indptr = np.zeros(self.numNodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(fromArray, minlength=self.numNodes), out=self.indptr[1:])
+
+    def getNumEdges(self) -> int:
+        return len(self.srcArray)
+
+    def getNeighbors(self, argNodeId: int) -> np.ndarray:
+        return self.indices[self.indptr[argNodeId]:self.indptr[argNodeId + 1]]
+
+    def getNodeType(self, argNodeId: int) -> NodeType:
+        return NodeType(kind=NodeKind(int(self.kindArray[argNodeId])),
+                        chiplet_no=int(self.chipletNoArray[argNodeId]))
+
+    def toNetworkx(self):
+        # only for drawing, networkx is not needed otherwise
+        import networkx as nx
+
+        graph = nx.Graph()
+        graph.add_nodes_from(range(self.numNodes))
+        graph.add_edges_from(zip(self.srcArray.tolist(), self.dstArray.tolist()))
+
+        return graph